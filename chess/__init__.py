@@ -29,8 +29,12 @@ __email__ = "niklas.fiekas@backscattering.de"
 __version__ = "0.17.0"
 
 import copy
+import os
 import re
 import itertools
+import struct
+import sys
+import zlib
 
 try:
     import backport_collections as collections
@@ -326,10 +330,6 @@ def _attack_table(deltas):
 
     return mask_table, attack_table
 
-BB_DIAG_MASKS, BB_DIAG_ATTACKS = _attack_table([-9, -7, 7, 9])
-BB_FILE_MASKS, BB_FILE_ATTACKS = _attack_table([-8, 8])
-BB_RANK_MASKS, BB_RANK_ATTACKS = _attack_table([-1, 1])
-
 
 def _rays():
     rays = []
@@ -354,7 +354,174 @@ def _rays():
         between.append(between_row)
     return rays, between
 
-BB_RAYS, BB_BETWEEN = _rays()
+
+TABLE_CACHE_VERSION = 1
+"""
+Version of the attack table cache format. The cache is also rebuilt when
+this module changes.
+"""
+
+
+def _table_cache_paths():
+    # PYTHON_CHESS_TABLE_CACHE names the directory for the cache, or
+    # disables it if empty. By default the cache is kept next to the module
+    # and, if that is not writable, in ~/.jcchess.
+    filename = "attack-tables.bin"
+    directory = os.environ.get("PYTHON_CHESS_TABLE_CACHE")
+    if directory is not None:
+        return [os.path.join(directory, filename)] if directory else []
+
+    return [os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", filename),
+            os.path.join(os.path.expanduser("~"), ".jcchess", filename)]
+
+
+def _table_cache_key():
+    stat = os.stat(os.path.abspath(__file__))
+    key = "{0} {1} {2} {3} {4}".format(
+        TABLE_CACHE_VERSION, __version__, sys.byteorder,
+        int(stat.st_mtime), stat.st_size)
+    return zlib.crc32(key.encode("ascii")) & 0xffffffff
+
+
+def _read_table_cache(path, key):
+    # Returns the list of sections saved by _write_table_cache() or None if
+    # the file is missing, stale or truncated.
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except (IOError, OSError):
+        return None
+
+    header = struct.Struct("<8sII")
+    if len(data) < header.size:
+        return None
+    magic, cache_key, count = header.unpack_from(data, 0)
+    if magic != b"pychesst" or cache_key != key:
+        return None
+
+    offset = header.size
+    sections = []
+    for _ in range(count):
+        if offset + 4 > len(data):
+            return None
+        length, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        end = offset + 8 * length
+        if end > len(data):
+            return None
+        sections.append(struct.unpack_from("<{0}Q".format(length), data, offset))
+        offset = end
+
+    return sections if offset == len(data) else None
+
+
+def _write_table_cache(path, key, sections):
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(tmp, "wb") as f:
+            f.write(struct.pack("<8sII", b"pychesst", key, len(sections)))
+            for section in sections:
+                f.write(struct.pack("<I{0}Q".format(len(section)), len(section), *section))
+
+        # Readers never see a partly written file. The rename does not
+        # replace an existing file on Windows.
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+        return True
+    except (IOError, OSError):
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+
+
+def _build_tables():
+    global BB_DIAG_ATTACKS, BB_FILE_ATTACKS, BB_RANK_ATTACKS, BB_DIAG_MASKS, BB_FILE_MASKS, BB_RANK_MASKS
+
+    tables = [_attack_table([-9, -7, 7, 9]), _attack_table([-8, 8]), _attack_table([-1, 1])]
+
+    # _rays() uses the attack tables.
+    (BB_DIAG_MASKS, BB_DIAG_ATTACKS), (BB_FILE_MASKS, BB_FILE_ATTACKS), (BB_RANK_MASKS, BB_RANK_ATTACKS) = tables
+    tables.append(_rays())
+
+    return tables
+
+
+def _tables_to_sections(tables):
+    sections = []
+
+    for mask_table, attack_table in tables[0:3]:
+        sections.append(mask_table)
+        sections.append([len(attacks) for attacks in attack_table])
+        sections.append([subset for attacks in attack_table for subset in attacks])
+        sections.append([attacks[subset] for attacks in attack_table for subset in attacks])
+
+    for table in tables[3]:
+        sections.append([bb for row in table for bb in row])
+
+    return sections
+
+
+def _tables_from_sections(sections):
+    if len(sections) != 14:
+        raise ValueError("unexpected number of tables in cache: {0}".format(len(sections)))
+
+    tables = []
+
+    for i in range(0, 12, 4):
+        masks, lengths, subsets, attacks = sections[i:i + 4]
+        attack_table = []
+        start = 0
+        for length in lengths:
+            attack_table.append(dict(zip(subsets[start:start + length], attacks[start:start + length])))
+            start += length
+        tables.append((list(masks), attack_table))
+
+    tables.append(tuple([list(section[i:i + 64]) for i in range(0, 64 * 64, 64)] for section in sections[12:14]))
+
+    return tables
+
+
+def _load_tables():
+    # Generating the slider attack tables and rays takes most of the import
+    # time, so they are saved as flat lists of 64 bit integers to a binary
+    # cache and loaded from there by later imports.
+    try:
+        key = _table_cache_key()
+        paths = _table_cache_paths()
+    except OSError:
+        # No module file, for example in a zip archive.
+        paths = []
+
+    for path in paths:
+        sections = _read_table_cache(path, key)
+        if sections is not None:
+            try:
+                return _tables_from_sections(sections)
+            except ValueError:
+                pass
+
+    tables = _build_tables()
+
+    if paths:
+        sections = _tables_to_sections(tables)
+        for path in paths:
+            if _write_table_cache(path, key, sections):
+                break
+
+    return tables
+
+_TABLES = _load_tables()
+
+(BB_DIAG_MASKS, BB_DIAG_ATTACKS), (BB_FILE_MASKS, BB_FILE_ATTACKS), (BB_RANK_MASKS, BB_RANK_ATTACKS), (BB_RAYS, BB_BETWEEN) = _TABLES[0:4]
+
+del _TABLES
 
 
 SAN_REGEX = re.compile(r"^([NBKRQ])?([a-h])?([1-8])?x?([a-h][1-8])(=?[nbrqkNBRQK])?(\+|#)?\Z")
@@ -565,6 +732,8 @@ POLYGLOT_RANDOM_ARRAY = [
 class Piece(object):
     """A piece with type and color."""
 
+    __slots__ = ("piece_type", "color")
+
     def __init__(self, piece_type, color):
         self.piece_type = piece_type
         self.color = color
@@ -591,6 +760,9 @@ class Piece(object):
     def __hash__(self):
         return hash(self.piece_type * (self.color + 1))
 
+    def __reduce__(self):
+        return type(self), (self.piece_type, self.color)
+
     def __repr__(self):
         return "Piece.from_symbol('{0}')".format(self.symbol())
 
@@ -638,8 +810,13 @@ class Move(object):
     piece type.
 
     Drops and null moves are supported.
+
+    Moves are immutable. Move generation hands out shared instances, so the
+    attributes of a move must not be changed.
     """
 
+    __slots__ = ("from_square", "to_square", "promotion", "drop")
+
     def __init__(self, from_square, to_square, promotion=None, drop=None):
         self.from_square = from_square
         self.to_square = to_square
@@ -698,12 +875,13 @@ class Move(object):
         return hash((self.to_square, self.from_square, self.promotion, self.drop))
 
     def __copy__(self):
-        return type(self)(self.from_square, self.to_square, self.promotion)
+        return self
 
     def __deepcopy__(self, memo):
-        move = self.__copy__()
-        memo[id(self)] = move
-        return move
+        return self
+
+    def __reduce__(self):
+        return type(self), (self.from_square, self.to_square, self.promotion, self.drop)
 
     @classmethod
     def from_uci(cls, uci):
@@ -741,6 +919,53 @@ class Move(object):
         return cls(0, 0)
 
 
+def _promotion_moves():
+    promotion_moves = {}
+
+    for from_square, to_square in itertools.product(SQUARES, SQUARES):
+        from_rank, to_rank = square_rank(from_square), square_rank(to_square)
+        if (from_rank, to_rank) not in [(6, 7), (1, 0)] or square_distance(from_square, to_square) != 1:
+            continue
+
+        promotion_moves[(from_square, to_square)] = tuple(
+            Move(from_square, to_square, promotion) for promotion in [QUEEN, ROOK, BISHOP, KNIGHT])
+
+    return promotion_moves
+
+_MOVES = [[Move(from_square, to_square) for to_square in SQUARES] for from_square in SQUARES]
+
+_PROMOTION_MOVES = _promotion_moves()
+
+
+def pack_move(move):
+    """
+    Packs a move into a 16 bit integer: the from square in bits 0 to 5, the
+    to square in bits 6 to 11 and the promotion piece type (or 0) in bits
+    12 to 14. The null move packs to ``0``. Drops can not be packed.
+
+    >>> chess.pack_move(chess.Move.from_uci("g1f3"))
+    1350
+    """
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def unpack_move(packed):
+    """
+    Gets the :class:`~chess.Move` for a move packed with
+    :func:`~chess.pack_move()`.
+    """
+    from_square = packed & 0x3f
+    to_square = packed >> 6 & 0x3f
+    promotion = packed >> 12
+
+    if not promotion:
+        return _MOVES[from_square][to_square]
+    elif KNIGHT <= promotion <= QUEEN and (from_square, to_square) in _PROMOTION_MOVES:
+        return _PROMOTION_MOVES[(from_square, to_square)][QUEEN - promotion]
+    else:
+        return Move(from_square, to_square, promotion)
+
+
 class BaseBoard(object):
     """
     A board representing the position of chess pieces. See
@@ -749,6 +974,16 @@ class BaseBoard(object):
     The board is initialized to the standard chess starting position, unless
     otherwise specified in the optional *board_fen* argument. If *board_fen*
     is ``None`` an empty board is created.
+
+    The Polyglot Zobrist hash of the piece placement is updated
+    incrementally whenever a piece is set or removed.
+    """
+
+    verify_zobrist = False
+    """
+    Set to ``True`` to recompute the Zobrist hash from scratch on every
+    query and raise :exc:`AssertionError` if it differs from the
+    incrementally updated hash.
     """
 
     def __init__(self, board_fen=STARTING_BOARD_FEN):
@@ -775,6 +1010,8 @@ class BaseBoard(object):
         self.occupied_co[BLACK] = BB_RANK_7 | BB_RANK_8
         self.occupied = BB_RANK_1 | BB_RANK_2 | BB_RANK_7 | BB_RANK_8
 
+        self._board_zobrist = self._compute_board_zobrist_hash(POLYGLOT_RANDOM_ARRAY)
+
     def reset_board(self):
         self._reset_board()
 
@@ -792,6 +1029,8 @@ class BaseBoard(object):
         self.occupied_co[BLACK] = BB_VOID
         self.occupied = BB_VOID
 
+        self._board_zobrist = 0
+
     def clear_board(self):
         """Clears the board."""
         self._clear_board()
@@ -866,6 +1105,9 @@ class BaseBoard(object):
         else:
             return
 
+        color = bool(self.occupied_co[WHITE] & mask)
+        self._board_zobrist ^= POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+
         self.occupied ^= mask
         self.occupied_co[WHITE] &= ~mask
         self.occupied_co[BLACK] &= ~mask
@@ -905,6 +1147,8 @@ class BaseBoard(object):
         self.occupied ^= mask
         self.occupied_co[color] ^= mask
 
+        self._board_zobrist ^= POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+
         if promoted:
             self.promoted ^= mask
 
@@ -1068,6 +1312,8 @@ class BaseBoard(object):
         self.occupied = BB_RANK_1 | BB_RANK_2 | BB_RANK_7 | BB_RANK_8
         self.promoted = BB_VOID
 
+        self._board_zobrist = self._compute_board_zobrist_hash(POLYGLOT_RANDOM_ARRAY)
+
     def set_chess960_pos(self, sharnagl):
         """
         Sets up a Chess960 starting position given its index between 0 and 959.
@@ -1168,9 +1414,24 @@ class BaseBoard(object):
             return None
 
     def board_zobrist_hash(self, array=None):
-        if array is None:
-            array = POLYGLOT_RANDOM_ARRAY
+        """
+        Returns a Zobrist hash of the piece placement.
+
+        With the default :data:`~chess.POLYGLOT_RANDOM_ARRAY` this is the
+        incrementally updated hash and takes constant time.
+        """
+        if array is not None:
+            return self._compute_board_zobrist_hash(array)
 
+        if self.verify_zobrist:
+            expected = self._compute_board_zobrist_hash(POLYGLOT_RANDOM_ARRAY)
+            if self._board_zobrist != expected:
+                raise AssertionError("incremental zobrist hash {0:016x} differs from {1:016x}: {2}".format(
+                    self._board_zobrist, expected, self.board_fen()))
+
+        return self._board_zobrist
+
+    def _compute_board_zobrist_hash(self, array):
         zobrist_hash = 0
 
         for pivot, squares in enumerate(self.occupied_co):
@@ -1289,6 +1550,8 @@ class BaseBoard(object):
         board.occupied = self.occupied
         board.promoted = self.promoted
 
+        board._board_zobrist = self._board_zobrist
+
         return board
 
     def __copy__(self):
@@ -1318,8 +1581,22 @@ class BaseBoard(object):
         return board
 
 
+def _unpickle_board_state(cls, values):
+    # The constructor of _BoardState takes a board, so set the slots
+    # directly.
+    state = cls.__new__(cls)
+    for slot, value in zip(_BoardState.__slots__, values):
+        setattr(state, slot, value)
+    return state
+
+
 class _BoardState(object):
 
+    __slots__ = ("pawns", "knights", "bishops", "rooks", "queens", "kings",
+                 "occupied_w", "occupied_b", "occupied", "promoted",
+                 "board_zobrist", "turn", "castling_rights", "ep_square",
+                 "halfmove_clock", "fullmove_number", "repetitions")
+
     def __init__(self, board):
         self.pawns = board.pawns
         self.knights = board.knights
@@ -1334,18 +1611,103 @@ class _BoardState(object):
 
         self.promoted = board.promoted
 
+        self.board_zobrist = board._board_zobrist
+
         self.turn = board.turn
         self.castling_rights = board.castling_rights
         self.ep_square = board.ep_square
         self.halfmove_clock = board.halfmove_clock
         self.fullmove_number = board.fullmove_number
 
+        # Repetition counts from before a zeroing move, restored by pop().
+        self.repetitions = None
+
+    def __reduce__(self):
+        values = tuple(getattr(self, slot) for slot in _BoardState.__slots__)
+        return _unpickle_board_state, (type(self), values)
+
     def transposition_key(self):
         return (self.pawns, self.knights, self.bishops, self.rooks,
                 self.queens, self.kings,
                 self.occupied_w, self.occupied_b, self.promoted,
                 self.turn, self.castling_rights, self.ep_square)
 
+    def restore(self, board):
+        board.pawns = self.pawns
+        board.knights = self.knights
+        board.bishops = self.bishops
+        board.rooks = self.rooks
+        board.queens = self.queens
+        board.kings = self.kings
+
+        board.occupied_co[WHITE] = self.occupied_w
+        board.occupied_co[BLACK] = self.occupied_b
+        board.occupied = self.occupied
+
+        board.promoted = self.promoted
+
+        board._board_zobrist = self.board_zobrist
+
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+
+
+class Position(_BoardState):
+    """
+    A snapshot of the position of a :class:`~chess.Board`: the pieces, side
+    to move, castling rights, en passant square and move counters, but not
+    the move stack. Taking a snapshot and creating a board from it take
+    constant time and memory, no matter how long the game is.
+
+    Use :func:`~chess.Board.position()` to take a snapshot.
+
+    >>> board = chess.Board()
+    >>> board.push_san("e4")
+    Move.from_uci('e2e4')
+    >>> position = board.position()
+    >>> position.board()
+    Board('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')
+
+    Snapshots are not changed once taken, so they can be shared.
+    """
+
+    __slots__ = ("board_type", "chess960")
+
+    def __init__(self, board):
+        super(Position, self).__init__(board)
+        self.board_type = type(board)
+        self.chess960 = board.chess960
+
+    def board(self):
+        """
+        Creates a new board with the position. Its move stack is empty, so
+        positions before the snapshot do not count for repetitions.
+        """
+        board = self.board_type(None, chess960=self.chess960)
+        self.restore(board)
+        return board
+
+    def __eq__(self, position):
+        try:
+            return self.transposition_key() == position.transposition_key()
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, position):
+        try:
+            return self.transposition_key() != position.transposition_key()
+        except AttributeError:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.transposition_key())
+
+    def __reduce__(self):
+        return type(self), (self.board(),)
+
 
 class Board(BaseBoard):
     """
@@ -1391,6 +1753,10 @@ class Board(BaseBoard):
         self.move_stack = collections.deque()
         self.stack = collections.deque()
 
+        # Number of times each position on the stack since the last capture
+        # or pawn move occured, keyed by _repetition_key().
+        self._repetitions = {}
+
         if fen is None:
             self.clear()
         elif fen == type(self).starting_fen:
@@ -1438,6 +1804,7 @@ class Board(BaseBoard):
         """Clears the move stack."""
         self.move_stack.clear()
         self.stack.clear()
+        self._repetitions = {}
 
     def remove_piece_at(self, square):
         piece = super(Board, self).remove_piece_at(square)
@@ -1456,7 +1823,7 @@ class Board(BaseBoard):
         for from_square in scan_reversed(non_pawns):
             moves = self.attacks_mask(from_square) & ~our_pieces & to_mask
             for to_square in scan_reversed(moves):
-                yield Move(from_square, to_square)
+                yield _MOVES[from_square][to_square]
 
         # Generate castling moves.
         if from_mask & self.kings:
@@ -1477,12 +1844,10 @@ class Board(BaseBoard):
 
             for to_square in scan_reversed(targets):
                 if square_rank(to_square) in [0, 7]:
-                    yield Move(from_square, to_square, QUEEN)
-                    yield Move(from_square, to_square, ROOK)
-                    yield Move(from_square, to_square, BISHOP)
-                    yield Move(from_square, to_square, KNIGHT)
+                    for move in _PROMOTION_MOVES[(from_square, to_square)]:
+                        yield move
                 else:
-                    yield Move(from_square, to_square)
+                    yield _MOVES[from_square][to_square]
 
         # Prepare pawn advance generation.
         if self.turn == WHITE:
@@ -1500,17 +1865,15 @@ class Board(BaseBoard):
             from_square = to_square + (8 if self.turn == BLACK else -8)
 
             if square_rank(to_square) in [0, 7]:
-                yield Move(from_square, to_square, QUEEN)
-                yield Move(from_square, to_square, ROOK)
-                yield Move(from_square, to_square, BISHOP)
-                yield Move(from_square, to_square, KNIGHT)
+                for move in _PROMOTION_MOVES[(from_square, to_square)]:
+                    yield move
             else:
-                yield Move(from_square, to_square)
+                yield _MOVES[from_square][to_square]
 
         # Generate double pawn moves.
         for to_square in scan_reversed(double_moves):
             from_square = to_square + (16 if self.turn == BLACK else -16)
-            yield Move(from_square, to_square)
+            yield _MOVES[from_square][to_square]
 
         # Generate en passant captures.
         if self.ep_square:
@@ -1526,7 +1889,7 @@ class Board(BaseBoard):
             BB_PAWN_ATTACKS[not self.turn][self.ep_square])
 
         for capturer in scan_reversed(capturers):
-            yield Move(capturer, self.ep_square)
+            yield _MOVES[capturer][self.ep_square]
 
     def generate_pseudo_legal_captures(self, from_mask=BB_ALL, to_mask=BB_ALL):
         return itertools.chain(
@@ -1893,36 +2256,23 @@ class Board(BaseBoard):
 
         return False
 
+    def _repetition_key(self):
+        return (self._board_zobrist, self.promoted, self.turn,
+                self.castling_rights, self.ep_square)
+
+    def _count_repetitions(self):
+        # Number of times the current position occured, including now.
+        return self._repetitions.get(self._repetition_key(), 0) + 1
+
     def is_fivefold_repetition(self):
         """
         Since the first of July 2014 a game is automatically drawn (without
-        a claim by one of the players) if a position occurs for the fifth time
-        on consecutive alternating moves.
-        """
-        transposition_key = _BoardState(self).transposition_key()
-
-        if len(self.stack) < 16:
-            return False
-
-        switchyard = collections.deque()
-
-        for _ in range(4):
-            # Go back two full moves, each.
-            for _ in range(4):
-                board_state = self.stack.pop()
-                switchyard.append(board_state)
+        a claim by one of the players) if a position occurs for the fifth time.
 
-            # Check the position was the same before.
-            if board_state.transposition_key() != transposition_key:
-                while switchyard:
-                    self.stack.append(switchyard.pop())
-
-                return False
-
-        while switchyard:
-            self.stack.append(switchyard.pop())
-
-        return True
+        Positions are counted as the moves are pushed, so this takes constant
+        time.
+        """
+        return self._count_repetitions() >= 5
 
     def can_claim_draw(self):
         """
@@ -1950,21 +2300,19 @@ class Board(BaseBoard):
         board occured for the third time or if such a repetition is reached
         with one of the possible legal moves.
         """
-        # Count positions.
-        transposition_key = _BoardState(self).transposition_key()
-        transpositions = collections.Counter()
-        transpositions.update((transposition_key, ))
-        transpositions.update(state.transposition_key() for state in self.stack)
-
         # Threefold repetition occured.
-        if transpositions[transposition_key] >= 3:
+        if self._count_repetitions() >= 3:
             return True
 
-        # The next legal move is a threefold repetition.
+        # The next legal move can only reach a threefold repetition if some
+        # position since the last capture or pawn move already occured twice.
+        if not any(count >= 2 for count in self._repetitions.values()):
+            return False
+
         for move in self.generate_legal_moves():
             self.push(move)
 
-            if transpositions[_BoardState(self).transposition_key()] >= 2:
+            if self._count_repetitions() >= 3:
                 self.pop()
                 return True
 
@@ -1991,11 +2339,22 @@ class Board(BaseBoard):
         :warning: Moves are not checked for legality.
         """
         # Remember game state.
-        self.stack.append(_BoardState(self))
+        board_state = _BoardState(self)
+        self.stack.append(board_state)
         self.move_stack.append(move)
 
         move = self._to_chess960(move)
 
+        # Count the position for repetition detection. No position before a
+        # capture or pawn move can occur again, so start counting afresh.
+        zeroing = move and not move.drop and self.is_zeroing(move)
+        if zeroing:
+            board_state.repetitions = self._repetitions
+            self._repetitions = {}
+        else:
+            key = self._repetition_key()
+            self._repetitions[key] = self._repetitions.get(key, 0) + 1
+
         # Reset ep square.
         ep_square = self.ep_square
         self.ep_square = None
@@ -2017,7 +2376,7 @@ class Board(BaseBoard):
             return
 
         # Zero the half move clock.
-        if self.is_zeroing(move):
+        if zeroing:
             self.halfmove_clock = 0
 
         from_bb = BB_SQUARES[move.from_square]
@@ -2092,25 +2451,18 @@ class Board(BaseBoard):
         """
         move = self.move_stack.pop()
         state = self.stack.pop()
+        state.restore(self)
 
-        self.pawns = state.pawns
-        self.knights = state.knights
-        self.bishops = state.bishops
-        self.rooks = state.rooks
-        self.queens = state.queens
-        self.kings = state.kings
-
-        self.occupied_co[WHITE] = state.occupied_w
-        self.occupied_co[BLACK] = state.occupied_b
-        self.occupied = state.occupied
-
-        self.promoted = state.promoted
-
-        self.turn = state.turn
-        self.castling_rights = state.castling_rights
-        self.ep_square = state.ep_square
-        self.halfmove_clock = state.halfmove_clock
-        self.fullmove_number = state.fullmove_number
+        if state.repetitions is not None:
+            # Copied because boards copied with the stack share the state.
+            self._repetitions = dict(state.repetitions)
+        else:
+            key = self._repetition_key()
+            count = self._repetitions.get(key, 0) - 1
+            if count > 0:
+                self._repetitions[key] = count
+            else:
+                self._repetitions.pop(key, None)
 
         return move
 
@@ -3182,7 +3534,7 @@ class Board(BaseBoard):
 
         if BB_SQUARES[king] & from_mask:
             for to_square in scan_reversed(BB_KING_ATTACKS[king] & ~self.occupied_co[self.turn] & ~attacked & to_mask):
-                yield Move(king, to_square)
+                yield _MOVES[king][to_square]
 
         checker = msb(checkers)
         if BB_SQUARES[checker] == checkers:
@@ -3221,6 +3573,142 @@ class Board(BaseBoard):
             if self._is_safe(blockers, move):
                 yield move
 
+    def packed_legal_moves(self, moves=None, from_mask=BB_ALL, to_mask=BB_ALL):
+        """
+        Gets the legal moves packed into 16 bit integers (see
+        :func:`~chess.pack_move()`), in the same order as
+        :func:`~chess.Board.generate_legal_moves()`.
+
+        The moves are generated in bulk without creating
+        :class:`~chess.Move` objects, which makes this the fastest way to
+        count the legal moves or to look them up by index.
+
+        If *moves* is given (for example an ``array.array("H")`` that is
+        reused for each position) the packed moves are appended to it and
+        the number of moves is returned. Otherwise they are returned as a
+        tuple.
+
+        >>> len(chess.Board().packed_legal_moves())
+        20
+        """
+        packed = [] if moves is None else moves
+        start = len(packed)
+        self._pack_legal_moves(packed.append, from_mask, to_mask)
+        return tuple(packed) if moves is None else len(packed) - start
+
+    def _pack_legal_moves(self, append, from_mask, to_mask):
+        if self.is_variant_end():
+            return
+
+        king_mask = self.kings & self.occupied_co[self.turn]
+        if king_mask & (king_mask - 1):
+            # More than one king of the side to move.
+            for move in self.generate_legal_moves(from_mask, to_mask):
+                append(pack_move(move))
+            return
+        elif not king_mask:
+            self._pack_pseudo_legal_moves(append, None, 0, from_mask, to_mask)
+            return
+
+        king = msb(king_mask)
+        blockers = self._slider_blockers(king)
+        checkers = self.attackers_mask(not self.turn, king)
+        if not checkers:
+            self._pack_pseudo_legal_moves(append, king, blockers, from_mask, to_mask)
+            return
+
+        # Evasions, see _generate_evasions().
+        attacked = 0
+        for checker in scan_reversed(checkers & (self.bishops | self.rooks | self.queens)):
+            attacked |= BB_RAYS[king][checker] & ~BB_SQUARES[checker]
+
+        if BB_SQUARES[king] & from_mask:
+            for to_square in scan_reversed(BB_KING_ATTACKS[king] & ~self.occupied_co[self.turn] & ~attacked & to_mask):
+                if not self.is_attacked_by(not self.turn, to_square):
+                    append(king | to_square << 6)
+
+        checker = msb(checkers)
+        if BB_SQUARES[checker] == checkers:
+            target = BB_BETWEEN[king][checker] | checkers
+            self._pack_pseudo_legal_moves(append, king, blockers, ~self.kings & from_mask, target & to_mask)
+
+            if self.ep_square and not BB_SQUARES[self.ep_square] & target:
+                last_double = self.ep_square + (-8 if self.turn == WHITE else 8)
+                if last_double == checker:
+                    for move in self.generate_pseudo_legal_ep(from_mask, to_mask):
+                        if self._is_safe(blockers, move):
+                            append(pack_move(move))
+
+    def _pack_pseudo_legal_moves(self, append, king, blockers, from_mask, to_mask):
+        # Like generate_pseudo_legal_moves(), but only packs the moves that
+        # are safe for the given king. Pinned pieces (blockers) can only
+        # move along the line through the king.
+        our_pieces = self.occupied_co[self.turn]
+
+        # Pack piece moves.
+        non_pawns = our_pieces & ~self.pawns & from_mask
+        for from_square in scan_reversed(non_pawns):
+            moves = self.attacks_mask(from_square) & ~our_pieces & to_mask
+            if from_square == king:
+                for to_square in scan_reversed(moves):
+                    if not self.is_attacked_by(not self.turn, to_square):
+                        append(from_square | to_square << 6)
+                continue
+            elif blockers & BB_SQUARES[from_square]:
+                moves &= BB_RAYS[king][from_square]
+
+            for to_square in scan_reversed(moves):
+                append(from_square | to_square << 6)
+
+        # Pack castling moves.
+        if from_mask & self.kings:
+            for move in self.generate_castling_moves(from_mask, to_mask):
+                append(pack_move(move))
+
+        pawns = self.pawns & our_pieces & from_mask
+        if not pawns:
+            return
+
+        # Pack pawn captures.
+        for from_square in scan_reversed(pawns):
+            targets = BB_PAWN_ATTACKS[self.turn][from_square] & self.occupied_co[not self.turn] & to_mask
+            if blockers & BB_SQUARES[from_square]:
+                targets &= BB_RAYS[king][from_square]
+
+            for to_square in scan_reversed(targets):
+                self._pack_pawn_move(append, from_square, to_square)
+
+        # Pack pawn advances.
+        if self.turn == WHITE:
+            single_moves = pawns << 8 & ~self.occupied
+            double_moves = single_moves << 8 & ~self.occupied & (BB_RANK_3 | BB_RANK_4)
+        else:
+            single_moves = pawns >> 8 & ~self.occupied
+            double_moves = single_moves >> 8 & ~self.occupied & (BB_RANK_6 | BB_RANK_5)
+
+        for to_square in scan_reversed(single_moves & to_mask):
+            from_square = to_square + (8 if self.turn == BLACK else -8)
+            if not blockers & BB_SQUARES[from_square] or BB_RAYS[king][from_square] & BB_SQUARES[to_square]:
+                self._pack_pawn_move(append, from_square, to_square)
+
+        for to_square in scan_reversed(double_moves & to_mask):
+            from_square = to_square + (16 if self.turn == BLACK else -16)
+            if not blockers & BB_SQUARES[from_square] or BB_RAYS[king][from_square] & BB_SQUARES[to_square]:
+                append(from_square | to_square << 6)
+
+        # Pack en passant captures.
+        if self.ep_square:
+            for move in self.generate_pseudo_legal_ep(from_mask, to_mask):
+                if self._is_safe(blockers, move):
+                    append(pack_move(move))
+
+    def _pack_pawn_move(self, append, from_square, to_square):
+        if square_rank(to_square) in [0, 7]:
+            for promotion in [QUEEN, ROOK, BISHOP, KNIGHT]:
+                append(from_square | to_square << 6 | promotion << 12)
+        else:
+            append(from_square | to_square << 6)
+
     def generate_legal_ep(self, from_mask=BB_ALL, to_mask=BB_ALL):
         if self.is_variant_end():
             return
@@ -3294,29 +3782,32 @@ class Board(BaseBoard):
         if not self.chess960 and from_square in [E1, E8] and to_square in [A1, H1, A8, H8] and self.piece_type_at(from_square) == KING:
             if from_square == E1:
                 if to_square == H1:
-                    return Move(E1, G1)
+                    return _MOVES[E1][G1]
                 elif to_square == A1:
-                    return Move(E1, C1)
+                    return _MOVES[E1][C1]
             elif from_square == E8:
                 if to_square == H8:
-                    return Move(E8, G8)
+                    return _MOVES[E8][G8]
                 elif to_square == A8:
-                    return Move(E8, C8)
+                    return _MOVES[E8][C8]
 
-        return Move(from_square, to_square, promotion)
+        if promotion:
+            return Move(from_square, to_square, promotion)
+        else:
+            return _MOVES[from_square][to_square]
 
     def _to_chess960(self, move):
         if move.from_square in [E1, E8] and move.to_square in [C1, G1, C8, G8] and self.piece_type_at(move.from_square) == KING and self.piece_type_at(move.to_square) != ROOK:
             if move.from_square == E1:
                 if move.to_square == G1:
-                    return Move(E1, H1)
+                    return _MOVES[E1][H1]
                 elif move.to_square == C1:
-                    return Move(E1, A1)
+                    return _MOVES[E1][A1]
             elif move.from_square == E8:
                 if move.to_square == G8:
-                    return Move(E8, H8)
+                    return _MOVES[E8][H8]
                 elif move.to_square == C8:
-                    return Move(E8, A8)
+                    return _MOVES[E8][A8]
 
         return move
 
@@ -3377,7 +3868,8 @@ class Board(BaseBoard):
         :data:`~chess.POLYGLOT_RANDOM_ARRAY`, which makes for hashes compatible
         with polyglot opening books.
         """
-        # Hash in the board setup.
+        # Hash in the board setup. With the default array this is kept up to
+        # date by push() and pop(), the remaining features are constant time.
         zobrist_hash = self.board_zobrist_hash(array)
 
         # Default random array is polyglot compatible.
@@ -3413,6 +3905,13 @@ class Board(BaseBoard):
 
         return zobrist_hash
 
+    def position(self):
+        """
+        Gets a :class:`~chess.Position` snapshot of the current position,
+        without the move stack.
+        """
+        return Position(self)
+
     def copy(self, stack=True):
         board = super(Board, self).copy()
 
@@ -3425,8 +3924,9 @@ class Board(BaseBoard):
         board.halfmove_clock = self.halfmove_clock
 
         if stack:
-            board.move_stack = copy.deepcopy(self.move_stack)
+            board.move_stack = copy.copy(self.move_stack)
             board.stack = copy.copy(self.stack)
+            board._repetitions = dict(self._repetitions)
 
         return board
 
@@ -3497,7 +3997,7 @@ class LegalMoveGenerator(object):
     __nonzero__ = __bool__
 
     def __len__(self):
-        return sum(1 for _ in self.board.generate_legal_moves())
+        return len(self.board.packed_legal_moves())
 
     def __iter__(self):
         return self.board.generate_legal_moves()
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+#
+#   perft.py - check and time the move generator
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Perft (move path enumeration) for verifying and benchmarking the move
+generator.
+
+>>> import chess
+>>> import chess.perft
+>>>
+>>> chess.perft.perft(chess.Board(), 3)
+8902
+
+Run ``python -m chess.perft`` to check the node counts of the standard test
+positions and report nodes per second. Use ``--json`` to save the results
+and ``--compare`` to compare them with an earlier run, and
+``--import-time`` to time ``import chess`` with and without the attack
+table cache.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import chess
+import collections
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+try:
+    _timer = time.perf_counter
+except AttributeError:
+    _timer = time.time
+
+
+PerftPosition = collections.namedtuple("PerftPosition", ["name", "fen", "chess960", "nodes"])
+"""
+A test position with the known node counts, where ``nodes[0]`` is the count
+at depth 1.
+"""
+
+POSITIONS = [
+    PerftPosition("startpos", chess.STARTING_FEN, False,
+                  [20, 400, 8902, 197281, 4865609, 119060324]),
+    PerftPosition("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", False,
+                  [48, 2039, 97862, 4085603, 193690690]),
+    PerftPosition("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", False,
+                  [14, 191, 2812, 43238, 674624, 11030083]),
+    PerftPosition("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", False,
+                  [6, 264, 9467, 422333, 15833292]),
+    PerftPosition("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", False,
+                  [44, 1486, 62379, 2103487, 89941194]),
+    PerftPosition("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", False,
+                  [46, 2079, 89890, 3894594]),
+    PerftPosition("illegal-ep-1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", False,
+                  [18, 92, 1670, 10138, 185429, 1134888]),
+    PerftPosition("illegal-ep-2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", False,
+                  [13, 102, 1266, 10276, 135655, 1015133]),
+    PerftPosition("ep-gives-check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", False,
+                  [15, 126, 1928, 13931, 206379, 1440467]),
+    PerftPosition("short-castling-gives-check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", False,
+                  [15, 66, 1198, 6399, 120330, 661072]),
+    PerftPosition("long-castling-gives-check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", False,
+                  [16, 71, 1286, 7418, 141077, 803711]),
+    PerftPosition("castling-rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", False,
+                  [26, 1141, 27826, 1274206]),
+    PerftPosition("castling-prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", False,
+                  [44, 1494, 50509, 1720476]),
+    PerftPosition("promote-out-of-check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", False,
+                  [11, 133, 1442, 19174, 266199, 3821001]),
+    PerftPosition("discovered-check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", False,
+                  [29, 165, 5160, 31961, 1004658]),
+    PerftPosition("promote-to-give-check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", False,
+                  [9, 40, 472, 2661, 38983, 217342]),
+    PerftPosition("underpromote-to-give-check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", False,
+                  [6, 27, 273, 1329, 18135, 92683]),
+    PerftPosition("self-stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", False,
+                  [2, 6, 13, 63, 382, 2217]),
+    PerftPosition("stalemate-and-checkmate-1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", False,
+                  [10, 25, 268, 926, 10857, 43261, 567584]),
+    PerftPosition("stalemate-and-checkmate-2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", False,
+                  [37, 183, 6559, 23527]),
+    PerftPosition("chess960-1", "bqnb1rkr/pp3ppp/3ppn2/2p5/5P2/P2P4/NPP1P1PP/BQ1BNRKR w HFhf - 2 9", True,
+                  [21, 528, 12189, 326672, 8146062]),
+    PerftPosition("chess960-2", "2nnrbkr/p1qppppp/8/1ppb4/6PP/3PP3/PPP2P2/BQNNRBKR w HEhe - 1 9", True,
+                  [21, 807, 18002, 667366, 16253601]),
+    PerftPosition("chess960-3", "b1q1rrkb/pppppppp/3nn3/8/P7/1PPP4/4PPPP/BQNNRKRB w GE - 1 9", True,
+                  [20, 479, 10471, 273318, 6417013]),
+]
+"""The standard perft test positions."""
+
+
+class PerftResult(collections.namedtuple("PerftResult", ["name", "fen", "depth", "nodes", "expected", "seconds"])):
+    """The result of running perft on a position."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """Whether the node count matches the known count (if any)."""
+        return self.expected is None or self.nodes == self.expected
+
+    @property
+    def nps(self):
+        """Nodes per second."""
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "fen": self.fen,
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "expected": self.expected,
+            "ok": self.ok,
+            "seconds": self.seconds,
+            "nps": self.nps,
+        }
+
+
+def perft(board, depth):
+    """
+    Counts the leaf nodes of the legal move tree of *board* to the given
+    *depth*. The board is restored before returning.
+    """
+    if depth < 1:
+        return 1
+    elif depth == 1:
+        # Bulk count the leaves.
+        return len(board.packed_legal_moves())
+
+    nodes = 0
+    for move in list(board.generate_legal_moves()):
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+
+    return nodes
+
+
+def divide(board, depth):
+    """
+    Runs perft for each legal move of *board*, which is useful to find the
+    move where a node count goes wrong.
+
+    Returns a list of (move, nodes) tuples.
+    """
+    results = []
+    for move in list(board.generate_legal_moves()):
+        board.push(move)
+        results.append((move, perft(board, depth - 1)))
+        board.pop()
+
+    return results
+
+
+def choose_depth(position, max_nodes):
+    """
+    Gets the deepest depth with a known node count of at most *max_nodes*
+    (but at least 1).
+    """
+    depth = 1
+    for i, nodes in enumerate(position.nodes):
+        if nodes <= max_nodes:
+            depth = i + 1
+    return depth
+
+
+def run(positions=POSITIONS, depth=None, max_nodes=100000):
+    """
+    Runs perft on each position, at the given *depth* or else as deep as
+    *max_nodes* allows.
+
+    Yields a :class:`~chess.perft.PerftResult` for each position.
+    """
+    for position in positions:
+        d = depth if depth is not None else choose_depth(position, max_nodes)
+        expected = position.nodes[d - 1] if d <= len(position.nodes) else None
+
+        board = chess.Board(position.fen, chess960=position.chess960)
+        start = _timer()
+        nodes = perft(board, d)
+        seconds = _timer() - start
+
+        yield PerftResult(position.name, position.fen, d, nodes, expected, seconds)
+
+
+def import_time(cache=True, repeat=5):
+    """
+    Measures how long ``import chess`` takes in a fresh interpreter, using
+    the attack table cache or (with *cache* ``False``) building the tables.
+
+    Returns the best time of *repeat* runs in seconds.
+    """
+    env = dict(os.environ)
+    if not cache:
+        env["PYTHON_CHESS_TABLE_CACHE"] = ""
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(chess.__file__)))] +
+        [path for path in [env.get("PYTHONPATH")] if path])
+
+    script = "import time; start = time.time(); import chess; print(time.time() - start)"
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", script], env=env)
+        times.append(float(output.decode("ascii")))
+    return min(times)
+
+
+def get_report(results, label=None):
+    """Gets the results as a dictionary that can be saved as JSON."""
+    nodes = sum(result.nodes for result in results)
+    seconds = sum(result.seconds for result in results)
+    return {
+        "label": label,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "version": chess.__version__,
+        "python": platform.python_implementation() + " " + platform.python_version(),
+        "results": [result.to_dict() for result in results],
+        "nodes": nodes,
+        "seconds": seconds,
+        "nps": nodes / seconds if seconds > 0 else 0.0,
+        "ok": all(result.ok for result in results),
+    }
+
+
+def compare(report, baseline):
+    """
+    Compares the nodes per second of two reports position by position.
+
+    Returns a list of (name, baseline nps, nps, ratio) tuples, ending with
+    the totals.
+
+    Only positions run to the same depth in both reports are compared.
+    """
+    previous = dict((result["name"], result) for result in baseline["results"])
+    rows = []
+    old_nodes = old_seconds = nodes = seconds = 0
+
+    for result in report["results"]:
+        old = previous.get(result["name"])
+        if old is None or old["depth"] != result["depth"] or not old["nps"]:
+            continue
+        rows.append((result["name"], old["nps"], result["nps"], result["nps"] / old["nps"]))
+        old_nodes += old["nodes"]
+        old_seconds += old["seconds"]
+        nodes += result["nodes"]
+        seconds += result["seconds"]
+
+    if old_seconds and seconds:
+        old_nps = old_nodes / old_seconds
+        nps = nodes / seconds
+        rows.append(("total", old_nps, nps, nps / old_nps))
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.perft",
+        description="Verify and benchmark the move generator with perft.")
+    parser.add_argument("--depth", type=int,
+                        help="depth for all positions (default: as deep as --max-nodes allows)")
+    parser.add_argument("--max-nodes", type=int, default=100000,
+                        help="largest node count to choose a depth for (default 100000)")
+    parser.add_argument("--position", action="append", metavar="NAME",
+                        help="only run the named test position (can be repeated)")
+    parser.add_argument("--fen", help="run a custom position (needs --depth)")
+    parser.add_argument("--chess960", action="store_true", help="the custom position is Chess960")
+    parser.add_argument("--divide", action="store_true", help="show the node count for each move")
+    parser.add_argument("--list", action="store_true", help="list the test positions")
+    parser.add_argument("--label", help="label for the results, e.g. a commit id")
+    parser.add_argument("--json", metavar="FILE", help="save the results as JSON (- for stdout)")
+    parser.add_argument("--compare", metavar="FILE", help="compare nodes per second with an earlier --json")
+    parser.add_argument("--import-time", action="store_true",
+                        help="also time import chess with and without the attack table cache")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for position in POSITIONS:
+            print("{0:30} {1}".format(position.name, position.fen))
+        return 0
+
+    if args.fen:
+        if args.depth is None:
+            parser.error("--fen needs --depth")
+        positions = [PerftPosition("custom", args.fen, args.chess960, [])]
+    elif args.position:
+        names = dict((position.name, position) for position in POSITIONS)
+        try:
+            positions = [names[name] for name in args.position]
+        except KeyError as err:
+            parser.error("unknown position: {0}".format(err.args[0]))
+    else:
+        positions = POSITIONS
+
+    out = sys.stderr if args.json == "-" else sys.stdout
+
+    if args.divide:
+        if args.depth is None:
+            parser.error("--divide needs --depth")
+        for position in positions:
+            board = chess.Board(position.fen, chess960=position.chess960)
+            total = 0
+            for move, nodes in divide(board, args.depth):
+                print("{0} {1}".format(board.uci(move), nodes), file=out)
+                total += nodes
+            print("{0}: {1} nodes".format(position.name, total), file=out)
+        return 0
+
+    results = []
+    for result in run(positions, args.depth, args.max_nodes):
+        results.append(result)
+        status = "ok" if result.expected is not None and result.ok else "FAIL" if not result.ok else ""
+        print("{0:30} depth {1} {2:>10} nodes {3:>8.0f} nps {4}".format(
+            result.name, result.depth, result.nodes, result.nps, status), file=out)
+
+    report = get_report(results, args.label)
+    print("{0:30} {1:>18} nodes {2:>8.0f} nps".format("total", report["nodes"], report["nps"]), file=out)
+
+    if args.import_time:
+        report["import_seconds"] = {
+            "cached": import_time(cache=True),
+            "uncached": import_time(cache=False),
+        }
+        print("import chess: {0:.3f} s cached, {1:.3f} s uncached".format(
+            report["import_seconds"]["cached"], report["import_seconds"]["uncached"]), file=out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("compared with {0}:".format(baseline.get("label") or args.compare), file=out)
+        for name, old_nps, nps, ratio in compare(report, baseline):
+            print("{0:30} {1:>8.0f} -> {2:>8.0f} nps {3:+.1%}".format(name, old_nps, nps, ratio - 1), file=out)
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -104,6 +104,7 @@ class GameNode(object):
         self.variations = []
 
         self.board_cached = None
+        self.position_cached = None
 
     def board(self, _cache=True):
         """
@@ -123,13 +124,37 @@ class GameNode(object):
         else:
             return board
 
+    def position(self):
+        """
+        Gets a :class:`~chess.Position` snapshot of the position of the node.
+
+        Snapshots are cached for each node, so walking a game or variation
+        from the root takes linear time. Use this rather than
+        :func:`~chess.pgn.GameNode.board()` when the move stack is not
+        needed.
+        """
+        if self.position_cached is None:
+            # Replay the moves from the nearest node with a snapshot.
+            nodes = []
+            node = self
+            while node.parent and node.position_cached is None:
+                nodes.append(node)
+                node = node.parent
+
+            board = node.position().board()
+            for node in reversed(nodes):
+                board.push(node.move)
+                node.position_cached = board.position()
+
+        return self.position_cached
+
     def san(self):
         """
         Gets the standard algebraic notation of the move leading to this node.
 
         Do not call this on the root node.
         """
-        return self.parent.board().san(self.move)
+        return self.parent.position().board().san(self.move)
 
     def root(self):
         """Gets the root node, i.e. the game."""
@@ -402,6 +427,10 @@ class Game(GameNode):
         board.chess960 = board.chess960 or board.has_chess960_castling_rights()
         return board
 
+    def position(self):
+        """Gets a :class:`~chess.Position` snapshot of the starting position."""
+        return self.board().position()
+
     def setup(self, board):
         """
         Setup a specific starting position. This sets (or resets) the *SetUp*,
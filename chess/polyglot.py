@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+#
+#   polyglot.py - read polyglot opening books
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Reading Polyglot opening books.
+
+A book is a file of 16 byte entries (key, move, weight, learn) sorted by
+key, where the key is the Polyglot compatible
+:func:`~chess.Board.zobrist_hash()` of the position. The file is memory
+mapped and entries are found by binary search, so a lookup reads only a
+few pages of the file however large it is.
+
+>>> import chess.polyglot
+>>>
+>>> board = chess.Board()
+>>>
+>>> with chess.polyglot.open_reader("data/polyglot/performance.bin") as reader:
+...    for entry in reader.find_all(board):
+...        print(entry.move, entry.weight, entry.learn)
+e2e4 1 0
+d2d4 1 0
+c2c4 1 0
+"""
+
+import chess
+import collections
+import mmap
+import os
+import random
+import struct
+
+
+ENTRY_STRUCT = struct.Struct(">QHHI")
+
+KEY_STRUCT = struct.Struct(">Q")
+
+
+class Entry(collections.namedtuple("Entry", ["key", "raw_move", "weight", "learn", "move"])):
+    """An entry from a Polyglot opening book."""
+
+    __slots__ = ()
+
+
+class MemoryMappedReader(object):
+    """
+    Maps a Polyglot opening book to memory.
+
+    Use :func:`~chess.polyglot.open_reader()` to open a book.
+    """
+
+    def __init__(self, filename):
+        self.fd = os.open(filename, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+
+        try:
+            self.mmap = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            # Can not map empty files.
+            self.mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.close()
+
+    def __len__(self):
+        if self.mmap is None:
+            return 0
+        else:
+            return self.mmap.size() // ENTRY_STRUCT.size
+
+    def __getitem__(self, index):
+        if self.mmap is None:
+            raise IndexError()
+
+        if index < 0:
+            index = len(self) + index
+
+        try:
+            key, raw_move, weight, learn = ENTRY_STRUCT.unpack_from(self.mmap, index * ENTRY_STRUCT.size)
+        except struct.error:
+            raise IndexError()
+
+        return Entry(key, raw_move, weight, learn, self._decode_move(raw_move))
+
+    def __iter__(self):
+        i = 0
+        size = len(self)
+        while i < size:
+            yield self[i]
+            i += 1
+
+    def _decode_move(self, raw_move):
+        to_square = raw_move & 0x3f
+        from_square = (raw_move >> 6) & 0x3f
+        promotion_part = (raw_move >> 12) & 0x7
+        promotion = promotion_part + 1 if promotion_part else None
+        return chess.Move(from_square, to_square, promotion)
+
+    def _key_at(self, index):
+        return KEY_STRUCT.unpack_from(self.mmap, index * ENTRY_STRUCT.size)[0]
+
+    def bisect_key_left(self, key):
+        """
+        Returns the index of the first entry with the given key (or where
+        it would be inserted). O(log n) in the number of entries.
+        """
+        lo = 0
+        hi = len(self)
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def find_all(self, board, minimum_weight=1, exclude_moves=()):
+        """
+        Seeks a specific position and yields corresponding entries.
+
+        Castling moves are converted from the Polyglot king-takes-rook
+        encoding to the move that is legal on *board*. Entries with illegal
+        moves are skipped.
+        """
+        try:
+            key = int(board.zobrist_hash())
+        except AttributeError:
+            key = int(board)
+            board = None
+
+        i = self.bisect_key_left(key)
+        size = len(self)
+
+        while i < size:
+            entry = self[i]
+            i += 1
+
+            if entry.key != key:
+                break
+
+            if entry.weight < minimum_weight:
+                continue
+
+            move = entry.move
+            if board is not None:
+                move = board._from_chess960(move.from_square, move.to_square, move.promotion)
+                if not board.is_legal(move):
+                    continue
+
+            if move in exclude_moves:
+                continue
+
+            yield entry._replace(move=move)
+
+    def find(self, board, minimum_weight=1, exclude_moves=()):
+        """
+        Finds the main entry for the given position or zobrist hash.
+
+        The main entry is the (first) entry with the highest weight.
+
+        By default entries with weight ``0`` are excluded. This is a common
+        way to delete entries from an opening book without compacting it. Pass
+        *minimum_weight* ``0`` to select all entries.
+
+        Raises :exc:`IndexError` if no entries are found.
+        """
+        try:
+            return max(self.find_all(board, minimum_weight, exclude_moves), key=lambda entry: entry.weight)
+        except ValueError:
+            raise IndexError()
+
+    def get(self, board, default=None, minimum_weight=1, exclude_moves=()):
+        """Like :func:`~chess.polyglot.MemoryMappedReader.find()`, but returns *default* if no entry is found."""
+        try:
+            return self.find(board, minimum_weight, exclude_moves)
+        except IndexError:
+            return default
+
+    def choice(self, board, minimum_weight=1, exclude_moves=(), random=random):
+        """
+        Uniformly selects a random entry for the given position.
+
+        Raises :exc:`IndexError` if no entries are found.
+        """
+        entries = list(self.find_all(board, minimum_weight, exclude_moves))
+        if not entries:
+            raise IndexError()
+        return random.choice(entries)
+
+    def weighted_choice(self, board, exclude_moves=(), random=random):
+        """
+        Selects a random entry for the given position, distributed by the
+        weights of the entries.
+
+        Raises :exc:`IndexError` if no entries are found.
+        """
+        entries = list(self.find_all(board, 1, exclude_moves))
+        total_weights = sum(entry.weight for entry in entries)
+        if not total_weights:
+            raise IndexError()
+
+        choice = random.randint(0, total_weights - 1)
+
+        current_sum = 0
+        for entry in entries:
+            current_sum += entry.weight
+            if current_sum > choice:
+                return entry
+
+        assert False
+
+    def close(self):
+        """Closes the reader."""
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def open_reader(path):
+    """
+    Creates a reader for the file at the given path.
+
+    The following example opens a book to find all entries for the start
+    position:
+
+    >>> import chess
+    >>> import chess.polyglot
+    >>>
+    >>> board = chess.Board()
+    >>>
+    >>> with chess.polyglot.open_reader("data/polyglot/performance.bin") as reader:
+    ...    for entry in reader.find_all(board):
+    ...        print(entry.move, entry.weight, entry.learn)
+    e2e4 1 0
+    d2d4 1 0
+    c2c4 1 0
+    """
+    return MemoryMappedReader(path)
@@ -12,6 +12,6 @@ gettext.install(gv.domain, localedir)
 # translate strings in glade files
 try:
     locale.bindtextdomain(gv.domain, localedir)
-except AttributeError, ae:
+except AttributeError:
     # we get this on windows
     pass
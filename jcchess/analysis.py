@@ -0,0 +1,410 @@
+#
+#   analysis.py - MultiPV analysis of the board position
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import division
+from __future__ import absolute_import
+from gi.repository import Gtk
+from gi.repository import GLib
+import queue
+import threading
+
+import chess
+from . import engine_debug
+from . import eval_cache
+from . import output_throttle
+from . import uci
+from . import gv
+from .constants import ANALYSIS_LINES, ANALYSIS_MAX_LINES, \
+    WAIT_FOR_BESTMOVE
+from .uci_parse import InfoRecord
+
+# requests for the analysis worker thread other than a position to analyse
+STOP = u"stop"
+QUIT = u"quit"
+
+
+#
+# The top lines found by the engine for the position being analysed.
+# Row i holds the line the engine sends with multipv i+1 as a tuple of
+# (score, depth, san, pv) where score is text from white's point of view,
+# san is the pv as text and pv is the tuple of uci moves.
+# A move is only shown in one row. If the engine re-ranks its lines the
+# older row for the same first move is cleared.
+#
+class Analysis_Lines(object):
+
+    def __init__(self, nlines=ANALYSIS_LINES):
+        self.board = chess.Board()
+        self.rows = [None] * nlines
+
+    def set_board(self, board, nlines=None):
+        self.board = board
+        if nlines is None:
+            nlines = len(self.rows)
+        self.rows = [None] * nlines
+
+    # Update the rows from an engine info line.
+    # Returns the list of rows that have changed.
+    def update(self, info):
+        if not info.pv or not info.has_score():
+            return []
+        # a bound is not the score of the line
+        if info.lowerbound or info.upperbound:
+            return []
+        idx = 0
+        if info.multipv is not None:
+            idx = info.multipv - 1
+        if idx < 0 or idx >= len(self.rows):
+            return []
+
+        pv = tuple(info.pv)
+        changed = []
+        for i, row in enumerate(self.rows):
+            if i != idx and row is not None and row[3][0] == pv[0]:
+                self.rows[i] = None
+                changed.append(i)
+
+        old = self.rows[idx]
+        if old is not None and old[3] == pv:
+            san = old[2]
+        else:
+            san = self.get_san(pv)
+        new = (self.format_score(info), unicode(info.depth or u""), san, pv)
+        if new != old:
+            self.rows[idx] = new
+            changed.append(idx)
+        return changed
+
+    # score from white's point of view in pawns
+    def format_score(self, info):
+        sign = 1
+        if self.board.turn == chess.BLACK:
+            sign = -1
+        if info.score_mate is not None:
+            return u"#" + unicode(sign * info.score_mate)
+        return u"%+.2f" % (sign * info.score_cp / 100)
+
+    # uci moves to san with move numbers e.g. 12... Nf6 13. Bg5
+    def get_san(self, pv):
+        board = self.board.copy()
+        words = []
+        for uci_move in pv:
+            try:
+                move = chess.Move.from_uci(uci_move)
+            except ValueError:
+                break
+            if not board.is_legal(move):
+                break
+            if board.turn == chess.WHITE:
+                words.append(unicode(board.fullmove_number) + u".")
+            elif not words:
+                words.append(unicode(board.fullmove_number) + u"...")
+            words.append(board.san(move))
+            board.push(move)
+        return u" ".join(words)
+
+
+class Analysis(object):
+
+    analysis_ref = None
+
+    def __init__(self):
+        Analysis.analysis_ref = self
+        self.window = None
+        self.active = False
+        self.lines = Analysis_Lines()
+        # (fen, moves) being analysed
+        self.position = None
+        # zobrist hash of the position being analysed
+        self.zobrist = None
+        # depth of the line shown from the evaluation cache
+        self.cached_depth = None
+        self.engine_name = None
+        # engine of the search running in the worker thread
+        self.search_engine = None
+        self.uci = None
+        # requests for the worker thread
+        self.requests = queue.Queue()
+        self.worker = None
+        # a check of the board position is queued in the gtk main loop
+        self.change_pending = False
+
+    def build_window(self):
+        self.window = Gtk.Window(Gtk.WindowType.TOPLEVEL)
+        self.window.set_title(_(u"Analysis"))
+        self.window.set_default_size(600, 200)
+        self.window.connect(u"delete_event", self.delete_event)
+
+        vbox = Gtk.VBox(False, 0)
+        hbox = Gtk.HBox(False, 0)
+
+        self.engine_combo = Gtk.ComboBoxText()
+        hbox.pack_start(self.engine_combo, False, False, 5)
+
+        hbox.pack_start(Gtk.Label(_(u"Lines") + u":"), False, False, 5)
+        adj = Gtk.Adjustment(
+            value=len(self.lines.rows), lower=1, upper=ANALYSIS_MAX_LINES,
+            step_increment=1, page_increment=1, page_size=0)
+        self.lines_spin = Gtk.SpinButton.new(adj, 1.0, 0)
+        self.lines_spin.connect(u"value-changed", self.settings_changed)
+        hbox.pack_start(self.lines_spin, False, False, 5)
+
+        self.analyse_button = Gtk.ToggleButton(_(u"Analyse"))
+        self.analyse_button.connect(u"toggled", self.analyse_toggled)
+        hbox.pack_start(self.analyse_button, False, False, 5)
+        vbox.pack_start(hbox, False, False, 5)
+
+        # one row per line. Rows are updated in place as the engine sends
+        # new lines so only the rows that change are redrawn
+        self.store = Gtk.ListStore(str, str, str)
+        tv = Gtk.TreeView(model=self.store)
+        for i, title in enumerate((_(u"Score"), _(u"Depth"), _(u"Line"))):
+            col = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=i)
+            col.set_resizable(True)
+            tv.append_column(col)
+        sw = Gtk.ScrolledWindow()
+        sw.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        sw.add(tv)
+        vbox.pack_start(sw, True, True, 0)
+
+        self.window.add(vbox)
+        self.set_rows(len(self.lines.rows))
+
+    # user has closed the window
+    # stop analysing and hide it
+    def delete_event(self, widget, event):
+        self.analyse_button.set_active(False)
+        self.window.hide()
+        return True  # do not propagate to other handlers
+
+    def show_analysis_window(self, b):
+        if self.window is None:
+            self.build_window()
+        # engines may have been added or removed since last shown
+        self.engine_combo.remove_all()
+        names = [e[0] for e in gv.engine_manager.get_engine_list()]
+        for ename in names:
+            self.engine_combo.append_text(ename)
+        if self.engine_name in names:
+            self.engine_combo.set_active(names.index(self.engine_name))
+        elif names:
+            self.engine_combo.set_active(0)
+        self.window.show_all()
+        self.window.present()
+
+    def set_rows(self, nlines):
+        self.store.clear()
+        for i in xrange(nlines):
+            self.store.append([u"", u"", u""])
+
+    def analyse_toggled(self, widget):
+        if widget.get_active():
+            self.engine_name = self.engine_combo.get_active_text()
+            if self.engine_name is None:
+                widget.set_active(False)
+                return
+            self.engine_combo.set_sensitive(False)
+            self.active = True
+            self.position = None
+            self.position_changed()
+        else:
+            self.active = False
+            self.engine_combo.set_sensitive(True)
+            self.post(STOP)
+
+    def settings_changed(self, widget):
+        if self.active:
+            # restart on the same position with the new number of lines
+            self.position = None
+            self.position_changed()
+        else:
+            self.lines.set_board(self.lines.board, self.get_nlines())
+            self.set_rows(self.get_nlines())
+
+    def get_nlines(self):
+        return self.lines_spin.get_value_as_int()
+
+    # Called by the board whenever its position changes, possibly from
+    # the computer move thread. The position is checked once in the gtk
+    # main loop after the change (e.g. a goto through many moves) is done.
+    def board_changed(self):
+        if not self.active or self.change_pending:
+            return
+        self.change_pending = True
+        GLib.idle_add(self.check_position)
+
+    def check_position(self):
+        self.change_pending = False
+        self.position_changed()
+        return False
+
+    # restart the search if the position has changed
+    def position_changed(self):
+        if not self.active:
+            return
+        board = gv.board.chessboard.copy()
+        moves = [m.uci() for m in board.move_stack]
+        while board.move_stack:
+            board.pop()
+        position = (board.fen(), moves)
+        if position == self.position:
+            return
+        self.position = position
+        if board.fen() == chess.STARTING_FEN:
+            startpos = u"startpos"
+        else:
+            startpos = board.fen()
+        self.post((self.engine_name, startpos, moves,
+                   gv.board.chessboard.copy(), self.get_nlines()))
+
+    # Pass a request to the worker thread. Stopping and starting the
+    # engine can take seconds so it is not done in the gtk main loop.
+    def post(self, request):
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.run_worker)
+            self.worker.daemon = True
+            self.worker.start()
+        self.requests.put(request)
+
+    def run_worker(self):
+        while True:
+            requests = [self.requests.get()]
+            # only the newest position needs analysing
+            while True:
+                try:
+                    requests.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            if QUIT in requests:
+                self.stop_search()
+                if self.uci is not None:
+                    self.uci.stop_engine()
+                return
+            self.stop_search()
+            if requests[-1] is not STOP:
+                self.start_search(*requests[-1])
+
+    # worker thread
+    def stop_search(self):
+        if self.uci is not None:
+            self.uci.soft_stop()
+            self.save_evaluation()
+
+    # worker thread
+    def start_search(self, engine_name, startpos, moves, board, nlines):
+        if self.uci is None:
+            self.uci = uci.Uci(u"a")
+            # send the engine lines here rather than the engine output
+            # window
+            self.uci.throttle = output_throttle.Output_Throttle(
+                self, engine_debug.get_ref())
+        self.uci.set_engine(engine_name, None)
+        self.uci.check_running()
+        if not self.uci.engine_running:
+            GLib.idle_add(self.engine_failed)
+            return
+
+        self.search_engine = engine_name
+        self.zobrist = board.zobrist_hash()
+        self.uci.throttle.clear_output(u"a", engine_name)
+        # the rows must be reset before the first info line of the new
+        # search is shown
+        self.uci.run_in_main_loop(self.show_position, board, nlines,
+                                  self.zobrist)
+        self.uci.command(u"setoption name MultiPV value " +
+                         unicode(nlines) + u"\n")
+        self.uci.set_position(startpos, moves)
+        self.uci.clear_replies()
+        self.uci.last_info = None
+        self.uci.searching = True
+        self.uci.command(u"go infinite\n")
+
+    # gtk main loop
+    def engine_failed(self):
+        gv.gui.set_status_bar_msg(_(u"unable to start engine"))
+        self.analyse_button.set_active(False)
+        return False
+
+    # gtk main loop
+    def show_position(self, board, nlines, zobrist):
+        self.lines.set_board(board, nlines)
+        self.set_rows(nlines)
+        self.cached_depth = None
+        self.show_cached_evaluation(zobrist)
+
+    def get_cache_ident(self):
+        return eval_cache.get_ref().get_ident(
+            self.search_engine, u"analysis")
+
+    # store the best line found for the position just analysed
+    def save_evaluation(self):
+        if self.zobrist is None:
+            return
+        evaluation = self.uci.get_evaluation()
+        if evaluation is not None:
+            eval_cache.get_ref().put(
+                self.zobrist, self.get_cache_ident(), evaluation)
+        self.zobrist = None
+
+    # show the best line from an earlier analysis of the position until
+    # the engine reaches the same depth
+    def show_cached_evaluation(self, zobrist):
+        evaluation = eval_cache.get_ref().get(zobrist, self.get_cache_ident())
+        if evaluation is None:
+            return
+        info = InfoRecord(u"")
+        info.score_cp, info.score_mate, info.depth, pv = evaluation
+        info.pv = list(pv)
+        self.add_to_log(u"a", self.search_engine, info)
+        self.cached_depth = info.depth
+
+    # called by the output throttle in the gtk main loop with the newest
+    # info lines
+    def add_to_log(self, side, engine_name, info):
+        if not self.active:
+            return
+        if self.cached_depth is not None and info.is_main_line():
+            if (info.depth or 0) < self.cached_depth:
+                return
+            self.cached_depth = None
+        for i in self.lines.update(info):
+            row = self.lines.rows[i]
+            it = self.store.iter_nth_child(None, i)
+            if it is None:
+                continue
+            if row is None:
+                self.store.set(it, 0, u"", 1, u"", 2, u"")
+            else:
+                self.store.set(it, 0, row[0], 1, row[1], 2, row[2])
+
+    def clear(self, side, engine_name):
+        pass
+
+    # stop analysing on quit
+    def stop(self):
+        self.active = False
+        if self.worker is not None:
+            self.requests.put(QUIT)
+            self.worker.join(WAIT_FOR_BESTMOVE + 5)
+
+
+def get_ref():
+    if Analysis.analysis_ref is None:
+        Analysis.analysis_ref = Analysis()
+    return Analysis.analysis_ref
@@ -0,0 +1,337 @@
+#
+#   annotate.py - add engine evaluations to the games in a pgn file
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+# example:
+#   jcchess-annotate engines/stockfish-11-linux/src/stockfish games.pgn \
+#       -j 4 --depth 16 -o games-annotated.pgn
+#
+# Each move gets a comment with the evaluation after it (from white's
+# point of view) and depth. Moves that lose too much against the
+# engine's choice get a ?!, ? or ?? nag and a comment with the best line.
+#
+
+from __future__ import division
+from __future__ import absolute_import
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from io import open
+
+import chess
+import chess.pgn
+from . import eval_cache
+from . import gv
+from .match import Match_Engine, Limits, parse_options
+
+# scores are capped at this (centipawns) when comparing moves so that a
+# move from +15 to +8 in a won position is not marked as a mistake
+SCORE_CAP = 1000
+
+
+class Annotate_Engine(Match_Engine):
+
+    # Search the position and return the evaluation as a tuple of
+    # (score in centipawns, mate in or None, depth, pv) from the side to
+    # move's point of view. Returns None if the engine fails.
+    def evaluate(self, fen, limits):
+        self.set_position(fen, [])
+        bestmove, ponder_move = self.go(
+            limits.get_go_command({}), limits.get_timeout({}, None))
+        if bestmove is None:
+            return None
+        return self.get_evaluation()
+
+
+# capped centipawn score used to compare evaluations
+def get_cp(evaluation):
+    cp, mate, depth, pv = evaluation
+    if mate is not None:
+        if mate > 0:
+            return SCORE_CAP
+        return -SCORE_CAP
+    return max(-SCORE_CAP, min(SCORE_CAP, cp))
+
+
+# evaluation as text from white's point of view e.g. +0.35/18 or #-3/22
+def format_evaluation(evaluation, turn):
+    cp, mate, depth, pv = evaluation
+    sign = 1
+    if turn == chess.BLACK:
+        sign = -1
+    if mate is not None:
+        score = u"#" + unicode(sign * mate)
+    else:
+        score = u"%+.2f" % (sign * cp / 100)
+    return score + u"/" + unicode(depth)
+
+
+# pv as san. Stops at the first illegal move.
+def get_san(board, pv):
+    moves = []
+    b = board.copy()
+    for uci_move in pv:
+        try:
+            move = chess.Move.from_uci(uci_move)
+        except ValueError:
+            break
+        if not b.is_legal(move):
+            break
+        moves.append(move)
+        b.push(move)
+    return board.variation_san(moves)
+
+
+#
+# Evaluate every position in a set of games with a number of engines in
+# parallel. Each position is only searched once even if it occurs in
+# more than one game (or more than once in a game) as the results are
+# keyed by the zobrist hash.
+#
+class Annotator(object):
+
+    # cache is an eval_cache.Eval_Cache or None to always search
+    def __init__(self, path, options, limits, nengines=1, cache=None):
+        self.path = path
+        self.options = options
+        self.limits = limits
+        self.nengines = max(1, nengines)
+        self.cache = cache
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        # zobrist hash -> evaluation
+        self.evaluations = {}
+        self.queued = set()
+        self.npositions = 0
+        self.nsearched = 0
+        self.ncached = 0
+        self.abort = False
+
+    # queue each position of the game's main line for evaluation
+    def add_game(self, game):
+        board = game.board()
+        node = game
+        while True:
+            self.npositions += 1
+            key = board.zobrist_hash()
+            if key not in self.queued and not board.is_game_over():
+                self.queued.add(key)
+                self.jobs.put((key, board.fen()))
+            if not node.variations:
+                break
+            node = node.variation(0)
+            board.push(node.move)
+
+    def worker(self):
+        e = Annotate_Engine(self.path, self.options)
+        try:
+            if not e.start_engine():
+                print u"unable to start engine", self.path
+                self.abort = True
+                return
+            gocmnd = self.limits.get_go_command({})
+            if self.cache is not None:
+                ident = self.cache.get_ident(
+                    e.get_name() + u" " + repr(self.options), gocmnd)
+            while not self.abort:
+                try:
+                    key, fen = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if self.cache is not None:
+                    evaluation = self.cache.get(key, ident)
+                    if evaluation is not None:
+                        with self.lock:
+                            self.ncached += 1
+                            self.evaluations[key] = evaluation
+                        continue
+
+                evaluation = e.evaluate(fen, self.limits)
+                if evaluation is not None and self.cache is not None:
+                    self.cache.put(key, ident, evaluation)
+                if evaluation is None and not e.engine_running:
+                    # engine has crashed. restart it
+                    if not e.start_engine():
+                        self.abort = True
+                        break
+                with self.lock:
+                    self.nsearched += 1
+                    if evaluation is not None:
+                        self.evaluations[key] = evaluation
+                    if gv.verbose or self.nsearched % 100 == 0:
+                        print u"%d/%d positions searched" % (
+                            self.nsearched, len(self.queued))
+        finally:
+            e.stop_engine()
+
+    # evaluate all the queued positions
+    def run(self):
+        workers = []
+        for i in xrange(min(self.nengines, len(self.queued))):
+            t = threading.Thread(target=self.worker)
+            t.daemon = True
+            t.start()
+            workers.append(t)
+        try:
+            for t in workers:
+                # join with a timeout so ctrl-c is not blocked
+                while t.is_alive():
+                    t.join(1)
+        except KeyboardInterrupt:
+            print u"interrupted, annotating positions searched so far"
+            self.abort = True
+            for t in workers:
+                t.join()
+
+    # Add the evaluations as comments and nags to the game's main line.
+    # thresholds is (dubious, mistake, blunder) in centipawns lost.
+    def annotate_game(self, game, thresholds):
+        dubious, mistake, blunder = thresholds
+        board = game.board()
+        node = game
+        while node.variations:
+            child = node.variation(0)
+            before = self.evaluations.get(board.zobrist_hash())
+            parent_board = board.copy()
+            board.push(child.move)
+            after = self.evaluations.get(board.zobrist_hash())
+
+            words = []
+            if after is not None:
+                words.append(format_evaluation(after, board.turn))
+
+            if before is not None and after is not None and \
+                    before[3][0] != child.move.uci():
+                # centipawns lost by the move from the mover's view
+                loss = get_cp(before) + get_cp(after)
+                nag = None
+                if loss >= blunder:
+                    nag = chess.pgn.NAG_BLUNDER
+                elif loss >= mistake:
+                    nag = chess.pgn.NAG_MISTAKE
+                elif loss >= dubious:
+                    nag = chess.pgn.NAG_DUBIOUS_MOVE
+                if nag is not None:
+                    child.nags.add(nag)
+                    words.append(u"Best: " + get_san(parent_board, before[3]) +
+                                 u" " + format_evaluation(
+                                     before, parent_board.turn))
+
+            if words:
+                if child.comment:
+                    words.insert(0, child.comment)
+                child.comment = u" ".join(words)
+            node = child
+
+        game.headers["Annotator"] = os.path.basename(self.path)
+
+
+def read_games(path):
+    games = []
+    with open(path, encoding=u"utf-8-sig", errors=u"replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            games.append(game)
+    return games
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog=u"jcchess-annotate",
+        description=u"Annotate the games in a pgn file with a UCI engine")
+    parser.add_argument(u"engine", help=u"path to engine")
+    parser.add_argument(u"pgn", help=u"pgn file to annotate")
+    parser.add_argument(u"-o", u"--output",
+                        help=u"pgn file to write (default <pgn>-annotated)")
+    parser.add_argument(u"-j", u"--engines", type=int, default=1,
+                        help=u"number of engines to run at once")
+    parser.add_argument(u"--depth", type=int, help=u"depth per position")
+    parser.add_argument(u"--nodes", type=int, help=u"nodes per position")
+    parser.add_argument(u"--movetime", type=int,
+                        help=u"time per position in milliseconds")
+    parser.add_argument(u"--option", action=u"append", default=[],
+                        metavar=u"NAME=VALUE",
+                        help=u"UCI option for the engine (can be repeated)")
+    parser.add_argument(u"--dubious", type=int, default=50,
+                        help=u"centipawns lost for ?! (default 50)")
+    parser.add_argument(u"--mistake", type=int, default=100,
+                        help=u"centipawns lost for ? (default 100)")
+    parser.add_argument(u"--blunder", type=int, default=300,
+                        help=u"centipawns lost for ?? (default 300)")
+    parser.add_argument(u"--no-cache", action=u"store_true",
+                        help=u"do not use the evaluation cache")
+    parser.add_argument(u"-v", u"--verbose", action=u"store_true")
+    parser.add_argument(u"-vuci", action=u"store_true",
+                        help=u"show uci commands")
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    gv.verbose = args.verbose
+    gv.verbose_uci = args.vuci
+
+    try:
+        options = parse_options(args.option)
+    except ValueError, ve:
+        print ve
+        return 1
+
+    depth = args.depth
+    if depth is None and args.nodes is None and args.movetime is None:
+        depth = 12
+    limits = Limits(args.movetime, args.nodes, depth)
+
+    output = args.output
+    if output is None:
+        root, ext = os.path.splitext(args.pgn)
+        output = root + u"-annotated" + ext
+
+    t_start = time.time()
+    games = read_games(args.pgn)
+    cache = None
+    if not args.no_cache:
+        cache = eval_cache.get_ref()
+    annotator = Annotator(args.engine, options, limits, args.engines, cache)
+    for game in games:
+        annotator.add_game(game)
+    print u"%d games, %d positions, %d to search" % (
+        len(games), annotator.npositions, len(annotator.queued))
+
+    annotator.run()
+
+    thresholds = (args.dubious, args.mistake, args.blunder)
+    with open(output, u"w", encoding=u"utf-8") as f:
+        for game in games:
+            annotator.annotate_game(game, thresholds)
+            f.write(unicode(game) + u"\n\n")
+
+    print u"%d positions searched, %d from cache in %.1f seconds, " \
+          u"written to %s" % (annotator.nsearched, annotator.ncached,
+                              time.time() - t_start, output)
+    if cache is not None:
+        cache.close()
+    return 0
+
+
+if __name__ == u"__main__":
+    sys.exit(main())
@@ -33,6 +33,7 @@ from datetime import datetime
 
 import chess
 import chess.pgn
+from . import analysis
 from . import gv
 from .constants import WHITE, BLACK
 
@@ -52,6 +53,7 @@ class Board(object):
             self.chessboard = chess.Board() # init board
         else:
             self.chessboard = chess.Board(fen)    
+        self.clear_legal_move_cache()
         
     def build_board(self):
         GObject.idle_add(self.update)
@@ -130,19 +132,28 @@ class Board(object):
     # on a square.
     def set_piece_at_square(self, x, y, piece, colour):
         self.chessboard.set_piece_at(chess.square(x, y), chess.Piece(piece, colour))       
+        self.clear_legal_move_cache()
         GLib.idle_add(gv.gui.get_event_box(x, y).queue_draw)
         
     # called from gui.py to remove piece during promotion dialog
     def remove_piece_at_square(self, x, y):
         piece=self.chessboard.remove_piece_at(chess.square(x, y))       
+        self.clear_legal_move_cache()
         GLib.idle_add(gv.gui.get_event_box(x, y).queue_draw)
         return piece
 
     # called when user does a "clear board" in board edit
     def clear_board(self):
         self.chessboard.clear()
+        self.clear_legal_move_cache()
         self.update()
 
+    # called from gui.py when editing the board position to set the side
+    # to move
+    def set_turn(self, colour):
+        self.chessboard.turn = colour
+        self.clear_legal_move_cache()
+
     def set_image_cairo(self, x, y, cr=None, widget=None):
         piece = self.get_piece(x, y)
 
@@ -223,11 +234,58 @@ class Board(object):
 
     def get_legal_moves(self):
         return self.chessboard.legal_moves
+
+    #
+    # The legal moves of the current position are cached for the gui which
+    # asks about them many times (clicks, drag and drop) for the same
+    # position. legal_targets is a list of 64 bitboards of the squares the
+    # piece on each square can move to and legal_packed the set of moves
+    # packed by chess.pack_move().
+    # The cache must be cleared whenever the position changes, so this is
+    # also where the analysis window is told of the change.
+    #
+    def clear_legal_move_cache(self):
+        self.legal_targets = None
+        self.legal_all_targets = chess.BB_VOID
+        self.legal_packed = None
+        analysis.get_ref().board_changed()
+
+    def build_legal_move_cache(self):
+        targets = [chess.BB_VOID] * 64
+        all_targets = chess.BB_VOID
+        packed = self.chessboard.packed_legal_moves()
+        for pmove in packed:
+            bb = chess.BB_SQUARES[pmove >> 6 & 0x3f]
+            targets[pmove & 0x3f] |= bb
+            all_targets |= bb
+        self.legal_targets = targets
+        self.legal_all_targets = all_targets
+        self.legal_packed = frozenset(packed)
+
+    # test if cmove (a chess.Move) is legal in the current position
+    def is_legal_move(self, cmove):
+        if self.legal_packed is None:
+            self.build_legal_move_cache()
+        return not cmove.drop and chess.pack_move(cmove) in self.legal_packed
+
+    # bitboard of the squares the piece at x, y can legally move to
+    def get_legal_targets(self, x, y):
+        if self.legal_targets is None:
+            self.build_legal_move_cache()
+        return self.legal_targets[chess.square(x, y)]
+
+    # bitboard of the squares any piece can legally move to
+    def get_all_legal_targets(self):
+        if self.legal_targets is None:
+            self.build_legal_move_cache()
+        return self.legal_all_targets
         
     def add_move(self, cmove):    
         self.chessboard.push(cmove)
+        self.clear_legal_move_cache()
         
     def remove_move(self):
+        self.clear_legal_move_cache()
         return self.chessboard.pop()
         
     def print_board(self):
@@ -28,6 +28,45 @@ NEUTRAL = 2
 # Drag and Drop
 TARGET_TYPE_TEXT = 1180
 
+# Maximum number of times a second that engine output is passed to the
+# engine output and engine debug windows
+ENGINE_OUTPUT_FPS=20
+
+# Number of lines kept in each pane of the engine output window
+ENGINE_OUTPUT_MAX_LINES=200
+
+# Number of lines kept in the engine debug window
+DEBUG_LOG_MAX_LINES=5000
+
+# Set to True to also write the engine debug log to engine_debug.log in
+# the .jcchess directory. The file is rotated when it reaches
+# DEBUG_LOG_FILE_SIZE bytes keeping DEBUG_LOG_FILE_COUNT old files
+DEBUG_LOG_SPILL=False
+DEBUG_LOG_FILE_SIZE=10*1024*1024
+DEBUG_LOG_FILE_COUNT=3
+
+# Time to wait for response to "uci" in seconds
+WAIT_FOR_UCIOK=10
+
 # Time to wait for response to "isready" in seconds
 WAIT_FOR_READYOK=15
 
+# Time to wait for bestmove after sending "stop" in seconds
+WAIT_FOR_BESTMOVE=5
+
+# Number of idle engine processes kept running for reuse
+ENGINE_POOL_SIZE=4
+# Idle engine processes are shut down after this many seconds
+ENGINE_POOL_IDLE_TIME=600
+
+# Number of lines shown in the analysis window (MultiPV)
+ANALYSIS_LINES=3
+ANALYSIS_MAX_LINES=10
+
+# Evaluation cache in the .jcchess directory
+EVAL_CACHE_FILE=u"eval_cache.bin"
+# Size in bytes at which the evaluation cache is cut to half
+EVAL_CACHE_SIZE=64*1024*1024
+
+# Polyglot opening book in the .jcchess directory (or data/ in prefix)
+BOOK_FILE=u"book.bin"
@@ -20,9 +20,14 @@
 from __future__ import absolute_import
 from gi.repository import Gtk
 from gi.repository import GObject
+import collections
+import logging
+import logging.handlers
 import os
 
 from .constants import WHITE, BLACK
+from .constants import DEBUG_LOG_MAX_LINES, DEBUG_LOG_SPILL
+from .constants import DEBUG_LOG_FILE_SIZE, DEBUG_LOG_FILE_COUNT
 from . import gv
 
 
@@ -35,10 +40,32 @@ class Engine_Debug(object):
         self.glade_file = os.path.join(glade_dir, u"engine_debug.glade")
         Engine_Debug.engine_debug_ref = self
 
-        self.debug_text = u""
+        # only the most recent lines are kept in memory. If
+        # DEBUG_LOG_SPILL is set every line is also written to a rotating
+        # log file in the .jcchess directory
+        self.debug_lines = collections.deque(maxlen=DEBUG_LOG_MAX_LINES)
+        self.spill_log = None
+        if DEBUG_LOG_SPILL:
+            self.open_spill_log()
         self.window = None
 
+    def open_spill_log(self):
+        logfile = os.path.join(gv.jcchess.jcchesspath, u"engine_debug.log")
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                logfile, maxBytes=DEBUG_LOG_FILE_SIZE,
+                backupCount=DEBUG_LOG_FILE_COUNT)
+        except IOError, ioe:
+            print u"unable to open engine debug log file:", ioe
+            return
+        handler.setFormatter(logging.Formatter(u"%(asctime)s %(message)s"))
+        self.spill_log = logging.getLogger(u"jcchess.engine_debug")
+        self.spill_log.propagate = False
+        self.spill_log.setLevel(logging.INFO)
+        self.spill_log.addHandler(handler)
+
     def clear_text(self, b):
+        self.debug_lines.clear()
         self.tb.set_text(u"")
 
     # send command to engine1 (white)
@@ -73,18 +100,34 @@ class Engine_Debug(object):
         self.window.hide()
         return True  # do not propagate to other handlers
 
+    # msg may contain several lines
     def add_to_log(self, msg):
-        msg = msg + u"\n"
+        lines = msg.split(u"\n")
+        self.debug_lines.extend(lines)
+        if self.spill_log is not None:
+            for l in lines:
+                self.spill_log.info(l)
         try:
             # append to end of buffer
             end_iter = self.tb.get_end_iter()
-            self.tb.insert(end_iter, msg)
-            # scroll to end
-            GObject.idle_add(self.scroll_to_end)
+            self.tb.insert(end_iter, msg + u"\n")
         except AttributeError:
-            # engine debug window has not been opened. Append the debug
-            # messages until it is opened
-            self.debug_text += msg
+            # engine debug window has not been opened. The lines are in
+            # self.debug_lines ready for when it is
+            return
+        self.trim_buffer()
+        # scroll to end
+        GObject.idle_add(self.scroll_to_end)
+
+    # remove lines from the start of the text buffer so it only holds
+    # the tail of the log
+    def trim_buffer(self):
+        # the buffer always has an empty last line after the final newline
+        excess = self.tb.get_line_count() - 1 - DEBUG_LOG_MAX_LINES
+        if excess > 0:
+            start_iter = self.tb.get_start_iter()
+            end_iter = self.tb.get_iter_at_line(excess)
+            self.tb.delete(start_iter, end_iter)
 
     def show_debug_window(self, b):
 
@@ -106,8 +149,8 @@ class Engine_Debug(object):
         self.tv = self.builder.get_object(u"engine_debug_textview")
         self.tv.set_editable(False)
         self.tb = self.tv.get_buffer()
-        self.tb.set_text(self.debug_text)
-        self.debug_text = u""
+        if self.debug_lines:
+            self.tb.set_text(u"\n".join(self.debug_lines) + u"\n")
 
         # used to type commands and send them to the engine
         self.cmd_entry = self.builder.get_object(u"engine_debug_entry")
@@ -37,6 +37,8 @@ class Engine_Manager(object):
         self.glade_file = None
         self.hash_value = 256
         self.ponder = False
+        # play moves from the opening book (book.bin) when there is one
+        self.use_book = True
         # bundled engines directory
         self.bedir = os.path.join(os.path.dirname(utils.get_prefix()), u"engines")
 
@@ -55,6 +57,9 @@ class Engine_Manager(object):
         # ponder check button
         checkbutton = self.builder.get_object(u"ponderbutton")
         checkbutton.set_active(self.ponder)
+        # opening book check button
+        bookbutton = self.builder.get_object(u"bookbutton")
+        bookbutton.set_active(self.use_book)
 
         # hash value
         adj = self.builder.get_object(u"adjustment1")
@@ -72,6 +77,7 @@ class Engine_Manager(object):
         if response == resp_ok:
             self.hash_value = int(adj.get_value())
             self.ponder = checkbutton.get_active()
+            self.use_book = bookbutton.get_active()
 
         dialog.destroy()
 
@@ -81,6 +87,12 @@ class Engine_Manager(object):
     def set_ponder(self, ponder):
         self.ponder = ponder
 
+    def get_use_book(self):
+        return self.use_book
+
+    def set_use_book(self, use_book):
+        self.use_book = use_book
+
     def get_hash_value(self):
         return self.hash_value
 
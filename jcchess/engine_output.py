@@ -24,6 +24,7 @@ from gi.repository import Pango
 import os
 
 from . import gv
+from .constants import ENGINE_OUTPUT_MAX_LINES
 
 
 class Engine_Output(object):
@@ -84,6 +85,9 @@ class Engine_Output(object):
         self.currmove_lbl[1] = self.builder.get_object(
             u"engine_output_currmove_lbl2")
 
+        # (multipv, depth, has pv) of the line at the top of each pane
+        self.top_key = [None, None]
+
         # self.window.show_all()
 
     # user has closed the window
@@ -93,12 +97,9 @@ class Engine_Output(object):
         return True  # do not propagate to other handlers
 
     def format_time(self, ztime):
-        if ztime == u"":
-            return ztime
-        try:
-            ms = int(ztime)
-        except:
-            return ztime
+        if ztime is None:
+            return u""
+        ms = ztime
         secs = int(ms / 1000)
         mins = 0
         if secs > 60:
@@ -112,54 +113,41 @@ class Engine_Output(object):
             ssecs = u"0" + ssecs
         return smins + u":" + ssecs
 
-    def add_to_log(self, side, engine_name, msg):
+    def format_score(self, info):
+        if info.score_cp is not None:
+            return unicode(info.score_cp)
+        elif info.score_mate is not None:
+            return u"mate " + unicode(info.score_mate)
+        return u""
+
+    # info is a uci.InfoRecord parsed from the engine info line
+    def add_to_log(self, side, engine_name, info):
         # Write to either the black or white split pane
         if side == u"b":
             idx = 1   # bottom pane for black
         else:
             idx = 0   # top pane for white
 
-        msg = msg + u"\n"
-
-        ztime = u""
         nodes = u""
+        if info.nodes is not None:
+            nodes = unicode(info.nodes)
         depth = u""
+        if info.depth is not None:
+            depth = unicode(info.depth)
         nps = u""
+        if info.nps is not None:
+            nps = unicode(info.nps)
         pv = u""
-        currmove = u""
-        score = u""
-        msg_lst = msg.split()
-        for i in xrange(0, len(msg_lst)):
-            if msg_lst[i] == u"time":
-                ztime = msg_lst[i + 1]
-            elif msg_lst[i] == u"nodes":
-                nodes = msg_lst[i + 1]
-            elif msg_lst[i] == u"depth":
-                depth = msg_lst[i + 1]
-            elif msg_lst[i] == u"nps":
-                nps = msg_lst[i + 1]
-            elif msg_lst[i] == u"currmove":
-                currmove = msg_lst[i + 1]
-            elif msg_lst[i] == u"score":
-                score = msg_lst[i + 1]
-                if score == u"cp":
-                    score = msg_lst[i + 2]
-                elif score == u"mate":
-                    score = score + u" " + msg_lst[i + 2]
-            elif msg_lst[i] == u"pv":
-                pv_lst = msg_lst[i + 1:]
-                for p in pv_lst:
-                    pv = pv + p + u"  "
-
-        ztime = self.format_time(ztime)
+        if info.pv:
+            pv = u"  ".join(info.pv) + u"  "
+
+        ztime = self.format_time(info.time)
+        score = self.format_score(info)
         zmsg = (depth + u"\t" + nodes + u"\t" + ztime + u"\t" +
                 score + u"\t" + pv + u"\n")
 
-        # insert at start of buffer
-        start_iter = self.tb[idx].get_start_iter()
-
         if ztime != u"" or nodes != u"" or depth != u"" or pv != u"":
-            self.tb[idx].insert(start_iter, zmsg)
+            self.insert_line(idx, (info.multipv, info.depth, pv != u""), zmsg)
 
         self.nps_lbl[idx].set_text(u"NPS: " + nps)
         u"""
@@ -182,8 +170,28 @@ class Engine_Output(object):
             s = _(u"White") + u": "
         self.engine_name_lbl[idx].set_text(s + engine_name)
 
-        if currmove != u"":
-            self.currmove_lbl[idx].set_text(_(u"Current Move") + u": " + currmove)
+        if info.currmove is not None:
+            self.currmove_lbl[idx].set_text(
+                _(u"Current Move") + u": " + info.currmove)
+
+    # Insert a line at the start of the pane. If the line at the top is
+    # for the same depth and multipv it is replaced rather than adding
+    # another line. The pane is limited to ENGINE_OUTPUT_MAX_LINES so
+    # memory use and the cost of each update do not grow during long
+    # analysis.
+    def insert_line(self, idx, key, zmsg):
+        tb = self.tb[idx]
+        if key == self.top_key[idx]:
+            tb.delete(tb.get_start_iter(), tb.get_iter_at_line(1))
+        self.top_key[idx] = key
+
+        # insert at start of buffer
+        tb.insert(tb.get_start_iter(), zmsg)
+
+        # the buffer always has an empty last line after the final newline
+        if tb.get_line_count() - 1 > ENGINE_OUTPUT_MAX_LINES:
+            tb.delete(
+                tb.get_iter_at_line(ENGINE_OUTPUT_MAX_LINES), tb.get_end_iter())
 
     def clear(self, side, engine_name):
         # Write to either the black or white split pane
@@ -193,6 +201,7 @@ class Engine_Output(object):
             idx = 0   # top pane for white
 
         self.tb[idx].set_text(u"")
+        self.top_key[idx] = None
 
         if side == u"b":
             s = _(u"Black") + u": "
@@ -0,0 +1,142 @@
+#
+#   engine_pool.py - keep idle engine processes for reuse
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import division
+from __future__ import absolute_import
+import threading
+import time
+
+from . import gv
+from .constants import ENGINE_POOL_SIZE, ENGINE_POOL_IDLE_TIME
+from .uci_engine import Uci_Engine
+
+
+#
+# When a player's engine is changed the old engine process is put in the
+# pool rather than stopped. If the same engine (with the same options) is
+# wanted again the process is taken from the pool, so there is no wait
+# for it to start and allocate its hash table.
+# At most max_idle processes are kept. The least recently used is shut
+# down to make room and processes idle for more than idle_time seconds
+# are shut down the next time the pool is used.
+#
+class Engine_Pool(object):
+
+    engine_pool_ref = None
+
+    def __init__(self, max_idle=ENGINE_POOL_SIZE,
+                 idle_time=ENGINE_POOL_IDLE_TIME):
+        Engine_Pool.engine_pool_ref = self
+        self.max_idle = max_idle
+        self.idle_time = idle_time
+        self.lock = threading.Lock()
+        # list of (key, time released, Uci_Engine holding the process)
+        # with the most recently used last
+        self.idle = []
+
+    # processes can only be shared between uses with the same engine and
+    # options
+    def get_key(self, path, options):
+        return (path, tuple(sorted(
+            (unicode(name), unicode(value)) for name, value in options)))
+
+    # Give engine an idle process for path/options, reset for a new game.
+    # Returns False if there is none in the pool.
+    def acquire(self, engine, path, options):
+        key = self.get_key(path, options)
+        self.evict_expired()
+        while True:
+            holder = None
+            with self.lock:
+                for i in xrange(len(self.idle) - 1, -1, -1):
+                    if self.idle[i][0] == key:
+                        holder = self.idle.pop(i)[2]
+                        break
+            if holder is None:
+                return False
+
+            if holder.p.poll() is None:
+                holder.clear_replies()
+                holder.command(u"ucinewgame\n")
+                if holder.wait_ready():
+                    if gv.verbose:
+                        print u"reusing engine process pid", holder.p.pid
+                    holder.hand_over(engine)
+                    return True
+            # process has died or is not responding
+            holder.stop_engine()
+
+    # Take the process from engine and keep it for reuse
+    def release(self, engine, path, options):
+        if not engine.engine_running:
+            return
+        if engine.is_searching():
+            engine.soft_stop()
+            if not engine.engine_running:
+                return
+        self.reset_multipv(engine, options)
+
+        holder = Uci_Engine()
+        engine.hand_over(holder)
+        holder.clear_replies()
+        evicted = []
+        with self.lock:
+            self.idle.append(
+                (self.get_key(path, options), time.time(), holder))
+            while len(self.idle) > self.max_idle:
+                evicted.append(self.idle.pop(0)[2])
+        for e in evicted:
+            e.stop_engine()
+        self.evict_expired()
+
+    # MultiPV is set directly by analysis and is not part of the pool key.
+    # Put it back to the value in options (or the engine default) so the
+    # next user of the process does not get extra lines.
+    def reset_multipv(self, engine, options):
+        for opt in engine.uci_option:
+            if opt[0] == u"MultiPV":
+                value = dict(options).get(u"MultiPV", opt[2])
+                engine.command(u"setoption name MultiPV value " +
+                               unicode(value) + u"\n")
+                return
+
+    # shut down processes that have been idle for too long
+    def evict_expired(self):
+        cutoff = time.time() - self.idle_time
+        with self.lock:
+            evicted = [e for key, t, e in self.idle if t < cutoff]
+            self.idle = [x for x in self.idle if x[1] >= cutoff]
+        for e in evicted:
+            if gv.verbose:
+                print u"stopping idle engine process pid", e.p.pid
+            e.stop_engine()
+
+    # shut down all idle processes (on quit)
+    def close(self):
+        with self.lock:
+            evicted = [e for key, t, e in self.idle]
+            self.idle = []
+        for e in evicted:
+            e.stop_engine()
+
+
+def get_ref():
+    if Engine_Pool.engine_pool_ref is None:
+        Engine_Pool.engine_pool_ref = Engine_Pool()
+    return Engine_Pool.engine_pool_ref
@@ -0,0 +1,339 @@
+#
+#   eval_cache.py - evaluations stored on disk for reuse
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import division
+from __future__ import absolute_import
+import collections
+import hashlib
+import os
+import struct
+import threading
+import zlib
+try:
+    import fcntl
+except ImportError:
+    # no file locking on windows
+    fcntl = None
+
+from . import gv
+from .constants import EVAL_CACHE_FILE, EVAL_CACHE_SIZE
+
+# identifies the file format
+MAGIC = b"JCEC\x00\x00\x00\x02"
+
+# crc32 of the rest of the record (fields and pv text)
+CRC = struct.Struct(u"<I")
+# zobrist hash, engine/limits hash, depth, mate, score cp, flags,
+# length of pv text
+RECORD = struct.Struct(u"<QQhhiBB")
+FLAG_MATE = 1
+
+# go command words whose values change from move to move, or (movetime)
+# whose result depends on the speed and load of the machine. A search
+# with these is not repeatable so is not cached.
+UNCACHEABLE = frozenset((
+    u"wtime", u"btime", u"winc", u"binc", u"movestogo", u"infinite",
+    u"ponder", u"searchmoves", u"movetime"))
+
+
+# True if the result of a search with this go command can be reused
+def is_cacheable(gocmnd):
+    return not UNCACHEABLE.intersection(gocmnd.split())
+
+
+#
+# Evaluations are keyed by the zobrist hash of the position and a hash of
+# the engine name and search limits. An evaluation is a tuple of
+# (score cp, mate in, depth, pv) from the side to move's point of view
+# with either score cp or mate in None.
+#
+# The file is append-only: a header followed by records of a crc, fixed
+# size fields and the pv as text. All records are read into memory on
+# start. Reading stops at the first record with a bad crc.
+# If a key is stored more than once the deepest search is kept.
+# When the file grows past max_size it is rewritten with only the most
+# recently used half of the entries.
+#
+# The gui and jcchess-annotate can share the file. Changes to it are made
+# holding an flock on path + ".lock" (not on windows). A process that
+# finds the file has been rewritten by another opens the new one before
+# appending.
+#
+# The position history (repetitions, 50 move count) is not part of the
+# key so a cached result can differ from a fresh search near a draw.
+#
+class Eval_Cache(object):
+
+    eval_cache_ref = None
+
+    def __init__(self, path=None, max_size=EVAL_CACHE_SIZE):
+        Eval_Cache.eval_cache_ref = self
+        if path is None:
+            path = os.path.join(os.path.expanduser(u"~"), u".jcchess",
+                                EVAL_CACHE_FILE)
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # (zobrist, ident) -> evaluation, least recently used first
+        self.entries = collections.OrderedDict()
+        self.f = None
+        self.lock_file = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    # hash of the engine and search limits
+    def get_ident(self, engine_name, limits):
+        s = (engine_name.strip() + u"|" + limits.strip()).encode(u"utf-8")
+        return struct.unpack(u"<Q", hashlib.md5(s).digest()[:8])[0]
+
+    # take the lock shared with the other processes using the file
+    def lock_path(self):
+        if self.lock_file is not None and fcntl is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+
+    def unlock_path(self):
+        if self.lock_file is not None and fcntl is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            d = os.path.dirname(self.path)
+            if not os.path.exists(d):
+                os.makedirs(d)
+            self.lock_file = open(self.path + u".lock", u"ab")
+        except (IOError, OSError), e:
+            if gv.verbose:
+                print u"evaluation cache not saved:", e
+            self.lock_file = None
+            self.read_records()
+            return
+
+        self.lock_path()
+        try:
+            self.open_file()
+        finally:
+            self.unlock_path()
+
+    # Read the records in the file into entries. Entries already in memory
+    # are kept as more recently used than those read. Returns the size of
+    # the good part of the file or 0 if it is not a cache file.
+    def read_records(self):
+        try:
+            with open(self.path, u"rb") as f:
+                data = f.read()
+        except IOError:
+            data = b""
+
+        old = self.entries
+        self.entries = collections.OrderedDict()
+        try:
+            return self.parse_records(data)
+        finally:
+            for key, evaluation in old.items():
+                self.store(key, evaluation)
+
+    def parse_records(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            return 0
+        good = len(MAGIC)
+        n = len(data)
+        while good + CRC.size + RECORD.size <= n:
+            start = good + CRC.size
+            zobrist, ident, depth, mate, cp, flags, pvlen = \
+                RECORD.unpack_from(data, start)
+            end = start + RECORD.size + pvlen
+            if end > n:
+                break
+            crc, = CRC.unpack_from(data, good)
+            if zlib.crc32(data[start:end]) & 0xffffffff != crc:
+                break
+            pv = data[start + RECORD.size:end].decode(u"ascii", u"replace")
+            self.store((zobrist, ident),
+                       self.make_evaluation(depth, mate, cp, flags, pv))
+            good = end
+        return good
+
+    # Read the file and open it for appending. A missing file or one that
+    # is not a cache file is started again and a partly written or
+    # damaged record at the end is dropped.
+    # Must be called with the file locked.
+    def open_file(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        good = self.read_records()
+        try:
+            if good == 0:
+                # new file (or not a cache file)
+                with open(self.path, u"wb") as f:
+                    f.write(MAGIC)
+            elif good < os.path.getsize(self.path):
+                with open(self.path, u"r+b") as f:
+                    f.truncate(good)
+            # append mode so that every write goes to the current end
+            self.f = open(self.path, u"ab")
+            self.size = os.fstat(self.f.fileno()).st_size
+        except (IOError, OSError), e:
+            if gv.verbose:
+                print u"evaluation cache not saved:", e
+            self.f = None
+
+    # True if another process has replaced (compacted) the file since
+    # it was opened. Must be called with the file locked.
+    def is_replaced(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return True
+        fst = os.fstat(self.f.fileno())
+        return (st.st_ino, st.st_dev) != (fst.st_ino, fst.st_dev)
+
+    def make_evaluation(self, depth, mate, cp, flags, pv):
+        if flags & FLAG_MATE:
+            return (None, mate, depth, tuple(pv.split()))
+        return (cp, None, depth, tuple(pv.split()))
+
+    # keep the deepest evaluation for key. Returns True if stored
+    def store(self, key, evaluation):
+        old = self.entries.pop(key, None)
+        if old is not None and old[2] > evaluation[2]:
+            self.entries[key] = old
+            return False
+        self.entries[key] = evaluation
+        return True
+
+    def get(self, zobrist, ident):
+        key = (zobrist, ident)
+        with self.lock:
+            evaluation = self.entries.pop(key, None)
+            if evaluation is None:
+                self.misses += 1
+                return None
+            # move to most recently used
+            self.entries[key] = evaluation
+            self.hits += 1
+            return evaluation
+
+    def put(self, zobrist, ident, evaluation):
+        cp, mate, depth, pv = evaluation
+        if depth is None or not pv:
+            return
+        with self.lock:
+            if not self.store((zobrist, ident), evaluation):
+                return
+            if self.f is None:
+                return
+            self.lock_path()
+            try:
+                if self.is_replaced():
+                    self.open_file()
+                    if self.f is None:
+                        return
+                self.f.write(self.pack(zobrist, ident, evaluation))
+                self.f.flush()
+                self.size = os.fstat(self.f.fileno()).st_size
+                if self.size > self.max_size:
+                    self.compact()
+            finally:
+                self.unlock_path()
+
+    def pack(self, zobrist, ident, evaluation):
+        cp, mate, depth, pv = evaluation
+        pvtext = u" ".join(pv).encode(u"ascii", u"replace")
+        if len(pvtext) > 255:
+            pvtext = pvtext[:pvtext.rfind(b" ", 0, 256)]
+        flags = 0
+        if mate is not None:
+            flags = FLAG_MATE
+            cp = 0
+        else:
+            mate = 0
+        depth = min(depth, 32767)
+        rec = RECORD.pack(zobrist, ident, depth, mate, cp, flags,
+                          len(pvtext)) + pvtext
+        return CRC.pack(zlib.crc32(rec) & 0xffffffff) + rec
+
+    # Rewrite the file with the most recently used entries that fit in
+    # half of max_size. Must be called with lock held and the file
+    # locked.
+    def compact(self):
+        # include the records other processes have added
+        self.read_records()
+        records = []
+        size = len(MAGIC)
+        for key in reversed(self.entries):
+            rec = self.pack(key[0], key[1], self.entries[key])
+            if size + len(rec) > self.max_size // 2:
+                break
+            records.append((key, rec))
+            size += len(rec)
+        records.reverse()
+
+        entries = collections.OrderedDict()
+        for key, rec in records:
+            entries[key] = self.entries[key]
+        self.entries = entries
+
+        tmp = self.path + u".tmp"
+        self.f.close()
+        self.f = None
+        try:
+            with open(tmp, u"wb") as f:
+                f.write(MAGIC)
+                for key, rec in records:
+                    f.write(rec)
+            # rename does not replace an existing file on windows
+            if os.name == u"nt":
+                os.remove(self.path)
+            os.rename(tmp, self.path)
+            self.f = open(self.path, u"ab")
+            self.size = os.fstat(self.f.fileno()).st_size
+        except (IOError, OSError), e:
+            if gv.verbose:
+                print u"evaluation cache not saved:", e
+            return
+        if gv.verbose:
+            print u"evaluation cache compacted to", len(self.entries), \
+                u"entries"
+
+    def get_stats(self):
+        return len(self.entries), self.hits, self.misses
+
+    def close(self):
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+            if self.lock_file is not None:
+                self.lock_file.close()
+                self.lock_file = None
+
+
+# the gui can ask for the cache from more than one thread at once (the
+# analysis worker and the computer move thread)
+get_ref_lock = threading.Lock()
+
+
+def get_ref():
+    with get_ref_lock:
+        if Eval_Cache.eval_cache_ref is None:
+            Eval_Cache.eval_cache_ref = Eval_Cache()
+    return Eval_Cache.eval_cache_ref
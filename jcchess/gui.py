@@ -31,6 +31,7 @@ from datetime import date
 
 from . import engine_debug
 from . import engine_output
+from . import analysis
 from . import move_list
 from . import drag_and_drop
 from . import load_save
@@ -59,6 +60,7 @@ class Gui(object):
         self.promotion_piece = u'q'
         self.engine_debug = engine_debug.get_ref()
         self.engine_output = engine_output.get_ref()
+        self.analysis = analysis.get_ref()
         self.move_list = move_list.get_ref()
         self.gamelist = gamelist.get_ref()
         self.drag_and_drop = drag_and_drop.get_ref()
@@ -182,6 +184,8 @@ class Gui(object):
              _("Engine Output"), self.engine_output.show_engine_output_window),
             ("EngineDebug", None, _("_Engine Debug"), None,
              _("Engine Debug"), self.engine_debug.show_debug_window),
+            ("Analysis", None, _("_Analysis"), None,
+             _("Analysis"), self.analysis.show_analysis_window),
             ("Options", None, _("_Options")),
             ("View", None, _("_View")),
             ("About", Gtk.STOCK_ABOUT, _("_About"), None,
@@ -308,6 +312,7 @@ class Gui(object):
                 <menuitem action="GameList"/>
                 <menuitem action="EngineOutput"/>
                 <menuitem action="EngineDebug"/>
+                <menuitem action="Analysis"/>
             </menu>
             <menu action="Help">
                 <menuitem action="About"/>
@@ -781,6 +786,9 @@ class Gui(object):
             self.unset_all_drag_and_drop_squares
             return
 
+        # squares any piece can legally move to
+        all_targets = gv.board.get_all_legal_targets()
+
         for x in xrange(8):
             for y in xrange(8):
                 # set default to unset (no square can be dragged or dropped
@@ -793,13 +801,13 @@ class Gui(object):
                     continue
 
                 # player is human so allow a square to be dragged if it
-                # contains a piece for his side
+                # contains a piece for his side that has a legal move
 
                 # human piece - set as valid source square for dnd
-                if gv.board.valid_source_square(x, y, stm):
+                if gv.board.get_legal_targets(x, y):
                     self.dnd_set_source_square(x, y)
                     self.dnd_unset_dest_square(x, y)
-                else:
+                elif all_targets & chess.BB_SQUARES[chess.square(x, y)]:
                     # valid target square for dnd
                     self.dnd_unset_source_square(x, y)
                     self.dnd_set_dest_square(x, y)
@@ -1178,13 +1186,13 @@ along with jcchess.  If not, see <http://www.gnu.org/licenses/>."""
         if piece_name == _("Black to Move"):
             gv.jcchess.set_side_to_move(BLACK)
             self.set_side_to_move(BLACK)   # update ind in gui
-            gv.board.chessboard.turn=chess.BLACK
+            gv.board.set_turn(chess.BLACK)
             return
 
         if piece_name == _("White to Move"):
             gv.jcchess.set_side_to_move(WHITE)
             self.set_side_to_move(WHITE)   # update ind in gui
-            gv.board.chessboard.turn=chess.WHITE
+            gv.board.set_turn(chess.WHITE)
             return
 
         if piece_name == _("Cancel"):
@@ -59,6 +59,6 @@ def testnames():
     names = dir(modulename)
     for n in names:
         if n not in initial_namelist:
-            print u"unknown global variable in gv.py:  ",  n
+            print(u"unknown global variable in gv.py:  " + n)
 initial_namelist = None     # don't remove this line
 initial_namelist = dir()
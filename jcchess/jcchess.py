@@ -41,11 +41,14 @@ import time
 from datetime import date
 
 import chess
+import chess.polyglot
 from . import gv
 from . import utils
 from . import gui
 from . import uci
 from . import engine_manager
+from . import engine_pool
+from . import analysis
 from . import time_control
 from . import set_board_colours
 from . import move_list
@@ -54,7 +57,7 @@ from . import board
 from . import pieces
 from . import engine_output
 from . import load_save
-from .constants import WHITE, BLACK, NEUTRAL, NAME, VERSION
+from .constants import WHITE, BLACK, NEUTRAL, NAME, VERSION, BOOK_FILE
 
 
 class Game(object):
@@ -113,8 +116,7 @@ class Game(object):
         self.player = [u"Human", u"Human"]
         self.pondermove = [None, None]
 
-        opening_book_path = os.path.join(self.prefix, u"data/opening.bbk")
-        #engine.init(opening_book_path, gv.verbose)
+        self.book = self.open_book()
 
         gv.load_save = load_save.Load_Save()
         gv.gui = gui.Gui()
@@ -201,8 +203,10 @@ class Game(object):
             self.src_x = x
             self.src_y = y
             self.piece = gv.board.get_piece(x, y)
-            # hilite square clicked on
-            gv.board.update((chess.square(x, y),))
+            # hilite square clicked on and the squares it can move to
+            gv.board.update(chess.SquareSet(
+                chess.BB_SQUARES[chess.square(x, y)] |
+                gv.board.get_legal_targets(x, y)))
             return
 
         # must have a valid source square before checking dest square
@@ -239,7 +243,7 @@ class Game(object):
         if (piece == u'P' and src[1] == u'7' and dst[1] == u'8') or \
            (piece == u'p' and src[1] == u'2' and dst[1] == u'1'):
             testmove = chess.Move.from_uci(move+u'q')
-            validmove = testmove in gv.board.get_legal_moves()
+            validmove = gv.board.is_legal_move(testmove)
             if validmove:
                 # remove piece during dialog
                 #piece = gv.board.remove_piece_at_square(src_x, src_y)
@@ -252,7 +256,7 @@ class Game(object):
             print u"move=", move
  
         cmove = chess.Move.from_uci(move)
-        validmove = cmove in gv.board.get_legal_moves()
+        validmove = gv.board.is_legal_move(cmove)
         if (not validmove):
             # illegal move
             gv.gui.set_status_bar_msg(_(u"Illegal Move"))
@@ -330,9 +334,10 @@ class Game(object):
         # update time
         gv.tc.stop_clock()
 
-        # stop engines
-        gv.ucib.stop_engine()
-        gv.uciw.stop_engine()
+        # stop engines searching. The engine processes are left running
+        # so they are ready for the next move
+        gv.ucib.soft_stop()
+        gv.uciw.soft_stop()
         #engine.movenow()
         gv.gui.set_status_bar_msg(_(u"stopped"))
 
@@ -382,6 +387,37 @@ class Game(object):
     def get_glade_dir(self):
         return self.glade_dir
 
+    # Open the polyglot opening book if there is one. The book in the
+    # users settings directory is used in preference to the one in data.
+    # Returns None if there is no book.
+    def open_book(self):
+        for d in (self.jcchesspath, os.path.join(self.prefix, u"data")):
+            path = os.path.join(d, BOOK_FILE)
+            if not os.path.isfile(path):
+                continue
+            try:
+                book = chess.polyglot.open_reader(path)
+            except (IOError, OSError), e:
+                print u"unable to open opening book", path, e
+                continue
+            if gv.verbose:
+                print u"opening book", path, len(book), u"entries"
+            return book
+        return None
+
+    # move from the opening book for the board position as a uci string
+    # or None if the position is not in the book
+    def get_book_move(self):
+        if self.book is None or not gv.engine_manager.get_use_book():
+            return None
+        try:
+            entry = self.book.weighted_choice(gv.board.chessboard)
+        except IndexError:
+            return None
+        if gv.verbose:
+            print u"book move", entry.move.uci(), u"weight", entry.weight
+        return entry.move.uci()
+
     def computer_move(self):
         try:
             self.thinking = True
@@ -422,7 +458,20 @@ class Game(object):
 
                 ponder_enabled = gv.engine_manager.get_ponder()
 
-                if not ponder_enabled:
+                book_move = self.get_book_move()
+                if book_move is not None:
+                    # play the book move without asking the engine.
+                    # uci.cmove starts the clock for an engine move, start
+                    # it here from before the book lookup
+                    gv.tc.start_clock(self.stm, t_start)
+                    if self.pondermove[self.stm] is not None:
+                        bm, pm = self.uci.stop_ponder()
+                        self.pondermove[self.stm] = None
+                    self.cmove = book_move
+                    # update time for the move as uci.cmove does
+                    self.uci.run_in_main_loop(gv.tc.update_clock)
+                    GLib.idle_add(gv.gui.set_side_to_move, self.stm)
+                elif not ponder_enabled:
                     # get engines move
                     self.cmove, self.pondermove[self.stm] = self.uci.cmove(
                         self.movelist, self.stm)
@@ -430,7 +479,8 @@ class Game(object):
                     # pondering
                     ponderhit = False
                     if (self.pondermove[self.stm] is not None and
-                            len(self.movelist) > 0):
+                            len(self.movelist) > 0 and
+                            self.uci.is_searching()):
                         if (self.movelist[-1] ==
                                 self.pondermove[self.stm]):
                             ponderhit = True
@@ -480,7 +530,7 @@ class Game(object):
                 # engine.setplayer(WHITE)
                 #engine.setplayer(self.stm)
                 cmove = chess.Move.from_uci(self.cmove)                    
-                validmove = cmove in gv.board.get_legal_moves()
+                validmove = gv.board.is_legal_move(cmove)
                 #validmove = engine.hmove(self.cmove)
                 if (not validmove):
                     GLib.idle_add(self.stop)
@@ -599,6 +649,10 @@ class Game(object):
         self.save_settings()
         gv.ucib.stop_engine()
         gv.uciw.stop_engine()
+        analysis.get_ref().stop()
+        engine_pool.get_ref().close()
+        if self.book is not None:
+            self.book.close()
         Gtk.main_quit()
         return False
 
@@ -678,6 +732,7 @@ class Game(object):
         s.colour_settings = gv.set_board_colours.get_colour_scheme()
         s.hash_value = gv.engine_manager.get_hash_value()
         s.ponder = gv.engine_manager.get_ponder()
+        s.use_book = gv.engine_manager.get_use_book()
         s.show_coords = gv.gui.get_show_coords()
         s.highlight_moves = gv.gui.get_highlight_moves()
         s.lastdir = gv.lastdir # last dir used
@@ -802,6 +857,14 @@ class Game(object):
                 if gv.verbose:
                     print e, u". ponder not restored"
 
+            # play moves from the opening book (true/false)
+            try:
+                use_book = x.use_book
+                gv.engine_manager.set_use_book(use_book)
+            except Exception, e:
+                if gv.verbose:
+                    print e, u". use_book not restored"
+
             # show coordinates (true/false)
             try:
                 show_coords = x.show_coords
@@ -841,8 +904,8 @@ class Game(object):
         
     def goto_move(self, move_idx):
         try:
-            gv.ucib.stop_engine()
-            gv.uciw.stop_engine()
+            gv.ucib.soft_stop()
+            gv.uciw.soft_stop()
         except:
             pass
         self.gameover = False
@@ -899,8 +962,8 @@ class Game(object):
             pass
 
         try:
-            gv.ucib.stop_engine()
-            gv.uciw.stop_engine()
+            gv.ucib.soft_stop()
+            gv.uciw.soft_stop()
         except:
             pass
         self.gameover = False
@@ -930,8 +993,8 @@ class Game(object):
 
     def undo_all(self, toolbutton):
         try:
-            gv.ucib.stop_engine()
-            gv.uciw.stop_engine()
+            gv.ucib.soft_stop()
+            gv.uciw.soft_stop()
         except:
             pass
         self.gameover = False
@@ -981,8 +1044,8 @@ class Game(object):
             pass
 
         try:
-            gv.ucib.stop_engine()
-            gv.uciw.stop_engine()
+            gv.ucib.soft_stop()
+            gv.uciw.soft_stop()
         except:
             pass
         gv.board.update()
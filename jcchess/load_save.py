@@ -138,7 +138,7 @@ class Load_Save(object):
         while not node.is_end():
             next_node = node.variation(0)
             stm = stm ^ 1 
-            move = node.board().san(next_node.move)
+            move = next_node.san()
             if gv.verbose:
                 print u"move=", move
                 print u"type=",type(move)
@@ -0,0 +1,368 @@
+#
+#   match.py - play engine v engine matches without the gui
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+# example:
+#   jcchess-match engines/stockfish-11-linux/src/stockfish \
+#       engines/stockfish-11-linux/src/stockfish \
+#       --option2 Skill\ Level=10 --games 10 --movetime 100 --pgn out.pgn
+#
+#   play 4 games at a time, each engine on its own core:
+#   jcchess-match sf1 sf2 --games 100 --tc 10+0.1 -j 4 --threads 1 \
+#       --hash 16 --pin --openings openings.epd --pgn out.pgn
+#
+
+from __future__ import division
+from __future__ import absolute_import
+import argparse
+import os
+import sys
+import time
+from io import open
+
+import chess
+import chess.pgn
+from . import gv
+from .match_scheduler import Match_Scheduler, get_cpu_count
+from .uci_engine import Uci_Engine
+
+
+class Match_Engine(Uci_Engine):
+
+    def __init__(self, path, options=(), name=None):
+        Uci_Engine.__init__(self)
+        self.path = path
+        self.options = list(options)
+        self.name = name
+        self.start_time = None
+
+    def log_prefix(self):
+        return self.get_name() + u":"
+
+    def get_name(self):
+        if self.name is not None:
+            return self.name
+        if self.id_name is not None:
+            return self.id_name
+        return os.path.basename(self.path)
+
+    def start_engine(self):
+        if not os.path.isfile(self.path):
+            print u"invalid ucipath:", self.path
+            return False
+        self.start_time = time.time()
+        return self.start(self.path, self.options)
+
+    # seconds since the engine process was started
+    def get_wall_time(self):
+        if self.start_time is None:
+            return 0.0
+        return time.time() - self.start_time
+
+    # cpu seconds used by the engine process (user + system) or None
+    # if not known (only available on linux)
+    def get_cpu_time(self):
+        try:
+            with open(u"/proc/%d/stat" % self.p.pid) as f:
+                stat = f.read()
+        except (AttributeError, IOError, OSError):
+            return None
+        # the process name in brackets can contain spaces
+        fields = stat[stat.rfind(u")") + 2:].split()
+        utime, stime = int(fields[11]), int(fields[12])
+        # sysconf needs a native str name on python 2
+        return (utime + stime) / os.sysconf("SC_CLK_TCK")
+
+
+# Search limits for each move. tc is (base time, increment) in
+# milliseconds
+class Limits(object):
+
+    def __init__(self, movetime=None, nodes=None, depth=None, tc=None):
+        self.movetime = movetime
+        self.nodes = nodes
+        self.depth = depth
+        self.tc = tc
+
+    # clocks is a dict of time left in milliseconds for each colour
+    def get_go_command(self, clocks):
+        cmd = [u"go"]
+        if self.tc is not None:
+            cmd.extend((u"wtime", unicode(int(clocks[chess.WHITE])),
+                        u"btime", unicode(int(clocks[chess.BLACK])),
+                        u"winc", unicode(self.tc[1]),
+                        u"binc", unicode(self.tc[1])))
+        if self.movetime is not None:
+            cmd.extend((u"movetime", unicode(self.movetime)))
+        if self.nodes is not None:
+            cmd.extend((u"nodes", unicode(self.nodes)))
+        if self.depth is not None:
+            cmd.extend((u"depth", unicode(self.depth)))
+        if len(cmd) == 1:
+            cmd.append(u"infinite")
+        return u" ".join(cmd)
+
+    # time to wait for bestmove before giving up on the engine (secs)
+    def get_timeout(self, clocks, turn):
+        if self.tc is not None:
+            return (clocks[turn] + self.tc[1]) / 1000 + 5
+        if self.movetime is not None:
+            return self.movetime / 1000 + 5
+        return None
+
+    def get_tc_header(self):
+        if self.tc is None:
+            return u"-"
+        base, inc = self.tc
+        return u"%g+%g" % (base / 1000, inc / 1000)
+
+
+# Play one game. Returns the chess.pgn.Game.
+def play_game(white, black, limits, fen=None, max_plies=None):
+    if fen is None:
+        board = chess.Board()
+        startpos = u"startpos"
+    else:
+        board = chess.Board(fen)
+        startpos = fen
+    engines = {chess.WHITE: white, chess.BLACK: black}
+    clocks = {chess.WHITE: 0, chess.BLACK: 0}
+    if limits.tc is not None:
+        clocks = {chess.WHITE: limits.tc[0], chess.BLACK: limits.tc[0]}
+
+    for e in (white, black):
+        e.command(u"ucinewgame\n")
+        e.wait_ready()
+
+    moves = []
+    result = None
+    termination = None
+    while not board.is_game_over(claim_draw=True):
+        if max_plies is not None and len(moves) >= max_plies:
+            result = u"1/2-1/2"
+            termination = u"adjudication"
+            break
+
+        turn = board.turn
+        e = engines[turn]
+        e.set_position(startpos, moves)
+        t_start = time.time()
+        bestmove, ponder_move = e.go(
+            limits.get_go_command(clocks),
+            limits.get_timeout(clocks, turn))
+        elapsed = int((time.time() - t_start) * 1000)
+
+        # the side to move loses if the engine fails to move, moves
+        # illegally or runs out of time
+        if turn == chess.WHITE:
+            loss = u"0-1"
+        else:
+            loss = u"1-0"
+
+        if bestmove is None:
+            # stop the search and collect its bestmove so that it is not
+            # taken as the reply to the next go. An engine that does not
+            # respond is shut down and restarted for the next game
+            e.soft_stop()
+            result = loss
+            termination = u"abandoned"
+            break
+
+        if limits.tc is not None:
+            clocks[turn] -= elapsed
+            if clocks[turn] < 0:
+                result = loss
+                termination = u"time forfeit"
+                break
+            clocks[turn] += limits.tc[1]
+
+        try:
+            move = chess.Move.from_uci(bestmove)
+        except ValueError:
+            move = None
+        if move is None or move not in board.legal_moves:
+            result = loss
+            termination = u"illegal move " + bestmove
+            break
+
+        board.push(move)
+        moves.append(bestmove)
+
+    game = chess.pgn.Game.from_board(board)
+    if result is None:
+        result = board.result(claim_draw=True)
+    game.headers["Result"] = result
+    if termination is not None:
+        game.headers["Termination"] = termination
+    game.headers["White"] = white.get_name()
+    game.headers["Black"] = black.get_name()
+    game.headers["TimeControl"] = limits.get_tc_header()
+    return game
+
+
+# Read the start positions from a file of fens/epds (one per line)
+# or from the final position of each game in a pgn file.
+def read_openings(path):
+    openings = []
+    with open(path, encoding=u"utf-8-sig", errors=u"replace") as f:
+        if path.lower().endswith(u".pgn"):
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                openings.append(game.end().board().fen())
+            return openings
+
+        for line in f:
+            line = line.strip()
+            if line == u"" or line.startswith(u"#"):
+                continue
+            board = chess.Board()
+            fields = line.split()
+            if len(fields) >= 6 and fields[4].isdigit():
+                board.set_fen(u" ".join(fields[:6]))
+            else:
+                board.set_epd(line)
+            openings.append(board.fen())
+    return openings
+
+
+# "60+0.5" -> (60000, 500)
+def parse_tc(tc):
+    if u"+" in tc:
+        base, inc = tc.split(u"+", 1)
+    else:
+        base, inc = tc, u"0"
+    return int(float(base) * 1000), int(float(inc) * 1000)
+
+
+# ["Hash=64", "Threads=1"] -> [("Hash", "64"), ("Threads", "1")]
+def parse_options(optlist):
+    options = []
+    for opt in optlist:
+        name, sep, value = opt.partition(u"=")
+        if not sep:
+            raise ValueError(u"engine option must be NAME=VALUE: " + opt)
+        options.append((name.strip(), value.strip()))
+    return options
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog=u"jcchess-match",
+        description=u"Play a match between two UCI engines without the gui")
+    parser.add_argument(u"engine1", help=u"path to first engine")
+    parser.add_argument(u"engine2", help=u"path to second engine")
+    parser.add_argument(u"-n", u"--games", type=int, default=2,
+                        help=u"number of games (default 2)")
+    parser.add_argument(u"--movetime", type=int,
+                        help=u"time per move in milliseconds")
+    parser.add_argument(u"--nodes", type=int, help=u"nodes per move")
+    parser.add_argument(u"--depth", type=int, help=u"depth per move")
+    parser.add_argument(u"--tc",
+                        help=u"time control as seconds[+increment]")
+    parser.add_argument(u"--option1", action=u"append", default=[],
+                        metavar=u"NAME=VALUE",
+                        help=u"UCI option for engine 1 (can be repeated)")
+    parser.add_argument(u"--option2", action=u"append", default=[],
+                        metavar=u"NAME=VALUE",
+                        help=u"UCI option for engine 2 (can be repeated)")
+    parser.add_argument(u"--name1", help=u"name of engine 1 in the pgn")
+    parser.add_argument(u"--name2", help=u"name of engine 2 in the pgn")
+    parser.add_argument(u"--fen", help=u"start position (default standard)")
+    parser.add_argument(u"--openings",
+                        help=u"file of start positions (fen/epd or pgn), "
+                             u"each is played twice with colours reversed")
+    parser.add_argument(u"-j", u"--concurrency", type=int, default=1,
+                        help=u"number of games to play at once (0 for one "
+                             u"game per two engines' worth of cores)")
+    parser.add_argument(u"--threads", type=int,
+                        help=u"Threads option sent to each engine")
+    parser.add_argument(u"--hash", type=int,
+                        help=u"Hash option (MB) sent to each engine")
+    parser.add_argument(u"--pin", action=u"store_true",
+                        help=u"pin each engine to its own cores (linux)")
+    parser.add_argument(u"--max-moves", type=int,
+                        help=u"adjudicate a draw after this many moves")
+    parser.add_argument(u"--pgn", help=u"pgn file to append games to")
+    parser.add_argument(u"-v", u"--verbose", action=u"store_true")
+    parser.add_argument(u"-vuci", action=u"store_true",
+                        help=u"show uci commands")
+    return parser
+
+
+def get_limits(args):
+    tc = None
+    if args.tc is not None:
+        tc = parse_tc(args.tc)
+    return Limits(args.movetime, args.nodes, args.depth, tc)
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    gv.verbose = args.verbose
+    gv.verbose_uci = args.vuci
+
+    try:
+        options1 = parse_options(args.option1)
+        options2 = parse_options(args.option2)
+    except ValueError, ve:
+        print ve
+        return 1
+    limits = get_limits(args)
+
+    max_plies = None
+    if args.max_moves is not None:
+        max_plies = args.max_moves * 2
+
+    openings = None
+    if args.openings is not None:
+        openings = read_openings(args.openings)
+    elif args.fen is not None:
+        openings = [args.fen]
+
+    concurrency = args.concurrency
+    if concurrency <= 0:
+        cores_per_game = 2 * (args.threads or 1)
+        concurrency = max(1, get_cpu_count() // cores_per_game)
+
+    def play(white, black, fen):
+        return play_game(white, black, limits, fen, max_plies)
+
+    pgnfile = None
+    if args.pgn is not None:
+        pgnfile = open(args.pgn, u"a", encoding=u"utf-8")
+    scheduler = Match_Scheduler(
+        [(args.engine1, options1, args.name1),
+         (args.engine2, options2, args.name2)],
+        Match_Engine, play, concurrency, args.threads, args.hash, args.pin,
+        pgnfile)
+    scheduler.add_games(args.games, openings)
+    try:
+        wins, losses, draws = scheduler.run()
+    finally:
+        if pgnfile is not None:
+            pgnfile.close()
+
+    print u"%s v %s: +%d -%d =%d" % (
+        scheduler.names[0], scheduler.names[1], wins, losses, draws)
+    scheduler.print_report()
+    return 0
+
+
+if __name__ == u"__main__":
+    sys.exit(main())
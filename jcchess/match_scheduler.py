@@ -0,0 +1,293 @@
+#
+#   match_scheduler.py - play several engine v engine games at once
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import division
+from __future__ import absolute_import
+import multiprocessing
+import os
+import queue
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from . import gv
+
+
+# number of cpus (os.cpu_count is python 3 only)
+def get_cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+# full path of program if it is on the PATH otherwise None
+def find_program(name):
+    for d in os.environ.get(u"PATH", u"").split(os.pathsep):
+        path = os.path.join(d, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+#
+# Each worker thread plays games with its own pair of engine processes.
+# Games are taken from a queue of (round, start fen, swap colours) jobs
+# until it is empty. With pin set each engine process is restricted to
+# its own set of cores (threads cores per engine) so that engines in
+# different games do not compete for the same cpu.
+#
+class Match_Scheduler(object):
+
+    # engines is a list of two (path, options, name) tuples
+    # new_engine(path, options, name) returns a Match_Engine
+    # play_game(white, black, fen) plays a game and returns a
+    # chess.pgn.Game
+    def __init__(self, engines, new_engine, play_game, concurrency=1,
+                 threads=None, hash_size=None, pin=False, pgnfile=None):
+        self.engines = engines
+        self.new_engine = new_engine
+        self.play_game = play_game
+        self.concurrency = max(1, concurrency)
+        self.threads = threads
+        self.hash_size = hash_size
+        # os.sched_setaffinity is python 3 only. Otherwise use taskset
+        self.taskset = None
+        if pin and not hasattr(os, u"sched_setaffinity"):
+            self.taskset = find_program(u"taskset")
+            if self.taskset is None:
+                print u"cpu pinning is not available (needs python 3 or " \
+                      u"taskset), --pin ignored"
+                pin = False
+        self.pin = pin
+        self.pgnfile = pgnfile
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.abort = False
+        self.names = [None, None]
+
+        # results for engine 1
+        self.score = [0, 0, 0]
+        self.games_played = 0
+        self.games_total = 0
+        self.start_time = None
+        self.end_time = None
+
+        # cpu seconds and wall seconds used by the processes of each
+        # engine
+        self.cpu_time = [0.0, 0.0]
+        self.wall_time = [0.0, 0.0]
+
+    # Add games to the queue. Each opening is played twice with colours
+    # reversed. openings is a list of fens (None for the standard start
+    # position).
+    def add_games(self, games, openings=None):
+        if not openings:
+            openings = [None]
+        for i in xrange(games):
+            fen = openings[(i // 2) % len(openings)]
+            self.jobs.put((self.games_total + 1, fen, i % 2 == 1))
+            self.games_total += 1
+
+    def get_engine_options(self, options):
+        options = list(options)
+        names = [name for name, value in options]
+        if self.threads is not None and u"Threads" not in names:
+            options.append((u"Threads", self.threads))
+        if self.hash_size is not None and u"Hash" not in names:
+            options.append((u"Hash", self.hash_size))
+        return options
+
+    # cores for engine idx of worker wid
+    def get_cores(self, wid, idx):
+        ncpus = get_cpu_count()
+        nthreads = self.threads or 1
+        first = (wid * 2 + idx) * nthreads
+        return set((first + i) % ncpus for i in xrange(nthreads))
+
+    # restrict all threads of the engine process to the given cores
+    def pin_engine(self, e, cores):
+        if self.taskset is not None:
+            self.pin_engine_taskset(e, cores)
+            return
+        task_dir = u"/proc/%d/task" % e.p.pid
+        try:
+            tids = [int(t) for t in os.listdir(task_dir)]
+        except OSError:
+            tids = [e.p.pid]
+        for tid in tids:
+            try:
+                os.sched_setaffinity(tid, cores)
+            except OSError, oe:
+                if gv.verbose:
+                    print u"unable to set cpu affinity for", tid, oe
+
+    # pin with taskset -a (all threads of the process)
+    def pin_engine_taskset(self, e, cores):
+        cpus = u",".join(unicode(c) for c in sorted(cores))
+        try:
+            with open(os.devnull, u"w") as devnull:
+                rc = subprocess.call(
+                    [self.taskset, u"-a", u"-p", u"-c", cpus,
+                     unicode(e.p.pid)], stdout=devnull)
+        except OSError, oe:
+            rc = oe
+        if rc != 0 and gv.verbose:
+            print u"unable to set cpu affinity for", e.p.pid, rc
+
+    # start the engine if it is not running (or has crashed)
+    def check_engine(self, e, wid, idx):
+        if e.engine_running and e.p.poll() is None:
+            return True
+        if e.p is not None:
+            self.record_cpu(e, idx)
+        e.engine_running = False
+        if not e.start_engine():
+            return False
+        if self.pin:
+            self.pin_engine(e, self.get_cores(wid, idx))
+        self.names[idx] = e.get_name()
+        return True
+
+    def record_cpu(self, e, idx):
+        cpu = e.get_cpu_time()
+        wall = e.get_wall_time()
+        with self.lock:
+            if cpu is not None:
+                self.cpu_time[idx] += cpu
+            self.wall_time[idx] += wall
+
+    def worker(self, wid):
+        engines = []
+        for idx, (path, options, name) in enumerate(self.engines):
+            engines.append(self.new_engine(
+                path, self.get_engine_options(options), name))
+        try:
+            while not self.abort:
+                try:
+                    rnd, fen, swap = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+
+                for idx, e in enumerate(engines):
+                    if not self.check_engine(e, wid, idx):
+                        print u"unable to start engine", e.get_name()
+                        self.abort = True
+                if self.abort:
+                    break
+
+                if swap:
+                    white, black = engines[1], engines[0]
+                else:
+                    white, black = engines[0], engines[1]
+                game = self.play_game(white, black, fen)
+                self.game_done(rnd, game, white is engines[0])
+        finally:
+            for idx, e in enumerate(engines):
+                # the engine must be stopped even if the cpu time can not
+                # be read
+                try:
+                    if e.engine_running:
+                        self.record_cpu(e, idx)
+                except Exception, ex:
+                    print u"unable to get cpu time for", e.get_name(), ex
+                e.stop_engine()
+
+    def game_done(self, rnd, game, engine1_white):
+        game.headers["Event"] = u"jcchess match"
+        game.headers["Site"] = socket.gethostname()
+        game.headers["Date"] = datetime.strftime(datetime.now(), u'%Y.%m.%d')
+        game.headers["Round"] = unicode(rnd)
+        result = game.headers["Result"]
+
+        with self.lock:
+            if result == u"1/2-1/2":
+                self.score[2] += 1
+            elif (result == u"1-0") == engine1_white:
+                self.score[0] += 1
+            else:
+                self.score[1] += 1
+            self.games_played += 1
+
+            print u"game %d/%d: %s - %s %s (%.1f games/hour)" % (
+                rnd, self.games_total, game.headers["White"],
+                game.headers["Black"], result, self.get_games_per_hour())
+
+            if self.pgnfile is not None:
+                self.pgnfile.write(unicode(game) + u"\n\n")
+                self.pgnfile.flush()
+
+    # Play all the games in the queue. Returns the score for engine 1 as
+    # (wins, losses, draws).
+    def run(self):
+        self.start_time = time.time()
+        workers = []
+        for wid in xrange(min(self.concurrency, self.games_total)):
+            t = threading.Thread(target=self.worker, args=(wid,))
+            t.daemon = True
+            t.start()
+            workers.append(t)
+        try:
+            for t in workers:
+                # join with a timeout so ctrl-c is not blocked
+                while t.is_alive():
+                    t.join(1)
+        except KeyboardInterrupt:
+            print u"match interrupted, waiting for games in progress"
+            self.abort = True
+            for t in workers:
+                t.join()
+        self.end_time = time.time()
+        return tuple(self.score)
+
+    def get_elapsed(self):
+        if self.start_time is None:
+            return 0
+        if self.end_time is None:
+            return time.time() - self.start_time
+        return self.end_time - self.start_time
+
+    def get_games_per_hour(self):
+        elapsed = self.get_elapsed()
+        if elapsed <= 0:
+            return 0.0
+        return self.games_played * 3600 / elapsed
+
+    # fraction of its cores (threads) each engine kept busy
+    def get_cpu_utilization(self):
+        nthreads = self.threads or 1
+        util = []
+        for cpu, wall in zip(self.cpu_time, self.wall_time):
+            if wall <= 0:
+                util.append(0.0)
+            else:
+                util.append(cpu / (wall * nthreads))
+        return util
+
+    def print_report(self):
+        elapsed = int(self.get_elapsed())
+        print u"%d games in %02d:%02d:%02d, %.1f games/hour, %d at once" % (
+            self.games_played, elapsed // 3600, elapsed // 60 % 60,
+            elapsed % 60, self.get_games_per_hour(), self.concurrency)
+        for name, util, cpu in zip(
+                self.names, self.get_cpu_utilization(), self.cpu_time):
+            print u"%s: cpu %.1f%% of %d thread(s), %.0f cpu seconds" % (
+                name, util * 100, self.threads or 1, cpu)
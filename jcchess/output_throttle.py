@@ -0,0 +1,126 @@
+#
+#   output_throttle.py - Batch engine output sent to the gui
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import division
+from __future__ import absolute_import
+from gi.repository import GLib
+import threading
+
+from .constants import ENGINE_OUTPUT_FPS
+
+
+#
+# Engine lines arrive on the uci reader thread, often thousands per second.
+# Rather than adding an idle callback for each one they are collected here
+# and passed to the engine output and engine debug windows in a batch at
+# most fps times a second.
+# Within a batch only the newest info line for each depth/multipv is kept
+# along with the newest line that has no pv (currmove, nps etc).
+#
+class Output_Throttle(object):
+
+    def __init__(self, engine_output, engine_debug, fps=ENGINE_OUTPUT_FPS):
+        self.engine_output = engine_output
+        self.engine_debug = engine_debug
+        self.interval = max(1, int(1000 / fps))
+        self.lock = threading.Lock()
+        self.flush_pending = False
+        self.debug_lines = []
+        self.info = {}
+        self.status = None
+        self.seq = 0
+        self.side = None
+        self.engine_name = u""
+
+        # counters
+        self.lines_received = 0
+        self.lines_coalesced = 0
+        self.batches = 0
+
+    # called from the uci reader thread for each info line
+    def add_info(self, side, engine_name, info):
+        with self.lock:
+            self.lines_received += 1
+            self.seq += 1
+            self.side = side
+            self.engine_name = engine_name
+            if info.pv:
+                multipv = info.multipv
+                if multipv is None:
+                    multipv = 1
+                key = (multipv, info.depth)
+                if key in self.info:
+                    self.lines_coalesced += 1
+                self.info[key] = (self.seq, info)
+            else:
+                if self.status is not None:
+                    self.lines_coalesced += 1
+                self.status = (self.seq, info)
+            self.schedule_flush()
+
+    # called for lines to and from the engine to add to the debug log
+    def add_debug(self, msg):
+        with self.lock:
+            self.debug_lines.append(msg)
+            self.schedule_flush()
+
+    # discard info lines not yet shown and clear the output window
+    def clear_output(self, side, engine_name):
+        with self.lock:
+            self.lines_coalesced += len(self.info)
+            if self.status is not None:
+                self.lines_coalesced += 1
+            self.info = {}
+            self.status = None
+        GLib.idle_add(self.engine_output.clear, side, engine_name)
+
+    # must be called with lock held
+    def schedule_flush(self):
+        if not self.flush_pending:
+            self.flush_pending = True
+            GLib.timeout_add(self.interval, self.flush)
+
+    # runs in the gtk main loop
+    def flush(self):
+        with self.lock:
+            debug_lines = self.debug_lines
+            info = list(self.info.values())
+            if self.status is not None:
+                info.append(self.status)
+            side = self.side
+            engine_name = self.engine_name
+            self.debug_lines = []
+            self.info = {}
+            self.status = None
+            self.flush_pending = False
+            self.batches += 1
+
+        if debug_lines:
+            self.engine_debug.add_to_log(u"\n".join(debug_lines))
+
+        # show in the order received
+        info.sort(key=lambda x: x[0])
+        for seq, rec in info:
+            self.engine_output.add_to_log(side, engine_name, rec)
+
+        # one-shot timeout
+        return False
+
+    def get_stats(self):
+        return self.lines_received, self.lines_coalesced, self.batches
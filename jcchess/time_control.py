@@ -667,10 +667,13 @@ class Time_Control(object):
 
     #
     # called before each move
+    # start_time is when the side to move began thinking (default now)
     #
-    def start_clock(self, stm):
+    def start_clock(self, stm, start_time=None):
         # print "starting clock in tc.py"
-        self.clock_start_time = time.time()
+        if start_time is None:
+            start_time = time.time()
+        self.clock_start_time = start_time
         self.clock_stm = stm
         if self.type == 3:
             if stm == WHITE:
@@ -24,30 +24,49 @@ from gi.repository import Gdk
 from gi.repository import GObject
 from gi.repository import GLib
 import os
-import subprocess
-import _thread
-import time
+import threading
 
+import chess
 from . import engine_debug
 from . import engine_output
+from . import engine_pool
+from . import eval_cache
+from . import output_throttle
 from . import gv
-from .constants import WAIT_FOR_READYOK
+from .uci_engine import Uci_Engine
 
 
-class Uci(object):
+# Engine player for the gui. The process handling and UCI protocol
+# are in uci_engine.py
+class Uci(Uci_Engine):
 
     def __init__(self, side):
 #from gi.repository import GLib
+        Uci_Engine.__init__(self)
         self.engine = u"jcchess"
         self.path = u""
-        self.engine_running = False
         self.newgame = False
         self.running_engine = u""
-        self.stop_pending = False
+        # path and options the running engine process was started with
+        self.running_path = None
+        self.running_options = None
         self.ponder_move = None
         self.side = side
         self.engine_debug = engine_debug.get_ref()
         self.engine_output = engine_output.get_ref()
+        # batches lines for the output and debug windows
+        self.throttle = output_throttle.Output_Throttle(
+            self.engine_output, self.engine_debug)
+
+    def log_prefix(self):
+        return self.side + u"(" + self.get_running_engine().strip() + u"):"
+
+    def log_debug(self, msg):
+        self.throttle.add_debug(msg)
+
+    def info_received(self, info):
+        self.throttle.add_info(
+            self.side, self.get_running_engine().strip(), info)
 
     def start_engine(self, path):
 
@@ -76,314 +95,86 @@ class Uci(object):
         # Attempt to start the engine as a subprocess
         if gv.verbose:
             print u"starting engine with path:", path
-        path = path.strip()
-        #print("engine:" + path)
-
-        # when jcchess is started on windows with pythonw
-        # a console window appears each time the engine starts
-        # Use STARTUPINFO to suppress this
-        if os.name == u'nt':
-            si = subprocess.STARTUPINFO()
-            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            p = subprocess.Popen(
-                path,bufsize = 1,   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE, cwd=engine_wdir,
-                universal_newlines=True,startupinfo=si)
-        else:
-            p = subprocess.Popen(
-                path,bufsize = 1,   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE, cwd=engine_wdir,
-                universal_newlines=True)
-        self.p = p
-       
-        #check process is running
-        i = 0
-        while (p.poll() is not None):
-            i += 1
-            if i > 40:
-                print u"unable to start engine process"
-                return False
-            time.sleep(0.25)
 
-        if gv.verbose:
-            print u"pid=", p.pid
-        # start thread to read stdout
-        self.op = []
-        self.soutt = _thread.start_new_thread(self.read_stdout, ()) # commenting this line doesn't help
-
-        # Tell engine to use the UCI (universal chess interface).
-        self.command(u"uci\n")
+        options = self.get_start_options()
+        if not self.start(path, options):
+            return False
+        self.running_engine = self.engine
+        self.running_path = path
+        self.running_options = options
+        return True
 
-        # wait for reply
+    # options to send with setoption when the engine is started
+    def get_start_options(self):
         self.uservalues=gv.engine_manager.get_uservalues(self.engine)
-        self.uci_option = []
-        uci_ok = False
-        i = 0
-        while True:
-            for l in self.op:
-                l = l.strip()
-                # print l
-                if l.startswith(u"option"):
-                    optlist = self.option_parse(l)
-                    if optlist is not None:
-                        self.uci_option.append(optlist)
-                if l == u"uciok":
-                    uci_ok = True
-            self.op = []
-            if uci_ok:
-                break
-            i += 1
-            if i > 40:
-                print u"error - uciok not returned from engine"
-                return False
-            time.sleep(0.25)
 
         # set hash value
-        self.command(
-            u"setoption name Hash value " +
-            unicode(gv.engine_manager.get_hash_value()) + u"\n")
-        
+        options = [(u"Hash", gv.engine_manager.get_hash_value())]
+
         # set pondering
         if gv.engine_manager.get_ponder():
             ponder_str = u"true"
         else:
             ponder_str = u"false"
-        self.command(u"setoption name Ponder value " + ponder_str + u"\n")
-        
-        # send setoption where we have a uservalue that differs from default
-        uservalues = gv.engine_manager.get_uservalues(self.engine)
-        for name, value in uservalues.items():
-            self.command(u"setoption name " + name + u" value " + value + u"\n")
-            
-        # Ask if ready
-        # slight delay before sending this (for gnuchess)
-        time.sleep(0.25)
-        self.command(u"isready\n")
+        options.append((u"Ponder", ponder_str))
 
-        # wait for reply
-        ready_ok = False
-        i = 0
-        sleep_duration = 0.25 # 1/4 second
-        loop_limit = int(WAIT_FOR_READYOK / sleep_duration)
-        while True:
-            for l in self.op:
-                l = l.strip()
-                # print l
-                if l == u"readyok":
-                    ready_ok = True
-            self.op = []
-            if ready_ok:
-                break
-            i += 1
-            if i > loop_limit:
-                print u"error - readyok not returned from engine"
-                print u"continuing anyway"
-                print u"you can set time to wait in constants.py"
-                break
-            time.sleep(sleep_duration)
-
-        # Tell engine we are starting new game
-        self.command(u"ucinewgame\n")
-        self.engine_running = True
+        # send setoption where we have a uservalue that differs from default
+        options.extend(self.uservalues.items())
+        return options
+
+    # Take an already running process for the engine from the pool
+    # Returns False if there is none
+    def acquire_engine(self):
+        # builtin engine (not UCI)
+        if self.engine == u"jcchess":
+            return False
+        options = self.get_start_options()
+        if not engine_pool.get_ref().acquire(self, self.path, options):
+            return False
         self.running_engine = self.engine
+        self.running_path = self.path
+        self.running_options = options
         return True
 
-    def option_parse(self, option_line):
-        name = u""
-        otype = u""
-        default = u""
-        minimum = u""
-        maximum = u""
-        userval = u""
-        try:
-            words = option_line.split()
-            w = words.pop(0)
-            if w != u"option":
-                if gv.verbose:
-                    print u"invalid option line ignored:", option_line
-                return None
-
-            # get option name
-            w = words.pop(0)
-            if w != u"name":
-                if gv.verbose:
-                    print u"invalid option line ignored:", option_line
-                return None
-            # name can contain spaces
-            name = u''
-            w = words.pop(0)
-            while w != u"type" and len(words) != 0:
-                name += u' ' + w
-                w = words.pop(0)
-            name=name.strip()
-
-            # get option type
-            if w != u"type":
-                if gv.verbose:
-                    print u"invalid option line ignored:", option_line
-                return None
-            otype = words.pop(0)
-
-            uvars = []
-            while True:
-                w = words.pop(0)
-                w2 = words.pop(0)
-                if w == u"default":
-                    default = w2
-                elif w == u"min":
-                    minimum = w2
-                elif w == u"max":
-                    maximum = w2
-                elif w == u"var":
-                    uvars.append(w2)
-                elif w == u"userval":
-                    userval = w2
-                else:
-                    if gv.verbose:
-                        print u"error parsing option:", option_line
-                    return None
-        except IndexError:
-            pass
-        userval = self.uservalues.get(name, default)
-        return([name, otype, default, minimum, maximum, uvars, userval])
-                        
-    def command(self, cmd):
-        e = self.side + u"(" + self.get_running_engine().strip() + u"):"
-        if gv.verbose or gv.verbose_uci:
-            print u"->" + e + cmd.strip()
-        GObject.idle_add(self.engine_debug.add_to_log, u"->" + e + cmd.strip())
-        try:
-            # write as string (not bytes) since universal_newlines=True
-            self.p.stdin.write(cmd)
-        except AttributeError:
-            GObject.idle_add(
-                self.engine_debug.add_to_log,
-                u"# engine process is not running")
-        except IOError:
-            GObject.idle_add(
-                self.engine_debug.add_to_log,
-                u"# engine process is not running")
+    # Put the running process in the pool for reuse rather than
+    # stopping it
+    def release_engine(self):
+        engine_pool.get_ref().release(
+            self, self.running_path, self.running_options)
+        self.running_engine = u""
 
     def stop_engine(self):
         if not self.engine_running:
             return
-
-        self.stop_pending = True
-        engine_stopped = False
-
-        try:
-            if gv.verbose:
-                print u"stopping engine"
-
-            self.command(u"quit\n")
-
-            # allow 2 seconds for engine process to end
-            i = 0
-            while True:
-                if self.p.poll() is not None:
-                    engine_stopped = True
-                    break
-                i += 1
-                if i > 8:
-                    if gv.verbose:
-                        print u"engine has not terminated after quit command"
-                    break
-                time.sleep(0.25)
-
-            if not engine_stopped:
-                if gv.verbose:
-                    print u"terminating engine subprocess pid ", self.p.pid
-                # SIGTERM
-                self.p.terminate()
-                i = 0
-                while True:
-                    if self.p.poll() is not None:
-                        engine_stopped = True
-                        break
-                    i += 1
-                    if i > 8:
-                        if gv.verbose:
-                            print u"engine has not responded to terminate " \
-                                  u"command"
-                        break
-                    time.sleep(0.25)
-
-            if not engine_stopped:
-                if gv.verbose:
-                    print u"killing engine subprocess pid ", self.p.pid
-                # SIGKILL
-                self.p.kill()
-                i = 0
-                while True:
-                    if self.p.poll() is not None:
-                        engine_stopped = True
-                        break
-                    i += 1
-                    if i > 16:
-                        if gv.verbose:
-                            print u"engine has not responded to kill command"
-                        print u"unable to stop engine pid", self.p.pid
-                        break
-                    time.sleep(0.25)
-        except:
-            pass
-
+        Uci_Engine.stop_engine(self)
         if gv.verbose:
-            print
-        if engine_stopped:
-            if gv.verbose:
-                print u"engine stopped ok"
-        self.engine_running = False
-        self.stop_pending = False
+            print u"engine output lines received, coalesced, batches:", \
+                  self.throttle.get_stats()
         self.running_engine = u""
 
-    def read_stdout(self): 
-        while True:
+    # run func in the gtk main loop and wait for it to complete
+    def run_in_main_loop(self, func, *args):
+        done = threading.Event()
+
+        def call():
             try:
-                e = (u"<-" + self.side + u"(" +
-                     self.get_running_engine().strip() + u"):")
-                line= u""
-                # python2 line = unicode(self.p.stdout.readline(), errors ='ignore')
-                    # or: 'your iso 8859-15 text'.decode('iso8859-15')
-                # python3 (doesn't work) lineb = self.p.stdout.readline().encode("utf-8", "ignore")
-                #print(lineb)
-                #line = str(lineb)
-                #print(line, "line")
-                line = self.p.stdout.readline()
-                
-                if line == u"":
-                    if gv.verbose:
-                        print e + u"eof reached"
-                    if gv.verbose:
-                        print e + u"stderr:", self.p.stderr.read()
-                    break
-                #line = line[2:-3]
-                #print(line)
-                line = line.strip()
-                
-                if gv.verbose or gv.verbose_uci:
-                    print e + line
-                GObject.idle_add(self.engine_debug.add_to_log, e+line)
-                if line.startswith(u"info"):
-                    GObject.idle_add(
-                        self.engine_output.add_to_log, self.side,
-                        self.get_running_engine().strip(), line)
-                self.op.append(line)
-            except Exception, e:
-                # line = e + "error"
-                print u"subprocess error in uci.py read_stdout:", e, u"at:", line
-                
+                func(*args)
+            finally:
+                done.set()
+            return False
+
+        GObject.idle_add(call)
+        done.wait(1.0)
 
     def check_running(self):
         # check if engine has changed since last use
         if self.engine != self.running_engine:
             if self.engine_running:
-                self.stop_engine()
-                self.start_engine(None)
-                return
+                self.release_engine()
 
         if not self.engine_running:
-            self.start_engine(None)
+            if not self.acquire_engine():
+                self.start_engine(None)
         else:
             if self.p.poll() is not None:
                 print u"warning engine has stopped running - attempting " \
@@ -393,6 +184,9 @@ class Uci(object):
     def set_newgame(self):
         self.newgame = True
 
+    def send_position(self, moves):
+        self.set_position(gv.jcchess.get_startpos(), moves)
+
     # Ask engine to make move
     def cmove(self, movelist, side_to_move):
         self.check_running()
@@ -401,27 +195,8 @@ class Uci(object):
             self.command(u"ucinewgame\n")
             self.newgame = False
 
-        startpos = gv.jcchess.get_startpos()
-
-        # if not startpos must be fen
-        if startpos != u"startpos":
-            startpos = u"fen " + startpos
-
-        ml = u""
-        for move in movelist:
-            ml = ml + move + u" "
-        if ml == u"":
-            b = u"position " + startpos + u"\n"
-        else:
-            b = u"position " + startpos + u" moves " + ml.strip() + u"\n"
-
-        # b = "position sfen lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/" \
-        #     "1B5R1/LNSGKGSNL b - 1 moves " + ml.strip() +  "\n"
-        # b = "position sfen 8l/1l+R2P3/p2pBG1pp/kps1p4/Nn1P2G2/P1P1P2PP/" \
-        #     "1PS6/1KSG3+r1/LN2+p3L w Sbgn3p 124 moves " + ml.strip() +  "\n"
-
         # Send the board position to the engine
-        self.command(b)
+        self.send_position(movelist)
 
         # times in milliseconds
         # btime = time_left[0]
@@ -429,9 +204,8 @@ class Uci(object):
         # byoyomi = time_left[2]
 
         # clear the engine output window ready for next move
-        GObject.idle_add(
-            self.engine_output.clear, self.side,
-            self.get_running_engine().strip())
+        self.throttle.clear_output(
+            self.side, self.get_running_engine().strip())
 
         # print "calling time control module from uci module to get go command"
         gocmnd = gv.tc.get_go_command(side_to_move)
@@ -442,102 +216,96 @@ class Uci(object):
         # print "starting clock from uci.py"
         gv.tc.start_clock(side_to_move)
 
-        # send the engine the command to do the move
-        self.command(gocmnd + u"\n")
+        # use the stored result if this engine has already searched the
+        # position with the same options and fixed limits (depth, nodes)
+        evaluation = None
+        if eval_cache.is_cacheable(gocmnd):
+            cache = eval_cache.get_ref()
+            zobrist = gv.board.chessboard.zobrist_hash()
+            ident = cache.get_ident(
+                self.get_running_engine() + u" " +
+                repr(sorted(self.running_options)), gocmnd)
+            evaluation = cache.get(zobrist, ident)
+            # the move must be legal here in case of a hash collision or a
+            # damaged cache file
+            if (evaluation is not None and
+                    not self.is_legal_move(evaluation[3][0])):
+                evaluation = None
+
+        if evaluation is not None:
+            pv = evaluation[3]
+            bestmove = pv[0]
+            self.ponder_move = None
+            if len(pv) > 1:
+                self.ponder_move = pv[1]
+            if gv.verbose:
+                print u"bestmove from evaluation cache is ", bestmove
+        else:
+            # send the engine the command to do the move
+            self.clear_replies()
+            self.last_info = None
+            self.searching = True
+            self.command(gocmnd + u"\n")
+
+            # self.command(
+            #   "go btime " + str(btime) +" wtime " + str(wtime) + " byoyomi " +
+            #   str(byoyomi) + "\n")
+
+            # Wait for move from engine
+            l = self.wait_for_bestmove()
+            if l is None:
+                return None, None
 
-        # self.command(
-        #   "go btime " + str(btime) +" wtime " + str(wtime) + " byoyomi " +
-        #   str(byoyomi) + "\n")
+            bestmove, self.ponder_move = self.parse_bestmove(l)
+            if gv.verbose:
+                print u"bestmove is ", bestmove
 
-        # Wait for move from engine
-        i = 0
-        bestmove = False
-        while True:
+            if eval_cache.is_cacheable(gocmnd):
+                evaluation = self.get_evaluation()
+                if evaluation is not None and evaluation[3][0] == bestmove:
+                    cache.put(zobrist, ident, evaluation)
 
-            time.sleep(0.5)
+        # get ponder move if present
+        if self.ponder_move is not None:
+            GObject.idle_add(
+                self.engine_output.set_ponder_move,
+                # set ponder move in engine output window
+                self.ponder_move, self.side)
 
-            # i += 1
-            # print "in cmove i=",i
+        # update time for last move
+        # This must complete before we do start_clock for
+        # human in jcchess.py
+        self.run_in_main_loop(gv.tc.update_clock)
+        GObject.idle_add(gv.gui.set_side_to_move, side_to_move)
 
-            # if stop command sent while engine was thinking then return
-            if not self.engine_running or self.stop_pending:
-                return None, None
+        return bestmove, self.ponder_move
 
-            for l in self.op:
-                l = l.strip()
-                if l.startswith(u"bestmove"):
-                    bestmove = l[9:].strip()
-                    if gv.verbose:
-                        print u"bestmove is ", bestmove
-
-                    # get ponder move if present
-                    self.ponder_move = None
-                    s = bestmove.find(u"ponder")
-                    if s != -1:
-                        self.ponder_move = bestmove[s + 7:].strip()
-                        GObject.idle_add(
-                            self.engine_output.set_ponder_move,
-                            # set ponder move in engine output window
-                            self.ponder_move, self.side)
-
-                    # get bestmove
-                    s = bestmove.find(u" ")
-                    if s != -1:
-                        bestmove = bestmove[:s]
-                    self.op = []
-
-                    # update time for last move
-                    GObject.idle_add(gv.tc.update_clock)
-                    GObject.idle_add(gv.gui.set_side_to_move, side_to_move)
-                    # Allow above update_clock to complete
-                    # This must complete before we do start_clock for 
-                    # human in jcchess.py  
-                    time.sleep(0.1)
-
-                    return bestmove, self.ponder_move
-            self.op = []
+    def is_legal_move(self, uci_move):
+        try:
+            move = chess.Move.from_uci(uci_move)
+        except ValueError:
+            return False
+        return gv.board.chessboard.is_legal(move)
 
     def stop_ponder(self):
         # return if not pondering
         # if self.ponder_move is None:
         #    return
+        # ponder search already ended by soft_stop
+        if not self.searching:
+            return None, None
         # stop pondering
         self.command(u"stop\n")
         # Wait for move from engine
-        i = 0
-        bestmove = False
-        while True:
-
-            time.sleep(0.5)
-
-            # i += 1
-            # print "in stop ponder i=",i
+        l = self.wait_for_bestmove()
+        if l is None:
+            return None, None
 
-            # if stop command sent while engine was thinking then return
-            if not self.engine_running or self.stop_pending:
-                return None, None
-
-            for l in self.op:
-                l = l.strip()
-                if l.startswith(u"bestmove"):
-                    bestmove = l[9:].strip()
-                    if gv.verbose:
-                        print u"ponder bestmove is ", bestmove
-
-                    # get ponder move if present
-                    ponder_move = None
-                    s = bestmove.find(u"ponder")
-                    if s != -1:
-                        ponder_move = bestmove[s + 7:].strip()
-
-                    # get bestmove
-                    s = bestmove.find(u" ")
-                    if s != -1:
-                        bestmove = bestmove[:s]
-                    self.op = []
+        bestmove, ponder_move = self.parse_bestmove(l)
+        if gv.verbose:
+            print u"ponder bestmove is ", bestmove
 
-                    return bestmove, ponder_move
-            self.op = []
+        return bestmove, ponder_move
 
     def send_ponderhit(self, side_to_move):
 
@@ -546,82 +314,40 @@ class Uci(object):
 
         self.command(u"ponderhit\n")
         # Wait for move from engine
-        i = 0
-        bestmove = False
-        while True:
+        l = self.wait_for_bestmove()
+        if l is None:
+            return None, None
 
-            time.sleep(0.5)
+        bestmove, self.ponder_move = self.parse_bestmove(l)
+        if gv.verbose:
+            print u"bestmove is ", bestmove
 
-            # i += 1
-            # print "in send ponder i,side=",i,self.side
+        # get ponder move if present
+        if self.ponder_move is not None:
+            GObject.idle_add(
+                self.engine_output.set_ponder_move,
+                # set ponder move in engine output window
+                self.ponder_move, self.side)
 
-            # if stop command sent while engine was thinking then return
-            if not self.engine_running or self.stop_pending:
-                return None, None
+        # update time for last move
+        # print "updating clock from uci.py"
+        GLib.idle_add(gv.tc.update_clock)
+        GLib.idle_add(gv.gui.set_side_to_move, side_to_move)
 
-            for l in self.op:
-                l = l.strip()
-                if l.startswith(u"bestmove"):
-                    bestmove = l[9:].strip()
-                    if gv.verbose:
-                        print u"bestmove is ", bestmove
-
-                    # get ponder move if present
-                    self.ponder_move = None
-                    s = bestmove.find(u"ponder")
-                    if s != -1:
-                        self.ponder_move = bestmove[s + 7:].strip()
-                        GObject.idle_add(
-                            self.engine_output.set_ponder_move,
-                            # set ponder move in engine output window
-                            self.ponder_move, self.side)
-
-                    # get bestmove
-                    s = bestmove.find(u" ")
-                    if s != -1:
-                        bestmove = bestmove[:s]
-                    self.op = []
-
-                    # update time for last move
-                    # print "updating clock from uci.py"
-                    GLib.idle_add(gv.tc.update_clock)
-                    GLib.idle_add(gv.gui.set_side_to_move, side_to_move)
-
-                    return bestmove, self.ponder_move
-            self.op = []
+        return bestmove, self.ponder_move
 
     def start_ponder(self, pondermove, movelist, cmove):
 
-        startpos = gv.jcchess.get_startpos()
-
-        # if not startpos must be sfen
-        if startpos != u"startpos":
-            startpos = u"fen " + startpos
-
-        ml = u""
-        for move in movelist:
-            ml = ml + move + u" "
-        # if ml == "":
-        #    print "error empty movelist in ponder in uci.py"
-        #    return
-
-        ml = ml.strip()
-        ml = ml + u" " + cmove + u" " + pondermove
-        ml = ml.strip()
-
-        # create the position string with the ponder move added
-        b = u"position " + startpos + u" moves " + ml + u"\n"
-
-        # Send the board position to the engine
-        self.command(b)
+        # send the position with the ponder move added
+        self.send_position(list(movelist) + [cmove, pondermove])
 
         pondercmd = u"go ponder" + self.gocmnd[2:]
+        self.searching = True
         self.command(pondercmd + u"\n")
 
         # clear the engine output window ready for next move
-        GObject.idle_add(
-            self.engine_output.clear, self.side,
-            self.get_running_engine().strip())
+        self.throttle.clear_output(
+            self.side, self.get_running_engine().strip())
 
         return
 
@@ -650,72 +376,24 @@ class Uci(object):
             self.stop_engine()
 
         # Attempt to start the engine as a subprocess
-        engine_wdir = os.path.dirname(path)
         try:
-            if os.name == u'nt':
-                si = subprocess.STARTUPINFO()
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                p = subprocess.Popen(
-                    path,bufsize = 1,   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE, cwd=engine_wdir,
-                    universal_newlines=True,startupinfo=si)
-            else:
-                p = subprocess.Popen(
-                    path,bufsize = 1,   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE, cwd=engine_wdir,
-                    universal_newlines=True)
+            started = self.open_process(path)
         except OSError, oe:
             msg = u"error starting engine: " + u"OSError" + unicode(oe)
             return msg, name
-        self.p = p
 
         # check process is running
-        i = 0
-        while (p.poll() is not None):
-            i += 1
-            if i > 40:
-                msg = u"not a valid UCI engine"
-                return msg, name
-            time.sleep(0.25)
-
-        # start thread to read stdout commented out (double?)
-        self.op = []
-        self.soutt = _thread.start_new_thread(self.read_stdout, ())
-
-        # Tell engine to use the UCI (universal chess interface).
-        self.command(u"uci\n")
+        if not started:
+            msg = u"not a valid UCI engine"
+            return msg, name
 
         # wait for reply
         self.uservalues=gv.engine_manager.get_uservalues(self.engine)
-        self.uci_option = []
-        uci_ok = False
-        i = 0
-        while True:
-            for l in self.op:
-                l = l.strip()
-                if l.startswith(u"id "):
-                    w = l.split()
-                    if w[1] == u"name":
-                        w.pop(0)
-                        w.pop(0)
-                        name = u""
-                        for j in w:
-                            name = name + j + u" "
-                        name = name.strip()
-                elif l.startswith(u"option"):
-                    optlist = self.option_parse(l)
-                    if optlist is not None:
-                        self.uci_option.append(optlist)
-                elif l == u"uciok":
-                    uci_ok = True
-            self.op = []
-            if uci_ok:
-                break
-            i += 1
-            if i > 40:
-                msg = u"not a valid UCI engine"
-                return msg, name
-            time.sleep(0.25)
+        if not self.uci_handshake():
+            msg = u"not a valid UCI engine"
+            return msg, name
+        if self.id_name is not None:
+            name = self.id_name
 
         try:
             self.command(u"quit\n")
@@ -955,3 +633,4 @@ class Uci(object):
             gv.engine_manager.set_uservalues(self.engine, options)
         dialog.destroy()
         self.stop_engine()
+
@@ -0,0 +1,268 @@
+#
+#   uci_async.py - UCI engine client for asyncio
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+# One event loop can drive many engines with no thread per engine and
+# no polling. This module needs python 3.6 or later. It only imports the
+# parts of jcchess that run on python 3 (constants.py, uci_parse.py).
+#
+# example:
+#   async def analyse(path, fen):
+#       engine = Async_Uci_Engine()
+#       await engine.start(path, [(u"Hash", 16)])
+#       await engine.position(fen, [])
+#       await engine.start_search(u"go depth 20")
+#       async for info in engine.infos():
+#           if info.has_score():
+#               last = info
+#       bestmove, ponder = await engine.wait_for_bestmove()
+#       await engine.quit()
+#       return bestmove, last
+#
+#   loop.run_until_complete(asyncio.gather(
+#       *[analyse(path, fen) for fen in fens]))
+#
+
+from __future__ import division
+from __future__ import absolute_import
+import asyncio
+import logging
+import os
+
+from .constants import WAIT_FOR_UCIOK, WAIT_FOR_READYOK, WAIT_FOR_BESTMOVE
+from .uci_parse import parse_bestmove, parse_info, position_command
+
+log = logging.getLogger(__name__)
+
+
+class Async_Uci_Engine(object):
+
+    # info_queue_size is the number of info records kept for a caller
+    # that is not reading them. The oldest is dropped when full.
+    def __init__(self, name=u"", info_queue_size=1000):
+        self.name = name
+        self.p = None
+        self.reader = None
+        self.engine_running = False
+        self.searching = False
+        self.position_sent = None
+        self.id_name = None
+        self.uci_option = []
+        # replies other than info and bestmove (uciok, readyok etc)
+        self.replies = asyncio.Queue()
+        # set to (bestmove, pondermove) when the current search ends
+        self.bestmove = None
+        self.info_queue = asyncio.Queue(maxsize=info_queue_size)
+
+    # Start the engine and set it up ready to play.
+    # options is a list of (name, value) pairs to send with setoption
+    # Returns False if the engine does not complete the uci handshake.
+    # Raises OSError if the process cannot be started.
+    async def start(self, path, options=()):
+        path = path.strip()
+        self.p = await asyncio.create_subprocess_exec(
+            path, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=os.path.dirname(path) or None)
+        self.reader = asyncio.ensure_future(self.read_stdout())
+
+        if not await self.uci_handshake():
+            log.warning(u"%s: uciok not returned from engine", self.name)
+            await self.quit()
+            return False
+
+        for name, value in options:
+            self.command(
+                u"setoption name " + name + u" value " + u"%s" % value +
+                u"\n")
+
+        if not await self.wait_ready():
+            log.warning(u"%s: readyok not returned from engine", self.name)
+
+        self.command(u"ucinewgame\n")
+        await self.drain()
+        self.engine_running = True
+        return True
+
+    async def uci_handshake(self, timeout=WAIT_FOR_UCIOK):
+        self.uci_option = []
+        self.id_name = None
+        self.command(u"uci\n")
+        return await self.wait_for_reply(u"uciok", timeout)
+
+    async def wait_ready(self, timeout=WAIT_FOR_READYOK):
+        self.command(u"isready\n")
+        return await self.wait_for_reply(u"readyok", timeout)
+
+    # Wait for the reply line expected (e.g. uciok). id and option lines
+    # received before it are saved. Returns False if the engine ends or
+    # timeout (in seconds) expires first.
+    async def wait_for_reply(self, expected, timeout):
+        await self.drain()
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                l = await asyncio.wait_for(
+                    self.replies.get(), deadline - loop.time())
+                if l is None:
+                    return False
+                if l == expected:
+                    return True
+                if l.startswith(u"id name "):
+                    self.id_name = l[8:].strip()
+                elif l.startswith(u"option "):
+                    self.uci_option.append(l)
+        except asyncio.TimeoutError:
+            return False
+
+    # Queue the command for the engine. Call drain (or any of the
+    # awaitable methods) to wait for it to be written.
+    def command(self, cmd):
+        if cmd.startswith(u"position") or cmd.startswith(u"ucinewgame"):
+            self.position_sent = None
+        log.debug(u"->%s:%s", self.name, cmd.strip())
+        if self.p is None or self.p.stdin.transport.is_closing():
+            log.debug(u"# engine process is not running")
+            return
+        self.p.stdin.write(cmd.encode(u"utf-8"))
+
+    async def drain(self):
+        if self.p is None:
+            return
+        try:
+            await self.p.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            log.debug(u"# engine process is not running")
+
+    # startpos is u"startpos" or a fen. Not sent if the engine already
+    # has this position.
+    async def position(self, startpos, moves):
+        key = (startpos, tuple(moves))
+        if key == self.position_sent:
+            return
+        self.command(position_command(startpos, moves))
+        self.position_sent = key
+        await self.drain()
+
+    # Send the go command and return without waiting for bestmove.
+    # Use infos() to follow the search and wait_for_bestmove for the
+    # result.
+    async def start_search(self, gocmnd):
+        self.clear_queue(self.info_queue)
+        self.bestmove = asyncio.get_event_loop().create_future()
+        self.searching = True
+        self.command(gocmnd + u"\n")
+        await self.drain()
+
+    # Search and return (bestmove, pondermove). pondermove is None if the
+    # engine did not send one. Returns (None, None) if the engine ends or
+    # timeout (in seconds) expires.
+    async def go(self, gocmnd, timeout=None):
+        await self.start_search(gocmnd)
+        return await self.wait_for_bestmove(timeout)
+
+    # Any number of tasks can wait for the same search.
+    async def wait_for_bestmove(self, timeout=None):
+        if self.bestmove is None:
+            return None, None
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(self.bestmove), timeout)
+        except asyncio.TimeoutError:
+            return None, None
+
+    # Stop the search and return the bestmove sent in reply
+    async def stop(self):
+        if not self.searching:
+            return None, None
+        self.command(u"stop\n")
+        return await self.wait_for_bestmove(WAIT_FOR_BESTMOVE)
+
+    async def ponderhit(self):
+        self.command(u"ponderhit\n")
+        await self.drain()
+
+    # Iterate over the info records sent during the current search.
+    # Ends when the engine sends bestmove.
+    async def infos(self):
+        while True:
+            info = await self.info_queue.get()
+            if info is None:
+                return
+            yield info
+
+    async def read_stdout(self):
+        while True:
+            b = await self.p.stdout.readline()
+            if not b:
+                log.debug(u"<-%s:eof reached", self.name)
+                self.engine_running = False
+                self.replies.put_nowait(None)
+                self.search_ended((None, None))
+                return
+            line = b.decode(u"utf-8", u"replace").strip()
+            log.debug(u"<-%s:%s", self.name, line)
+            if line.startswith(u"info"):
+                self.put_info(parse_info(line))
+            elif line.startswith(u"bestmove"):
+                self.search_ended(parse_bestmove(line))
+            else:
+                self.replies.put_nowait(line)
+
+    def search_ended(self, result):
+        self.searching = False
+        if self.bestmove is not None and not self.bestmove.done():
+            self.bestmove.set_result(result)
+        # end iteration over infos()
+        self.put_info(None)
+
+    def put_info(self, info):
+        if self.info_queue.full():
+            self.info_queue.get_nowait()
+        self.info_queue.put_nowait(info)
+
+    def clear_queue(self, q):
+        while not q.empty():
+            q.get_nowait()
+
+    # Ask the engine to quit. It is terminated, then killed if it has
+    # not ended after 2 seconds.
+    async def quit(self):
+        if self.p is None:
+            return
+        if self.p.returncode is None:
+            self.command(u"quit\n")
+            await self.drain()
+            for end in (None, self.p.terminate, self.p.kill):
+                if end is not None:
+                    try:
+                        end()
+                    except ProcessLookupError:
+                        break
+                try:
+                    await asyncio.wait_for(self.p.wait(), 2)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+        if self.reader is not None:
+            await self.reader
+            self.reader = None
+        self.engine_running = False
+        self.searching = False
+
@@ -0,0 +1,566 @@
+#
+#   uci_engine.py - UCI engine process handling
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This module does not use gtk so it can also be used by the command
+# line tools. uci.py builds the gui engine players on top of it.
+#
+from __future__ import division
+from __future__ import absolute_import
+import os
+import subprocess
+import _thread
+import queue
+import time
+
+from . import gv
+from .constants import WAIT_FOR_UCIOK, WAIT_FOR_READYOK, WAIT_FOR_BESTMOVE
+from .uci_parse import position_command, parse_bestmove, InfoRecord, \
+    parse_info
+
+# put on the reply queue by soft_stop to wake a thread waiting for the
+# bestmove it has collected. Readers of the queue skip it
+STOP_WAKEUP = object()
+
+
+class Uci_Engine(object):
+
+    def __init__(self):
+        self.p = None
+        self.engine_running = False
+        self.stop_pending = False
+        self.searching = False
+        # held while searching is cleared on bestmove and by soft_stop
+        # while it checks searching and sets stop_pending so that a
+        # bestmove can not slip in between
+        self.search_lock = _thread.allocate_lock()
+        # number of threads in wait_for_bestmove (not counting soft_stop)
+        self.bestmove_waiters = 0
+        # (startpos, moves) last sent to the engine in a position command
+        self.position_sent = None
+        self.id_name = None
+        # last main line (multipv 1) with a score from the current search
+        self.last_info = None
+        self.uservalues = {}
+        self.uci_option = []
+        # replies from the engine (all lines except info) are passed from
+        # the read_stdout thread to the waiting caller through this queue
+        self.op = queue.Queue()
+        # the object the read_stdout thread passes engine output to.
+        # Changed by hand_over when the process is passed to another
+        # object
+        self.reader_owner = [self]
+
+    #
+    # methods that subclasses can override to display engine output
+    #
+
+    # prefix for lines printed in verbose mode
+    def log_prefix(self):
+        return u""
+
+    # called with each line sent to and received from the engine
+    def log_debug(self, msg):
+        pass
+
+    # called from the reader thread with the InfoRecord for each info line
+    def info_received(self, info):
+        pass
+
+    # Start the engine process and a thread to read its output.
+    # Returns False if the process ends straight away.
+    # Raises OSError if the process cannot be started.
+    def open_process(self, path):
+        path = path.strip()
+        engine_wdir = os.path.dirname(path)
+
+        # when jcchess is started on windows with pythonw
+        # a console window appears each time the engine starts
+        # Use STARTUPINFO to suppress this
+        if os.name == u'nt':
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            p = subprocess.Popen(
+                path,bufsize = 1,   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, cwd=engine_wdir,
+                universal_newlines=True,startupinfo=si)
+        else:
+            p = subprocess.Popen(
+                path,bufsize = 1,   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, cwd=engine_wdir,
+                universal_newlines=True)
+        self.p = p
+
+        #check process is running
+        if p.poll() is not None:
+            return False
+
+        if gv.verbose:
+            print u"pid=", p.pid
+        # start thread to read stdout
+        self.op = queue.Queue()
+        self.reader_owner = [self]
+        self.soutt = _thread.start_new_thread(
+            self.read_stdout, (p, self.op, self.reader_owner))
+        return True
+
+    # Start the engine and set it up ready to play.
+    # options is a list of (name, value) pairs to send with setoption
+    def start(self, path, options=()):
+        if not self.open_process(path):
+            print u"unable to start engine process"
+            return False
+
+        # wait for reply
+        if not self.uci_handshake():
+            print u"error - uciok not returned from engine"
+            return False
+
+        self.send_options(options)
+
+        # Ask if ready
+        if not self.wait_ready():
+            print u"error - readyok not returned from engine"
+            print u"continuing anyway"
+            print u"you can set time to wait in constants.py"
+
+        # Tell engine we are starting new game
+        self.command(u"ucinewgame\n")
+        self.engine_running = True
+        return True
+
+    # send uci and wait for uciok. The id and option lines sent by the
+    # engine are stored in self.id_name and self.uci_option
+    def uci_handshake(self, timeout=WAIT_FOR_UCIOK):
+        # Tell engine to use the UCI (universal chess interface).
+        self.uci_option = []
+        self.id_name = None
+        self.command(u"uci\n")
+        return self.wait_for_reply(u"uciok", timeout)
+
+    # options is a list of (name, value) pairs
+    def send_options(self, options):
+        for name, value in options:
+            self.command(
+                u"setoption name " + name + u" value " + unicode(value) +
+                u"\n")
+
+    # send isready and wait for readyok
+    def wait_ready(self, timeout=WAIT_FOR_READYOK):
+        self.command(u"isready\n")
+        return self.wait_for_reply(u"readyok", timeout)
+
+    # Wait for the engine to send the reply line expected (e.g. uciok).
+    # Lines received before it are passed to uci_reply.
+    # Returns False if the engine ends or timeout (in seconds) expires
+    # first. Each line is handled as soon as it arrives so startup takes
+    # only as long as the engine needs to answer.
+    def wait_for_reply(self, expected, timeout):
+        deadline = time.time() + timeout
+        while True:
+            wait = deadline - time.time()
+            if wait <= 0:
+                return False
+            try:
+                l = self.op.get(timeout=wait)
+            except queue.Empty:
+                return False
+
+            # engine process has ended
+            if l is None:
+                return False
+            if l is STOP_WAKEUP:
+                continue
+
+            if l == expected:
+                return True
+            self.uci_reply(l)
+
+    # process id and option lines sent in reply to the uci command
+    def uci_reply(self, l):
+        if l.startswith(u"id "):
+            w = l.split()
+            if len(w) > 2 and w[1] == u"name":
+                self.id_name = u" ".join(w[2:])
+        elif l.startswith(u"option"):
+            optlist = self.option_parse(l)
+            if optlist is not None:
+                self.uci_option.append(optlist)
+
+    def option_parse(self, option_line):
+        name = u""
+        otype = u""
+        default = u""
+        minimum = u""
+        maximum = u""
+        userval = u""
+        try:
+            words = option_line.split()
+            w = words.pop(0)
+            if w != u"option":
+                if gv.verbose:
+                    print u"invalid option line ignored:", option_line
+                return None
+
+            # get option name
+            w = words.pop(0)
+            if w != u"name":
+                if gv.verbose:
+                    print u"invalid option line ignored:", option_line
+                return None
+            # name can contain spaces
+            name = u''
+            w = words.pop(0)
+            while w != u"type" and len(words) != 0:
+                name += u' ' + w
+                w = words.pop(0)
+            name=name.strip()
+
+            # get option type
+            if w != u"type":
+                if gv.verbose:
+                    print u"invalid option line ignored:", option_line
+                return None
+            otype = words.pop(0)
+
+            uvars = []
+            while True:
+                w = words.pop(0)
+                w2 = words.pop(0)
+                if w == u"default":
+                    default = w2
+                elif w == u"min":
+                    minimum = w2
+                elif w == u"max":
+                    maximum = w2
+                elif w == u"var":
+                    uvars.append(w2)
+                elif w == u"userval":
+                    userval = w2
+                else:
+                    if gv.verbose:
+                        print u"error parsing option:", option_line
+                    return None
+        except IndexError:
+            pass
+        userval = self.uservalues.get(name, default)
+        return([name, otype, default, minimum, maximum, uvars, userval])
+
+    def command(self, cmd):
+        # the engine's position is no longer known after a new game or a
+        # position typed in the engine debug window
+        if cmd.startswith(u"position") or cmd.startswith(u"ucinewgame"):
+            self.position_sent = None
+        e = self.log_prefix()
+        if gv.verbose or gv.verbose_uci:
+            print u"->" + e + cmd.strip()
+        self.log_debug(u"->" + e + cmd.strip())
+        try:
+            # write as string (not bytes) since universal_newlines=True
+            self.p.stdin.write(cmd)
+        except AttributeError:
+            self.log_debug(u"# engine process is not running")
+        except IOError:
+            self.log_debug(u"# engine process is not running")
+
+    def stop_engine(self):
+        if not self.engine_running:
+            return
+
+        self.stop_pending = True
+        engine_stopped = False
+
+        try:
+            if gv.verbose:
+                print u"stopping engine"
+
+            self.command(u"quit\n")
+
+            # allow 2 seconds for engine process to end
+            i = 0
+            while True:
+                if self.p.poll() is not None:
+                    engine_stopped = True
+                    break
+                i += 1
+                if i > 8:
+                    if gv.verbose:
+                        print u"engine has not terminated after quit command"
+                    break
+                time.sleep(0.25)
+
+            if not engine_stopped:
+                if gv.verbose:
+                    print u"terminating engine subprocess pid ", self.p.pid
+                # SIGTERM
+                self.p.terminate()
+                i = 0
+                while True:
+                    if self.p.poll() is not None:
+                        engine_stopped = True
+                        break
+                    i += 1
+                    if i > 8:
+                        if gv.verbose:
+                            print u"engine has not responded to terminate " \
+                                  u"command"
+                        break
+                    time.sleep(0.25)
+
+            if not engine_stopped:
+                if gv.verbose:
+                    print u"killing engine subprocess pid ", self.p.pid
+                # SIGKILL
+                self.p.kill()
+                i = 0
+                while True:
+                    if self.p.poll() is not None:
+                        engine_stopped = True
+                        break
+                    i += 1
+                    if i > 16:
+                        if gv.verbose:
+                            print u"engine has not responded to kill command"
+                        print u"unable to stop engine pid", self.p.pid
+                        break
+                    time.sleep(0.25)
+        except:
+            pass
+
+        if gv.verbose:
+            print
+        if engine_stopped:
+            if gv.verbose:
+                print u"engine stopped ok"
+        self.engine_running = False
+        self.stop_pending = False
+        self.searching = False
+
+    # Stop the engine searching but leave the process running so that it
+    # does not need to be restarted (and keeps its hash table) for the
+    # next move. If the engine does not respond to stop it is shut down.
+    def soft_stop(self):
+        with self.search_lock:
+            if not self.engine_running or not self.searching:
+                return
+            self.stop_pending = True
+
+        if gv.verbose:
+            print u"stopping search"
+        self.command(u"stop\n")
+
+        # drain the bestmove sent in reply to stop
+        l = self.wait_for_bestmove(WAIT_FOR_BESTMOVE, stopping=True)
+
+        with self.search_lock:
+            self.stop_pending = False
+            # release any other thread still waiting for bestmove. Only
+            # done if there is one so that no wakeup is left in the queue
+            # for a later search
+            if self.bestmove_waiters:
+                self.op.put(STOP_WAKEUP)
+
+        if l is None:
+            if gv.verbose:
+                print u"engine has not responded to stop command"
+            self.stop_engine()
+
+    def is_searching(self):
+        return self.searching
+
+    # Pass the running engine process to other (e.g. to or from the
+    # engine pool). This object is left with no process.
+    def hand_over(self, other):
+        other.p = self.p
+        other.op = self.op
+        other.reader_owner = self.reader_owner
+        other.reader_owner[0] = other
+        other.engine_running = self.engine_running
+        other.id_name = self.id_name
+        other.uci_option = self.uci_option
+        other.position_sent = self.position_sent
+        other.stop_pending = False
+        other.searching = False
+
+        self.p = None
+        self.op = queue.Queue()
+        self.reader_owner = [self]
+        self.engine_running = False
+        self.position_sent = None
+        self.stop_pending = False
+        self.searching = False
+
+    def read_stdout(self, p, replies, owner):
+        while True:
+            try:
+                line= u""
+                # python2 line = unicode(self.p.stdout.readline(), errors ='ignore')
+                    # or: 'your iso 8859-15 text'.decode('iso8859-15')
+                # python3 (doesn't work) lineb = self.p.stdout.readline().encode("utf-8", "ignore")
+                #print(lineb)
+                #line = str(lineb)
+                #print(line, "line")
+                line = p.stdout.readline()
+                # look up the owner after the read. The process may have
+                # been handed over while we were waiting for the line
+                engine = owner[0]
+                e = u"<-" + engine.log_prefix()
+
+                if line == u"":
+                    if gv.verbose:
+                        print e + u"eof reached"
+                    if gv.verbose:
+                        print e + u"stderr:", p.stderr.read()
+                    # wake up anyone still waiting for a reply
+                    replies.put(None)
+                    break
+                #line = line[2:-3]
+                #print(line)
+                line = line.strip()
+
+                if gv.verbose or gv.verbose_uci:
+                    print e + line
+                engine.log_debug(e+line)
+                if line.startswith(u"info"):
+                    # parse once here rather than in the gui thread
+                    info = parse_info(line)
+                    if info.is_main_line():
+                        engine.last_info = info
+                    engine.info_received(info)
+                elif line.startswith(u"bestmove"):
+                    # the search has ended. soft_stop checks searching
+                    # under the same lock so it either sees the search
+                    # running (and collects this bestmove) or ended
+                    with engine.search_lock:
+                        engine.searching = False
+                        replies.put(line)
+                else:
+                    # info lines are only for display. Anything else is
+                    # a reply that a caller may be waiting for
+                    replies.put(line)
+            except Exception, e:
+                # line = e + "error"
+                print u"subprocess error in uci_engine.py read_stdout:", e, u"at:", line
+
+    # return the reply lines received from the engine so far
+    def get_replies(self):
+        lines = []
+        while True:
+            try:
+                l = self.op.get_nowait()
+            except queue.Empty:
+                break
+            if l is not None and l is not STOP_WAKEUP:
+                lines.append(l)
+        return lines
+
+    # discard any replies left over from an earlier command
+    def clear_replies(self):
+        self.get_replies()
+
+    # Wait for the engine to send bestmove.
+    # Returns the bestmove line or None if the engine was stopped, has
+    # ended or timeout (in seconds) expired before bestmove arrived.
+    # The reader thread wakes us as soon as the line is received so
+    # there is no polling delay.
+    # stopping is set when called from soft_stop to collect the bestmove
+    # sent in reply to stop.
+    def wait_for_bestmove(self, timeout=None, stopping=False):
+        if stopping:
+            return self.get_bestmove(timeout, stopping)
+        with self.search_lock:
+            self.bestmove_waiters += 1
+        try:
+            return self.get_bestmove(timeout, stopping)
+        finally:
+            with self.search_lock:
+                self.bestmove_waiters -= 1
+
+    def get_bestmove(self, timeout, stopping):
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while True:
+            # if stop command sent while engine was thinking then return
+            if not self.engine_running:
+                return None
+            if self.stop_pending and not stopping:
+                return None
+            # the search has ended and its bestmove was collected by
+            # soft_stop before we started waiting
+            with self.search_lock:
+                if not self.searching and self.op.empty():
+                    return None
+
+            # wake up periodically to check for a stop
+            wait = 0.5
+            if deadline is not None:
+                wait = min(wait, deadline - time.time())
+                if wait <= 0:
+                    return None
+            try:
+                l = self.op.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+            # engine process has ended
+            if l is None:
+                return None
+            if l is STOP_WAKEUP:
+                continue
+
+            if l.startswith(u"bestmove"):
+                # stop sent while we were waiting so leave the bestmove
+                # for soft_stop to collect
+                if self.stop_pending and not stopping:
+                    self.op.put(l)
+                    return None
+                return l
+
+    # Result of the last search as (score cp, mate in, depth, pv) from the
+    # side to move's point of view or None if no score was sent
+    def get_evaluation(self):
+        info = self.last_info
+        if info is None:
+            return None
+        return (info.score_cp, info.score_mate, info.depth, tuple(info.pv))
+
+    # split "bestmove <move> [ponder <move>]" into bestmove and ponder move
+    def parse_bestmove(self, line):
+        return parse_bestmove(line)
+
+    # Send the position to the engine unless it already has it (e.g. when
+    # restarting a search on the same position)
+    def set_position(self, startpos, moves):
+        position = (startpos, tuple(moves))
+        if position == self.position_sent:
+            return
+        self.command(position_command(startpos, moves))
+        self.position_sent = position
+
+    # send a go command and wait for the reply
+    # returns (bestmove, ponder move) or (None, None) if the search
+    # was stopped
+    def go(self, gocmnd, timeout=None):
+        self.clear_replies()
+        self.last_info = None
+        self.searching = True
+        self.command(gocmnd + u"\n")
+        l = self.wait_for_bestmove(timeout)
+        if l is None:
+            return None, None
+        return self.parse_bestmove(l)
@@ -0,0 +1,156 @@
+#
+#   uci_parse.py - parse and build UCI protocol lines
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Shared by uci_engine.py (python 2) and uci_async.py (python 3) so it
+# must run on both.
+#
+
+from __future__ import absolute_import
+
+
+# Build the UCI position command for a list of moves from startpos
+# (either u"startpos" or a fen).
+# This does not depend on the engine or gui so it can be timed on its own
+# e.g. timeit.timeit(lambda: position_command(u"startpos", moves))
+def position_command(startpos, moves):
+    # if not startpos must be fen
+    if startpos != u"startpos":
+        startpos = u"fen " + startpos
+    if not moves:
+        return u"position " + startpos + u"\n"
+    return u"position " + startpos + u" moves " + u" ".join(moves) + u"\n"
+
+
+# u"bestmove e2e4 ponder e7e5" -> (u"e2e4", u"e7e5")
+# ponder move is None if the engine did not send one
+def parse_bestmove(line):
+    bestmove = u""
+    ponder_move = None
+    words = line.split()
+    if len(words) > 1:
+        bestmove = words[1]
+    if len(words) > 3 and words[2] == u"ponder":
+        ponder_move = words[3]
+    return bestmove, ponder_move
+
+
+# fields of an info line that are followed by a single integer value
+INFO_INT_FIELDS = frozenset((
+    u"depth", u"seldepth", u"multipv", u"nodes", u"nps", u"hashfull",
+    u"tbhits", u"time", u"currmovenumber", u"cpuload"))
+
+
+# The values from an engine info line.
+# Fields not present in the line are None.
+class InfoRecord(object):
+
+    __slots__ = (
+        u"line", u"depth", u"seldepth", u"multipv", u"score_cp",
+        u"score_mate", u"lowerbound", u"upperbound", u"nodes", u"nps",
+        u"hashfull", u"tbhits", u"time", u"currmove", u"currmovenumber",
+        u"cpuload", u"pv", u"string")
+
+    def __init__(self, line):
+        self.line = line
+        self.depth = None
+        self.seldepth = None
+        self.multipv = None
+        self.score_cp = None
+        self.score_mate = None
+        self.lowerbound = False
+        self.upperbound = False
+        self.nodes = None
+        self.nps = None
+        self.hashfull = None
+        self.tbhits = None
+        self.time = None
+        self.currmove = None
+        self.currmovenumber = None
+        self.cpuload = None
+        self.pv = None
+        self.string = None
+
+    def has_score(self):
+        return self.score_cp is not None or self.score_mate is not None
+
+    # True for the engine's best line with an exact score
+    def is_main_line(self):
+        if not self.pv or not self.has_score():
+            return False
+        if self.lowerbound or self.upperbound:
+            return False
+        return self.multipv is None or self.multipv == 1
+
+    def __repr__(self):
+        return u"InfoRecord(%r)" % self.line
+
+
+# parse a UCI info line (e.g. "info depth 12 score cp 31 nodes 1234 pv ...")
+# into an InfoRecord
+def parse_info(line):
+    info = InfoRecord(line)
+    words = line.split()
+    n = len(words)
+    i = 1
+    while i < n:
+        w = words[i]
+        if w in INFO_INT_FIELDS:
+            try:
+                setattr(info, w, int(words[i + 1]))
+            except (IndexError, ValueError):
+                pass
+            i += 2
+        elif w == u"score":
+            i += 1
+            while i < n:
+                w = words[i]
+                try:
+                    if w == u"cp":
+                        info.score_cp = int(words[i + 1])
+                        i += 2
+                    elif w == u"mate":
+                        info.score_mate = int(words[i + 1])
+                        i += 2
+                    elif w == u"lowerbound":
+                        info.lowerbound = True
+                        i += 1
+                    elif w == u"upperbound":
+                        info.upperbound = True
+                        i += 1
+                    else:
+                        break
+                except (IndexError, ValueError):
+                    i += 2
+        elif w == u"currmove":
+            if i + 1 < n:
+                info.currmove = words[i + 1]
+            i += 2
+        elif w == u"pv":
+            # pv is always the last field
+            info.pv = words[i + 1:]
+            break
+        elif w == u"string":
+            # rest of line is free text
+            info.string = u" ".join(words[i + 1:])
+            break
+        elif w in (u"refutation", u"currline"):
+            # move lists not used by jcchess
+            break
+        else:
+            i += 1
+    return info
@@ -64,6 +64,10 @@ setup(name="jcchess",
       entry_points={
           "gui_scripts": [
               "jcchess = jcchess.jcchess:run",
+          ],
+          "console_scripts": [
+              "jcchess-match = jcchess.match:main",
+              "jcchess-annotate = jcchess.annotate:main",
           ]
       },
 
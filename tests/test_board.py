@@ -0,0 +1,132 @@
+#
+#   test_board.py - tests for the legal move cache of the gui board
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import random
+import unittest
+
+import chess
+
+try:
+    from jcchess import analysis
+    from jcchess import board
+except (ImportError, ValueError):
+    # no gtk
+    board = None
+
+
+# stands in for GLib in analysis to count the position checks queued
+class Main_Loop(object):
+
+    def __init__(self):
+        self.pending = []
+
+    def idle_add(self, func, *args):
+        self.pending.append((func, args))
+
+
+@unittest.skipIf(board is None, u"needs gtk")
+class LegalMoveCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.glib = analysis.GLib
+        self.loop = Main_Loop()
+        analysis.GLib = self.loop
+        self.analysis_ref = analysis.Analysis.analysis_ref
+        analysis.Analysis.analysis_ref = None
+        self.board = board.Board()
+
+    def tearDown(self):
+        analysis.GLib = self.glib
+        analysis.Analysis.analysis_ref = self.analysis_ref
+
+    def assert_cache(self):
+        legal = list(self.board.chessboard.legal_moves)
+        targets = [chess.BB_VOID] * 64
+        for move in legal:
+            self.assertTrue(self.board.is_legal_move(move))
+            targets[move.from_square] |= chess.BB_SQUARES[move.to_square]
+        for square in chess.SQUARES:
+            self.assertEqual(
+                self.board.get_legal_targets(chess.square_file(square),
+                                             chess.square_rank(square)),
+                targets[square])
+        # every move of the side to move, legal or not
+        chessboard = self.board.chessboard
+        for square in chess.scan_forward(
+                chessboard.occupied_co[chessboard.turn]):
+            for to_square in chess.SQUARES:
+                move = chess.Move(square, to_square)
+                self.assertEqual(self.board.is_legal_move(move),
+                                 move in legal)
+        all_targets = chess.BB_VOID
+        for bb in targets:
+            all_targets |= bb
+        self.assertEqual(self.board.get_all_legal_targets(), all_targets)
+
+    def test_moves(self):
+        rng = random.Random(1)
+        self.assert_cache()
+        for _ in range(80):
+            legal = list(self.board.chessboard.legal_moves)
+            if not legal:
+                break
+            self.board.add_move(rng.choice(legal))
+            self.assert_cache()
+        for _ in range(10):
+            self.board.remove_move()
+            self.assert_cache()
+
+    def test_promotion(self):
+        self.board.init_board(u"8/P6k/8/8/8/8/8/K7 w - - 0 1")
+        self.assertTrue(self.board.is_legal_move(
+            chess.Move.from_uci(u"a7a8n")))
+        self.assertFalse(self.board.is_legal_move(
+            chess.Move.from_uci(u"a7a8")))
+        self.assertFalse(self.board.is_legal_move(
+            chess.Move(chess.A7, chess.A8, drop=chess.QUEEN)))
+
+    def test_edits(self):
+        self.assert_cache()
+        self.board.set_turn(chess.BLACK)
+        self.assert_cache()
+        self.board.chessboard.remove_piece_at(chess.E7)
+        self.board.clear_legal_move_cache()
+        self.assert_cache()
+
+    def test_analysis_told_of_changes(self):
+        # nothing is queued while the analysis window is closed
+        self.board.add_move(chess.Move.from_uci(u"e2e4"))
+        self.assertEqual(self.loop.pending, [])
+
+        # one check for any number of changes before it runs
+        analysis.get_ref().active = True
+        self.board.add_move(chess.Move.from_uci(u"e7e5"))
+        self.board.remove_move()
+        self.board.set_turn(chess.WHITE)
+        self.assertEqual(len(self.loop.pending), 1)
+
+        # the cache is also built without a change
+        self.board.is_legal_move(chess.Move.from_uci(u"g1f3"))
+        self.board.get_all_legal_targets()
+        self.assertEqual(len(self.loop.pending), 1)
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,297 @@
+#
+#   test_chess.py - tests for the chess package
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import array
+import copy as copy_module
+import pickle
+import random
+import unittest
+
+import chess
+import chess.perft
+
+
+def random_game(board, plies, seed):
+    # push up to plies random legal moves, returns the moves pushed
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(plies):
+        legal = list(board.legal_moves)
+        if not legal:
+            break
+        move = rng.choice(legal)
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+class ZobristTestCase(unittest.TestCase):
+
+    def assert_hash(self, board):
+        # an explicit array makes zobrist_hash() scan the whole board
+        self.assertEqual(board.zobrist_hash(),
+                         board.zobrist_hash(chess.POLYGLOT_RANDOM_ARRAY))
+
+    def test_polyglot_keys(self):
+        # keys from the polyglot book format description
+        board = chess.Board()
+        self.assertEqual(board.zobrist_hash(), 0x463b96181691fc9c)
+        for move, key in ((u"e2e4", 0x823c9b50fd114196),
+                          (u"d7d5", 0x0756b94461c50fb0),
+                          (u"e4e5", 0x662fafb965db29d4),
+                          (u"f7f5", 0x22a48b5a8e47ff78),
+                          (u"e1e2", 0x652a607ca3f242c1),
+                          (u"e8f7", 0x00fdd303c946bdd9)):
+            board.push_uci(move)
+            self.assertEqual(board.zobrist_hash(), key)
+
+        board = chess.Board()
+        for move in (u"a2a4", u"b7b5", u"h2h4", u"b5b4", u"c2c4"):
+            board.push_uci(move)
+        self.assertEqual(board.zobrist_hash(), 0x3c8123ea7b067637)
+        board.push_uci(u"b4c3")
+        board.push_uci(u"a1a3")
+        self.assertEqual(board.zobrist_hash(), 0x5c3f9b829b279560)
+
+    def test_push_pop(self):
+        for seed in range(20):
+            moves = random_game(chess.Board(), 200, seed)
+            board = chess.Board()
+            keys = []
+            for move in moves:
+                keys.append(board.zobrist_hash())
+                board.push(move)
+                self.assert_hash(board)
+            # pop restores the hash of each earlier position
+            while board.move_stack:
+                board.pop()
+                self.assertEqual(board.zobrist_hash(), keys.pop())
+                self.assert_hash(board)
+
+    def test_chess960(self):
+        board = chess.Board.from_chess960_pos(518 - 1)
+        random_game(board, 100, 1)
+        self.assert_hash(board)
+
+    def test_board_edits(self):
+        board = chess.Board()
+        board.remove_piece_at(chess.E2)
+        self.assert_hash(board)
+        board.set_piece_at(chess.E4, chess.Piece(chess.QUEEN, chess.BLACK))
+        self.assert_hash(board)
+        board.set_piece_at(chess.E4, chess.Piece(chess.PAWN, chess.WHITE))
+        self.assert_hash(board)
+        board.set_fen(u"r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        self.assert_hash(board)
+        board.clear()
+        self.assertEqual(board.board_zobrist_hash(), 0)
+        copy = chess.Board()
+        copy.push_uci(u"g1f3")
+        self.assertEqual(copy.copy().zobrist_hash(), copy.zobrist_hash())
+
+
+class RepetitionTestCase(unittest.TestCase):
+
+    def push_uci(self, board, moves):
+        for move in moves.split():
+            board.push_uci(move)
+
+    def test_threefold_and_fivefold(self):
+        board = chess.Board()
+        knights = u"g1f3 g8f6 f3g1 f6g8"
+        self.push_uci(board, knights)
+        self.assertFalse(board.can_claim_threefold_repetition())
+        # the next Nf3 would reach a threefold repetition
+        self.push_uci(board, u"g1f3 g8f6 f3g1")
+        self.assertTrue(board.can_claim_threefold_repetition())
+        self.push_uci(board, u"f6g8")
+        self.assertTrue(board.can_claim_threefold_repetition())
+        self.assertFalse(board.is_fivefold_repetition())
+
+        self.push_uci(board, knights)
+        self.push_uci(board, knights)
+        self.assertTrue(board.is_fivefold_repetition())
+        self.assertTrue(board.is_game_over())
+
+        # pop and push move the counts back and forward
+        board.pop()
+        self.assertFalse(board.is_fivefold_repetition())
+        self.assertTrue(board.can_claim_threefold_repetition())
+        board.push_uci(u"f6g8")
+        self.assertTrue(board.is_fivefold_repetition())
+        while board.move_stack:
+            board.pop()
+        self.assertFalse(board.can_claim_threefold_repetition())
+        self.push_uci(board, knights)
+        self.assertFalse(board.is_fivefold_repetition())
+
+    def test_fivefold_any_cycle(self):
+        # a king triangle takes 6 plies to get back, so the repetitions are
+        # not all 4 plies apart
+        board = chess.Board(u"4k3/8/8/8/8/8/8/4K3 w - - 0 1")
+        triangle = u"e1d1 e8d8 d1d2 d8e7 d2e1 e7e8"
+        back_and_forth = u"e1d1 e8d8 d1e1 d8e8"
+        self.push_uci(board, triangle)
+        self.push_uci(board, back_and_forth)
+        self.push_uci(board, triangle)
+        self.assertFalse(board.is_fivefold_repetition())
+        self.push_uci(board, back_and_forth)
+        self.assertTrue(board.is_fivefold_repetition())
+
+    def test_zeroing_move(self):
+        board = chess.Board()
+        knights = u"g1f3 g8f6 f3g1 f6g8"
+        self.push_uci(board, knights)
+        self.push_uci(board, knights)
+        self.assertTrue(board.can_claim_threefold_repetition())
+
+        # positions from before a pawn move can not repeat
+        board.push_uci(u"e2e4")
+        self.assertFalse(board.can_claim_threefold_repetition())
+        self.push_uci(board, u"g8f6 g1f3 f6g8 f3g1")
+        self.assertFalse(board.can_claim_threefold_repetition())
+
+        # popping the pawn move brings the earlier counts back
+        for _ in range(5):
+            board.pop()
+        self.assertTrue(board.can_claim_threefold_repetition())
+
+    def test_castling_rights(self):
+        # the same placement with different castling rights is a different
+        # position
+        board = chess.Board(u"r3k3/8/8/8/8/8/8/R3K3 w Qq - 0 1")
+        self.push_uci(board, u"a1b1 a8b8 b1a1 b8a8")
+        self.push_uci(board, u"a1b1 a8b8 b1a1 b8a8")
+        self.assertFalse(board.can_claim_threefold_repetition())
+        self.push_uci(board, u"a1b1 a8b8 b1a1 b8a8")
+        self.assertTrue(board.can_claim_threefold_repetition())
+
+
+class PackedMoveTestCase(unittest.TestCase):
+
+    def positions(self):
+        # the perft positions cover castling, en passant and promotions
+        for position in chess.perft.POSITIONS:
+            board = chess.Board(position.fen, chess960=position.chess960)
+            yield board
+            for move in list(board.legal_moves):
+                board.push(move)
+                yield board
+                board.pop()
+        for seed in range(5):
+            board = chess.Board()
+            for move in random_game(chess.Board(), 150, seed):
+                board.push(move)
+                yield board
+
+    def test_round_trip(self):
+        for from_square in chess.SQUARES:
+            for to_square in chess.SQUARES:
+                for promotion in (None, chess.KNIGHT, chess.BISHOP,
+                                  chess.ROOK, chess.QUEEN):
+                    move = chess.Move(from_square, to_square, promotion)
+                    packed = chess.pack_move(move)
+                    self.assertTrue(0 <= packed < 1 << 15)
+                    self.assertEqual(chess.unpack_move(packed), move)
+        self.assertEqual(chess.pack_move(chess.Move.null()), 0)
+        self.assertEqual(chess.pack_move(chess.Move.from_uci(u"g1f3")), 1350)
+
+    def test_packed_legal_moves(self):
+        for board in self.positions():
+            packed = board.packed_legal_moves()
+            self.assertEqual(
+                packed,
+                tuple(chess.pack_move(m) for m in board.generate_legal_moves()))
+            self.assertEqual([chess.unpack_move(p) for p in packed],
+                             list(board.legal_moves))
+
+    def test_append_to_array(self):
+        board = chess.Board()
+        # the typecode must be a str on python 2
+        moves = array.array("H")
+        self.assertEqual(board.packed_legal_moves(moves), 20)
+        board.push_uci(u"e2e4")
+        self.assertEqual(board.packed_legal_moves(moves), 20)
+        self.assertEqual(len(moves), 40)
+        self.assertEqual(tuple(moves[20:]), board.packed_legal_moves())
+
+    def test_masks(self):
+        board = chess.Board()
+        packed = board.packed_legal_moves(from_mask=chess.BB_G1,
+                                          to_mask=chess.BB_F3)
+        self.assertEqual(packed, (1350,))
+
+
+class BoardPickleTestCase(unittest.TestCase):
+
+    def test_pickle_move_stack(self):
+        board = chess.Board()
+        # knights out and back, then a capture which resets the
+        # repetition counts
+        for move in (u"e2e4", u"e7e5", u"g1f3", u"b8c6", u"f3g1", u"c6b8",
+                     u"g1f3", u"g8f6", u"f3e5"):
+            board.push_uci(move)
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(board, protocol))
+            self.assertEqual(copy.fen(), board.fen())
+            self.assertEqual(copy.move_stack, board.move_stack)
+            self.assertEqual(copy.stack[-1].repetitions,
+                             board.stack[-1].repetitions)
+
+            # the restored stack can be popped back to the start
+            copy.pop()
+            board_copy = board.copy()
+            board_copy.pop()
+            self.assertEqual(copy.fen(), board_copy.fen())
+            while copy.move_stack:
+                copy.pop()
+            self.assertEqual(copy.fen(), chess.STARTING_FEN)
+
+    def test_pickle_moves_and_pieces(self):
+        move = chess.Move.from_uci(u"e7e8q")
+        piece = chess.Piece(chess.KNIGHT, chess.BLACK)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(move, protocol)), move)
+            self.assertEqual(pickle.loads(pickle.dumps(piece, protocol)),
+                             piece)
+
+    def test_shared_moves(self):
+        # moves are immutable, so copies and a board copy share them
+        board = chess.Board()
+        board.push_uci(u"e2e4")
+        move = board.move_stack[-1]
+        self.assertTrue(copy_module.copy(move) is move)
+        self.assertTrue(copy_module.deepcopy(move) is move)
+        self.assertTrue(board.copy().move_stack[-1] is move)
+        self.assertFalse(hasattr(move, u"__dict__"))
+        self.assertFalse(hasattr(board.stack[-1], u"__dict__"))
+
+    def test_pickle_default_protocol(self):
+        board = chess.Board()
+        board.push_uci(u"e2e4")
+        copy = pickle.loads(pickle.dumps(board))
+        self.assertEqual(copy.move_stack, board.move_stack)
+        copy.pop()
+        self.assertEqual(copy.fen(), chess.STARTING_FEN)
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+#
+#   test_engine_pool.py - tests for the idle engine pool
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import os
+import sys
+import time
+import unittest
+
+from jcchess import engine_pool
+from jcchess.uci_engine import Uci_Engine
+
+# the stockfish bundled with jcchess
+ENGINE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), u"engines",
+    u"stockfish-11-linux", u"Linux", u"stockfish_20011801_x64")
+
+
+@unittest.skipUnless(
+    sys.platform.startswith(u"linux") and os.access(ENGINE, os.X_OK),
+    u"needs the bundled linux stockfish")
+class EnginePoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engines = []
+        self.pool = None
+
+    def tearDown(self):
+        if self.pool is not None:
+            self.pool.close()
+        engine_pool.Engine_Pool.engine_pool_ref = None
+        for engine in self.engines:
+            engine.stop_engine()
+
+    def make_pool(self, max_idle, idle_time):
+        self.pool = engine_pool.Engine_Pool(max_idle, idle_time)
+        return self.pool
+
+    def start_engine(self, options):
+        engine = Uci_Engine()
+        self.engines.append(engine)
+        self.assertTrue(engine.start(ENGINE, options))
+        return engine
+
+    def new_engine(self):
+        engine = Uci_Engine()
+        self.engines.append(engine)
+        return engine
+
+    def test_reuse(self):
+        pool = self.make_pool(2, 600)
+        options = [(u"Hash", 16)]
+        engine = self.start_engine(options)
+        process = engine.p
+        pool.release(engine, ENGINE, options)
+        self.assertFalse(engine.engine_running)
+        self.assertEqual(engine.p, None)
+
+        # only the same engine and options get the process
+        other = self.new_engine()
+        self.assertFalse(pool.acquire(other, ENGINE, [(u"Hash", 32)]))
+        self.assertTrue(pool.acquire(other, ENGINE, options))
+        self.assertTrue(other.p is process)
+        self.assertTrue(other.engine_running)
+        self.assertEqual(pool.idle, [])
+
+        # the process still plays
+        other.set_position(u"startpos", [u"e2e4"])
+        bestmove, ponder_move = other.go(u"go depth 3")
+        self.assertTrue(bestmove)
+
+    def test_least_recently_used(self):
+        pool = self.make_pool(2, 600)
+        processes = []
+        for hash_size in (16, 17, 18):
+            options = [(u"Hash", hash_size)]
+            engine = self.start_engine(options)
+            processes.append(engine.p)
+            pool.release(engine, ENGINE, options)
+
+        # the first process released was shut down to make room
+        self.assertEqual(len(pool.idle), 2)
+        self.assertNotEqual(processes[0].poll(), None)
+        self.assertFalse(pool.acquire(self.new_engine(), ENGINE,
+                                      [(u"Hash", 16)]))
+        engine = self.new_engine()
+        self.assertTrue(pool.acquire(engine, ENGINE, [(u"Hash", 17)]))
+        self.assertTrue(engine.p is processes[1])
+
+    def test_expiry(self):
+        pool = self.make_pool(2, 0.5)
+        options = [(u"Hash", 16)]
+        engine = self.start_engine(options)
+        process = engine.p
+        pool.release(engine, ENGINE, options)
+        self.assertEqual(len(pool.idle), 1)
+
+        time.sleep(0.7)
+        # expired processes are shut down the next time the pool is used
+        self.assertFalse(pool.acquire(self.new_engine(), ENGINE, options))
+        self.assertEqual(pool.idle, [])
+        self.assertNotEqual(process.poll(), None)
+
+    def test_dead_process(self):
+        pool = self.make_pool(2, 600)
+        options = [(u"Hash", 16)]
+        engine = self.start_engine(options)
+        process = engine.p
+        pool.release(engine, ENGINE, options)
+        process.kill()
+        process.wait()
+        self.assertFalse(pool.acquire(self.new_engine(), ENGINE, options))
+        self.assertEqual(pool.idle, [])
+
+
+if __name__ == u"__main__":
+    unittest.main()
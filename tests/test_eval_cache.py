@@ -0,0 +1,139 @@
+#
+#   test_eval_cache.py - tests for the evaluation cache
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+
+from jcchess import eval_cache
+
+
+class EvalCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, u"eval.cache")
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        shutil.rmtree(self.dir)
+
+    def open_cache(self, max_size):
+        cache = eval_cache.Eval_Cache(self.path, max_size)
+        self.caches.append(cache)
+        return cache
+
+    def evaluation(self, i):
+        return (i, None, 10, (u"e2e4", u"e7e5"))
+
+    def test_reload(self):
+        cache = self.open_cache(100000)
+        ident = cache.get_ident(u"engine", u"depth 10")
+        cache.put(1, ident, self.evaluation(1))
+        cache.put(2, ident, (None, -3, 12, (u"d1h5",)))
+        cache.close()
+
+        cache = self.open_cache(100000)
+        self.assertEqual(cache.get(1, ident), self.evaluation(1))
+        self.assertEqual(cache.get(2, ident), (None, -3, 12, (u"d1h5",)))
+        self.assertEqual(cache.get(3, ident), None)
+
+    def test_deepest_kept(self):
+        cache = self.open_cache(100000)
+        cache.put(1, 1, (10, None, 12, (u"e2e4",)))
+        cache.put(1, 1, (20, None, 8, (u"d2d4",)))
+        self.assertEqual(cache.get(1, 1), (10, None, 12, (u"e2e4",)))
+
+    def test_compact(self):
+        max_size = 2000
+        cache = self.open_cache(max_size)
+        ident = cache.get_ident(u"engine", u"depth 10")
+        for i in range(200):
+            cache.put(i, ident, self.evaluation(i))
+            self.assertTrue(os.path.getsize(self.path) <= max_size)
+        self.assertFalse(os.path.exists(self.path + u".tmp"))
+
+        # the most recently stored entries are kept
+        n = len(cache.entries)
+        self.assertTrue(0 < n < 200)
+        self.assertEqual(cache.get(199, ident), self.evaluation(199))
+        self.assertEqual(cache.get(0, ident), None)
+
+        # the compacted file can be added to and read back
+        cache.put(500, ident, self.evaluation(500))
+        n = len(cache.entries)
+        cache.close()
+        cache = self.open_cache(max_size)
+        self.assertEqual(len(cache.entries), n)
+        self.assertEqual(cache.get(199, ident), self.evaluation(199))
+        self.assertEqual(cache.get(500, ident), self.evaluation(500))
+
+    def test_damaged_record(self):
+        cache = self.open_cache(100000)
+        cache.put(1, 1, self.evaluation(1))
+        cache.put(2, 1, self.evaluation(2))
+        cache.put(3, 1, self.evaluation(3))
+        cache.close()
+
+        # change a byte of the pv of the second record
+        with open(self.path, u"rb") as f:
+            data = bytearray(f.read())
+        rec_size = (len(data) - len(eval_cache.MAGIC)) // 3
+        data[len(eval_cache.MAGIC) + 2 * rec_size - 1] ^= 0x01
+        with open(self.path, u"wb") as f:
+            f.write(bytes(data))
+
+        # reading stops at the damaged record, which is dropped
+        cache = self.open_cache(100000)
+        self.assertEqual(cache.get(1, 1), self.evaluation(1))
+        self.assertEqual(cache.get(2, 1), None)
+        self.assertEqual(cache.get(3, 1), None)
+        self.assertEqual(os.path.getsize(self.path),
+                         len(eval_cache.MAGIC) + rec_size)
+
+    def test_shared_file(self):
+        # two caches on one file, as the gui and jcchess-annotate
+        max_size = 2000
+        cache1 = self.open_cache(max_size)
+        cache2 = self.open_cache(max_size)
+        cache1.put(1000, 1, self.evaluation(1000))
+        # cache2 fills the file and rewrites it
+        for i in range(100):
+            cache2.put(i, 2, self.evaluation(i))
+        # cache1 appends to the new file, not the replaced one
+        cache1.put(1001, 1, self.evaluation(1001))
+
+        cache3 = self.open_cache(max_size)
+        self.assertEqual(cache3.get(99, 2), self.evaluation(99))
+        self.assertEqual(cache3.get(1001, 1), self.evaluation(1001))
+
+    def test_cacheable(self):
+        self.assertTrue(eval_cache.is_cacheable(u"go depth 10"))
+        self.assertTrue(eval_cache.is_cacheable(u"go nodes 100000"))
+        self.assertFalse(eval_cache.is_cacheable(u"go movetime 1000"))
+        self.assertFalse(eval_cache.is_cacheable(
+            u"go wtime 1000 btime 1000 winc 0 binc 0"))
+
+
+if __name__ == u"__main__":
+    unittest.main()
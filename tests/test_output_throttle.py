@@ -0,0 +1,152 @@
+#
+#   test_output_throttle.py - tests for batching engine output
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import unittest
+
+try:
+    from jcchess import output_throttle
+except ImportError:
+    # no gtk
+    output_throttle = None
+
+
+# the fields of an engine info line that the throttle looks at
+class Info(object):
+
+    def __init__(self, line):
+        self.line = line
+        words = line.split()
+        self.depth = int(words[words.index(u"depth") + 1])
+        self.multipv = None
+        if u"multipv" in words:
+            self.multipv = int(words[words.index(u"multipv") + 1])
+        self.pv = None
+        if u"pv" in words:
+            self.pv = words[words.index(u"pv") + 1:]
+
+
+# stands in for GLib so the test decides when the main loop runs
+class Main_Loop(object):
+
+    def __init__(self):
+        self.pending = []
+
+    def timeout_add(self, interval, func, *args):
+        self.pending.append((func, args))
+
+    def idle_add(self, func, *args):
+        self.pending.append((func, args))
+
+    def run(self):
+        pending = self.pending
+        self.pending = []
+        for func, args in pending:
+            func(*args)
+
+
+class Engine_Output(object):
+
+    def __init__(self):
+        self.lines = []
+        self.cleared = 0
+
+    def add_to_log(self, side, engine_name, info):
+        self.lines.append(info.line)
+
+    def clear(self, side, engine_name):
+        self.cleared += 1
+
+
+class Engine_Debug(object):
+
+    def __init__(self):
+        self.log = []
+
+    def add_to_log(self, msg):
+        self.log.append(msg)
+
+
+@unittest.skipIf(output_throttle is None, u"needs gtk")
+class OutputThrottleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.glib = output_throttle.GLib
+        self.loop = Main_Loop()
+        output_throttle.GLib = self.loop
+        self.output = Engine_Output()
+        self.debug = Engine_Debug()
+        self.throttle = output_throttle.Output_Throttle(
+            self.output, self.debug, 10)
+
+    def tearDown(self):
+        output_throttle.GLib = self.glib
+
+    def add(self, line):
+        self.throttle.add_info(0, u"engine", Info(line))
+
+    def test_coalesce(self):
+        self.add(u"info depth 10 score cp 10 pv e2e4")
+        self.add(u"info depth 11 score cp 12 pv e2e4 e7e5")
+        self.add(u"info depth 11 score cp 14 pv d2d4")
+        self.add(u"info depth 11 multipv 2 score cp 5 pv c2c4")
+        self.add(u"info depth 11 currmove g1f3 currmovenumber 2")
+        self.add(u"info depth 11 currmove b1c3 currmovenumber 3")
+        self.throttle.add_debug(u"<-bestmove d2d4")
+
+        # one flush is scheduled for the whole batch
+        self.assertEqual(len(self.loop.pending), 1)
+        self.assertEqual(self.output.lines, [])
+        self.loop.run()
+
+        # the newest line for each depth/multipv and the newest status
+        # line, in the order received
+        self.assertEqual(self.output.lines, [
+            u"info depth 10 score cp 10 pv e2e4",
+            u"info depth 11 score cp 14 pv d2d4",
+            u"info depth 11 multipv 2 score cp 5 pv c2c4",
+            u"info depth 11 currmove b1c3 currmovenumber 3"])
+        self.assertEqual(self.debug.log, [u"<-bestmove d2d4"])
+        self.assertEqual(self.throttle.get_stats(), (6, 2, 1))
+
+    def test_next_batch(self):
+        self.add(u"info depth 10 score cp 10 pv e2e4")
+        self.loop.run()
+        self.assertEqual(self.loop.pending, [])
+
+        # lines after a flush schedule another
+        self.add(u"info depth 10 score cp 11 pv e2e4")
+        self.assertEqual(len(self.loop.pending), 1)
+        self.loop.run()
+        self.assertEqual(len(self.output.lines), 2)
+        self.assertEqual(self.throttle.get_stats(), (2, 0, 2))
+
+    def test_clear_output(self):
+        self.add(u"info depth 10 score cp 10 pv e2e4")
+        self.add(u"info depth 10 nodes 1000")
+        self.throttle.clear_output(0, u"engine")
+        self.loop.run()
+        # lines not yet shown are dropped
+        self.assertEqual(self.output.lines, [])
+        self.assertEqual(self.output.cleared, 1)
+        self.assertEqual(self.throttle.get_stats(), (2, 2, 1))
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#
+#   test_perft.py - tests for the move generator using chess.perft
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import unittest
+
+import chess
+import chess.perft
+
+# keep the test fast, depth 2 or 3 for most positions
+MAX_NODES = 5000
+
+
+class PerftTestCase(unittest.TestCase):
+
+    def test_positions(self):
+        for result in chess.perft.run(max_nodes=MAX_NODES):
+            self.assertTrue(result.expected is not None, result.name)
+            self.assertEqual(result.nodes, result.expected, result.name)
+            self.assertTrue(result.ok)
+
+    def test_board_restored(self):
+        for position in chess.perft.POSITIONS:
+            board = chess.Board(position.fen, chess960=position.chess960)
+            fen = board.fen()
+            chess.perft.perft(board, 2)
+            self.assertEqual(board.fen(), fen)
+            self.assertFalse(board.move_stack)
+
+    def test_divide(self):
+        position = chess.perft.POSITIONS[1]
+        board = chess.Board(position.fen)
+        results = chess.perft.divide(board, 2)
+        self.assertEqual(len(results), position.nodes[0])
+        self.assertEqual(sum(nodes for move, nodes in results),
+                         position.nodes[1])
+
+    def test_choose_depth(self):
+        position = chess.perft.POSITIONS[0]
+        self.assertEqual(chess.perft.choose_depth(position, 1), 1)
+        self.assertEqual(chess.perft.choose_depth(position, 400), 2)
+        self.assertEqual(chess.perft.choose_depth(position, 10000), 3)
+
+    def test_report(self):
+        results = list(chess.perft.run(chess.perft.POSITIONS[:2], depth=1))
+        report = chess.perft.get_report(results, u"test")
+        self.assertEqual(report[u"nodes"], 20 + 48)
+        self.assertTrue(report[u"ok"])
+        self.assertEqual(report[u"label"], u"test")
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+#
+#   test_polyglot.py - tests for the polyglot opening book reader
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import chess
+import chess.polyglot
+
+
+def raw_move(uci):
+    # polyglot encoding, castling is written as king takes rook
+    move = chess.Move.from_uci(uci)
+    return (move.to_square | move.from_square << 6 |
+            (move.promotion - 1 if move.promotion else 0) << 12)
+
+
+class PolyglotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, u"book.bin")
+
+        self.start = chess.Board()
+        self.castle = chess.Board()
+        for move in (u"e2e4", u"e7e5", u"g1f3", u"b8c6", u"f1c4", u"f8c5"):
+            self.castle.push_uci(move)
+
+        # (key, move, weight)
+        entries = [
+            (self.start.zobrist_hash(), u"e2e4", 10),
+            (self.start.zobrist_hash(), u"d2d4", 30),
+            (self.start.zobrist_hash(), u"g1f3", 0),
+            # illegal in the position, skipped
+            (self.start.zobrist_hash(), u"e2e5", 50),
+            (self.castle.zobrist_hash(), u"e1h1", 1),
+            (1, u"a2a3", 1),
+            (2 ** 64 - 1, u"h2h3", 1),
+        ]
+        entries.sort()
+        with open(self.path, u"wb") as f:
+            for key, move, weight in entries:
+                f.write(chess.polyglot.ENTRY_STRUCT.pack(
+                    key, raw_move(move), weight, 0))
+
+        self.reader = chess.polyglot.open_reader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        shutil.rmtree(self.dir)
+
+    def moves(self, entries):
+        return set(entry.move.uci() for entry in entries)
+
+    def test_find_all(self):
+        self.assertEqual(len(self.reader), 7)
+        self.assertEqual(self.moves(self.reader.find_all(self.start)),
+                         set([u"e2e4", u"d2d4"]))
+        self.assertEqual(
+            self.moves(self.reader.find_all(self.start, minimum_weight=0)),
+            set([u"e2e4", u"d2d4", u"g1f3"]))
+        self.assertEqual(
+            self.moves(self.reader.find_all(
+                self.start, exclude_moves=[chess.Move.from_uci(u"d2d4")])),
+            set([u"e2e4"]))
+        self.assertEqual(list(self.reader.find_all(chess.Board(
+            u"4k3/8/8/8/8/8/8/4K3 w - - 0 1"))), [])
+
+    def test_keys(self):
+        # a key given as an integer is not checked for legal moves
+        self.assertEqual(self.moves(self.reader.find_all(1)), set([u"a2a3"]))
+        self.assertEqual(self.moves(self.reader.find_all(2 ** 64 - 1)),
+                         set([u"h2h3"]))
+        self.assertEqual(self.reader.bisect_key_left(0), 0)
+        self.assertEqual(self.reader.bisect_key_left(2), 1)
+        self.assertEqual(self.reader.bisect_key_left(2 ** 64), 7)
+
+    def test_castling(self):
+        entry = self.reader.find(self.castle)
+        self.assertEqual(entry.move.uci(), u"e1g1")
+        self.assertTrue(self.castle.is_legal(entry.move))
+
+    def test_find(self):
+        self.assertEqual(self.reader.find(self.start).move.uci(), u"d2d4")
+        self.assertRaises(IndexError, self.reader.find, chess.Board(
+            u"4k3/8/8/8/8/8/8/4K3 w - - 0 1"))
+        self.assertEqual(self.reader.get(chess.Board(
+            u"4k3/8/8/8/8/8/8/4K3 w - - 0 1")), None)
+
+    def test_weighted_choice(self):
+        rng = random.Random(1)
+        counts = {u"e2e4": 0, u"d2d4": 0}
+        for _ in range(400):
+            entry = self.reader.weighted_choice(self.start, random=rng)
+            counts[entry.move.uci()] += 1
+        # d2d4 has three times the weight of e2e4
+        self.assertTrue(counts[u"d2d4"] > 2 * counts[u"e2e4"] > 0)
+
+    def test_empty_book(self):
+        path = os.path.join(self.dir, u"empty.bin")
+        open(path, u"wb").close()
+        with chess.polyglot.open_reader(path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertEqual(list(reader.find_all(self.start)), [])
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#
+#   test_uci_parse.py - tests for parsing and building UCI lines
+#
+#   This file is part of jcchess
+#
+#   jcchess is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   jcchess is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with jcchess.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from __future__ import absolute_import
+import unittest
+
+from jcchess.uci_parse import position_command, parse_bestmove, parse_info
+
+
+class UciParseTestCase(unittest.TestCase):
+
+    def test_position_command(self):
+        self.assertEqual(position_command(u"startpos", []),
+                         u"position startpos\n")
+        self.assertEqual(position_command(u"startpos", [u"e2e4", u"e7e5"]),
+                         u"position startpos moves e2e4 e7e5\n")
+        fen = u"4k3/8/8/8/8/8/8/4K2R w K - 0 1"
+        self.assertEqual(position_command(fen, [u"e1g1"]),
+                         u"position fen " + fen + u" moves e1g1\n")
+
+    def test_parse_bestmove(self):
+        self.assertEqual(parse_bestmove(u"bestmove e2e4 ponder e7e5"),
+                         (u"e2e4", u"e7e5"))
+        self.assertEqual(parse_bestmove(u"bestmove e2e4"), (u"e2e4", None))
+        self.assertEqual(parse_bestmove(u"bestmove (none)"),
+                         (u"(none)", None))
+        self.assertEqual(parse_bestmove(u"bestmove"), (u"", None))
+
+    def test_main_line(self):
+        info = parse_info(
+            u"info depth 12 seldepth 17 multipv 1 score cp 31 nodes 123456 "
+            u"nps 987654 hashfull 12 tbhits 0 time 125 pv e2e4 e7e5 g1f3")
+        self.assertEqual(info.depth, 12)
+        self.assertEqual(info.seldepth, 17)
+        self.assertEqual(info.multipv, 1)
+        self.assertEqual(info.score_cp, 31)
+        self.assertEqual(info.score_mate, None)
+        self.assertEqual(info.nodes, 123456)
+        self.assertEqual(info.nps, 987654)
+        self.assertEqual(info.hashfull, 12)
+        self.assertEqual(info.tbhits, 0)
+        self.assertEqual(info.time, 125)
+        self.assertEqual(info.pv, [u"e2e4", u"e7e5", u"g1f3"])
+        self.assertTrue(info.has_score())
+        self.assertTrue(info.is_main_line())
+
+    def test_scores(self):
+        info = parse_info(u"info depth 20 score mate -3 pv h7h8")
+        self.assertEqual(info.score_mate, -3)
+        self.assertEqual(info.score_cp, None)
+        self.assertTrue(info.is_main_line())
+
+        # bounds are not exact scores
+        info = parse_info(u"info depth 9 score cp 15 lowerbound pv d2d4")
+        self.assertEqual(info.score_cp, 15)
+        self.assertTrue(info.lowerbound)
+        self.assertFalse(info.upperbound)
+        self.assertFalse(info.is_main_line())
+        info = parse_info(u"info depth 9 score cp -8 upperbound nodes 10")
+        self.assertTrue(info.upperbound)
+        self.assertEqual(info.nodes, 10)
+
+        # other lines of a multipv search
+        info = parse_info(u"info depth 9 multipv 2 score cp 5 pv d2d4")
+        self.assertFalse(info.is_main_line())
+
+    def test_status_lines(self):
+        info = parse_info(u"info depth 14 currmove g1f3 currmovenumber 3")
+        self.assertEqual(info.currmove, u"g1f3")
+        self.assertEqual(info.currmovenumber, 3)
+        self.assertEqual(info.pv, None)
+        self.assertFalse(info.has_score())
+        self.assertFalse(info.is_main_line())
+
+        info = parse_info(u"info string NNUE evaluation using nn.bin enabled")
+        self.assertEqual(info.string, u"NNUE evaluation using nn.bin enabled")
+        self.assertEqual(info.depth, None)
+
+        info = parse_info(u"info nodes 100 refutation d1h5 g6h5 nps 5")
+        self.assertEqual(info.nodes, 100)
+        self.assertEqual(info.nps, None)
+
+    def test_bad_values(self):
+        # values that are missing or not numbers are left as None
+        info = parse_info(u"info depth x nodes 50 score cp")
+        self.assertEqual(info.depth, None)
+        self.assertEqual(info.nodes, 50)
+        self.assertEqual(info.score_cp, None)
+        info = parse_info(u"info depth")
+        self.assertEqual(info.depth, None)
+        info = parse_info(u"info pv")
+        self.assertEqual(info.pv, [])
+        self.assertEqual(parse_info(u"info").line, u"info")
+
+
+if __name__ == u"__main__":
+    unittest.main()